@@ -0,0 +1,20 @@
+-- =====================================================
+-- MIGRATION: Detecção de alterações nas vendas do Mercado Livre
+-- Descrição: Adiciona o hash do conteúdo da linha da planilha para que o
+--            importador atualize apenas os pedidos que mudaram
+-- Data: 2026-10-18
+-- =====================================================
+
+-- Hash (MD5) das colunas A-T da linha da planilha que originou o pedido
+ALTER TABLE vendas_ml ADD COLUMN IF NOT EXISTS hash_linha CHAR(32);
+
+-- Momento da última alteração do pedido pelo importador
+ALTER TABLE vendas_ml ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+COMMENT ON COLUMN vendas_ml.hash_linha IS 'MD5 do conteúdo da linha da planilha (NULL = ainda não comparado)';
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: hash_linha adicionado em vendas_ml!';
+END $$;
@@ -0,0 +1,16 @@
+-- =====================================================
+-- MIGRATION: Índice de atualização do resumo diário
+-- Descrição: MAX(atualizado_em) de vendas_diarias_sku sem ler a tabela;
+--            faz parte da marca d'água usada pelo cache dos relatórios
+--            (scripts/cache_relatorios.py)
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE INDEX IF NOT EXISTS idx_vendas_diarias_sku_atualizado_em
+    ON vendas_diarias_sku(atualizado_em);
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: índice idx_vendas_diarias_sku_atualizado_em criado!';
+END $$;
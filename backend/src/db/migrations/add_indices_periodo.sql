@@ -0,0 +1,24 @@
+-- =====================================================
+-- MIGRATION: Índices para consultas por período
+-- Descrição: Consultas por período (coluna >= inicio AND coluna < fim) e
+--            por SKU + período usam índice; em vendas_ml o índice de data
+--            cobre as colunas agregadas e dispensa a leitura da tabela.
+--            Conferir com: python scripts/verificar_indices.py
+-- Data: 2026-10-18
+-- =====================================================
+
+-- Período: todas as colunas agregadas pelo resumo diário (rollup_vendas.py)
+CREATE INDEX IF NOT EXISTS idx_vendas_ml_data_cobertura
+    ON vendas_ml(data) INCLUDE (sku, marketplace, unidades, valor_vendido, lucro, margem_lucro);
+
+-- SKU + período (histórico de um SKU, margens por SKU)
+CREATE INDEX IF NOT EXISTS idx_vendas_ml_sku_data ON vendas_ml(sku, data);
+
+-- Metas do mês (relatório mensal); idx_metas_ml_sku_mes_ano começa pelo SKU
+CREATE INDEX IF NOT EXISTS idx_metas_ml_mes_ano ON metas_ml(mes_ano);
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: índices para consultas por período criados!';
+END $$;
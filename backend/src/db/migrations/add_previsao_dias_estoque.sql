@@ -0,0 +1,19 @@
+-- =====================================================
+-- MIGRATION: Previsão de ruptura do estoque
+-- Descrição: Colunas gravadas por scripts/previsao_estoque.py na sincronização
+--            do estoque: média diária de vendas prevista e dias até a ruptura
+--            (NULL = sem vendas na janela). Bancos criados por init.js não
+--            têm nenhuma das duas.
+-- Data: 2026-10-18
+-- =====================================================
+
+ALTER TABLE estoque ADD COLUMN IF NOT EXISTS media_vendas DECIMAL(10,2) DEFAULT 0;
+ALTER TABLE estoque ADD COLUMN IF NOT EXISTS previsao_dias INTEGER;
+
+COMMENT ON COLUMN estoque.previsao_dias IS 'Dias até a ruptura prevista (NULL = sem vendas na janela)';
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: previsao_dias adicionado em estoque!';
+END $$;
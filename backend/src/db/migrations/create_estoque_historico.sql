@@ -0,0 +1,30 @@
+-- =====================================================
+-- MIGRATION: Histórico do nível de estoque por SKU
+-- Descrição: Uma linha por alteração de quantidade (run-length): o nível
+--            vale de valido_desde até a próxima linha do mesmo SKU.
+--            Gravado pelo importador de estoque só quando a quantidade muda
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS estoque_historico (
+    id BIGSERIAL PRIMARY KEY,
+    sku VARCHAR(100) NOT NULL,
+    estoque INTEGER NOT NULL,
+    valido_desde TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Nível de um SKU em um instante: último valido_desde <= instante
+CREATE INDEX IF NOT EXISTS idx_estoque_historico_sku_desde
+    ON estoque_historico(sku, valido_desde DESC) INCLUDE (estoque);
+
+-- Ponto de partida: o nível atual de cada SKU (só na primeira execução)
+INSERT INTO estoque_historico (sku, estoque, valido_desde)
+SELECT sku, COALESCE(estoque, 0), COALESCE(updated_at, CURRENT_TIMESTAMP)
+FROM estoque
+WHERE NOT EXISTS (SELECT 1 FROM estoque_historico);
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: tabela estoque_historico criada!';
+END $$;
@@ -0,0 +1,36 @@
+-- =====================================================
+-- MIGRATION: Quarentena de linhas rejeitadas pelos importadores
+-- Descrição: Guarda as linhas das planilhas que não puderam ser importadas
+--            (ou que foram gravadas com valor padrão) para revisão
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS quarentena_importacao (
+    id SERIAL PRIMARY KEY,
+    origem VARCHAR(50) NOT NULL,              -- vendas_ml, vendas_magalu, estoque...
+    linha INTEGER,                            -- número da linha na planilha/arquivo
+    coluna VARCHAR(50) NOT NULL DEFAULT '',   -- '' quando o problema é a linha inteira
+    valor TEXT,
+    motivo TEXT NOT NULL,
+    carregada BOOLEAN NOT NULL DEFAULT FALSE, -- TRUE: gravada com o valor padrão no lugar da célula
+    conteudo JSONB,                           -- células da linha como lidas
+    hash_linha CHAR(32) NOT NULL,
+    ocorrencias INTEGER NOT NULL DEFAULT 1,
+    criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    visto_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    resolvido_em TIMESTAMP
+);
+
+-- Uma entrada por problema: a mesma linha relida só incrementa ocorrencias
+CREATE UNIQUE INDEX IF NOT EXISTS idx_quarentena_origem_hash_coluna
+    ON quarentena_importacao(origem, hash_linha, coluna);
+
+-- Fila de revisão
+CREATE INDEX IF NOT EXISTS idx_quarentena_pendentes
+    ON quarentena_importacao(origem, visto_em DESC) WHERE resolvido_em IS NULL;
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: tabela quarentena_importacao criada!';
+END $$;
@@ -0,0 +1,33 @@
+-- =====================================================
+-- MIGRATION: Recomendação de compra por SKU
+-- Descrição: Sugestão de reposição calculada pelo importador de estoque
+--            (estoque + pedidos de compra em aberto contra a demanda
+--            prevista e o lead time); o dashboard apenas lê a tabela
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS recomendacao_compra (
+    sku VARCHAR(100) PRIMARY KEY,
+    estoque INTEGER NOT NULL DEFAULT 0,
+    em_transito INTEGER NOT NULL DEFAULT 0,        -- pedido, fabricacao, transito, alfandega
+    proxima_chegada DATE,                          -- menor previsao_entrega dos pedidos em aberto
+    media_vendas DECIMAL(10,2) NOT NULL DEFAULT 0, -- unidades/dia (estoque.media_vendas)
+    lead_time_dias INTEGER NOT NULL,
+    cobertura_dias INTEGER,                        -- (estoque + em_transito) / media_vendas
+    ponto_pedido INTEGER NOT NULL DEFAULT 0,
+    quantidade_sugerida INTEGER NOT NULL DEFAULT 0,
+    ruptura_antes_chegada BOOLEAN NOT NULL DEFAULT FALSE,
+    calculado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Lista de compras do dashboard: só os SKUs com sugestão
+CREATE INDEX IF NOT EXISTS idx_recomendacao_compra_sugerida
+    ON recomendacao_compra(quantidade_sugerida DESC) WHERE quantidade_sugerida > 0;
+
+COMMENT ON TABLE recomendacao_compra IS 'Sugestão de reposição por SKU, recalculada a cada sincronização de estoque';
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: tabela recomendacao_compra criada!';
+END $$;
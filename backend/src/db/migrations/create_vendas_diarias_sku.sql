@@ -0,0 +1,54 @@
+-- =====================================================
+-- MIGRATION: Resumo diário das vendas do ML por SKU
+-- Descrição: Totais por (dia, sku, marketplace) mantidos pelo importador de
+--            vendas, lidos pelas métricas de estoque e pelos relatórios no
+--            lugar de agregar vendas_ml a cada execução
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS vendas_diarias_sku (
+    dia DATE NOT NULL,
+    sku VARCHAR(100) NOT NULL,
+    marketplace VARCHAR(50) NOT NULL DEFAULT '',
+    pedidos INTEGER NOT NULL DEFAULT 0,            -- linhas de vendas_ml no dia
+    pedidos_com_valor INTEGER NOT NULL DEFAULT 0,  -- pedidos com valor_vendido > 0
+    unidades INTEGER NOT NULL DEFAULT 0,
+    valor_vendido DECIMAL(14,2) NOT NULL DEFAULT 0,
+    lucro DECIMAL(14,2) NOT NULL DEFAULT 0,
+    soma_margem_lucro NUMERIC NOT NULL DEFAULT 0,  -- SUM(margem_lucro): média = soma / pedidos
+    soma_margem_venda NUMERIC NOT NULL DEFAULT 0,  -- SUM(lucro / valor_vendido * 100) dos pedidos com valor
+    ultima_venda TIMESTAMP,                        -- MAX(data) do dia
+    atualizado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (dia, sku, marketplace)
+);
+
+-- Consultas por SKU (última venda, janela dos últimos 30 dias)
+CREATE INDEX IF NOT EXISTS idx_vendas_diarias_sku_sku_dia ON vendas_diarias_sku(sku, dia);
+
+-- Carga inicial a partir do histórico (equivale a rollup_vendas.py --reconstruir)
+INSERT INTO vendas_diarias_sku (
+    dia, sku, marketplace, pedidos, pedidos_com_valor, unidades,
+    valor_vendido, lucro, soma_margem_lucro, soma_margem_venda, ultima_venda
+)
+SELECT
+    v.data::date,
+    v.sku,
+    COALESCE(v.marketplace, ''),
+    COUNT(*),
+    COUNT(*) FILTER (WHERE v.valor_vendido > 0),
+    COALESCE(SUM(v.unidades), 0),
+    COALESCE(SUM(v.valor_vendido), 0),
+    COALESCE(SUM(v.lucro), 0),
+    COALESCE(SUM(v.margem_lucro), 0),
+    COALESCE(SUM(v.lucro / v.valor_vendido * 100) FILTER (WHERE v.valor_vendido > 0), 0),
+    MAX(v.data)
+FROM vendas_ml v
+WHERE v.data IS NOT NULL AND v.sku IS NOT NULL
+GROUP BY 1, 2, 3
+ON CONFLICT (dia, sku, marketplace) DO NOTHING;
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: tabela vendas_diarias_sku criada!';
+END $$;
@@ -0,0 +1,36 @@
+-- =====================================================
+-- MIGRATION: Tabela de vendas da Magazine Luiza
+-- Descrição: Cria vendas_magalu (lida por /api/vendas-magalu) com a chave
+--            usada pelo importador da planilha da Magalu
+-- Data: 2026-10-18
+-- =====================================================
+
+CREATE TABLE IF NOT EXISTS vendas_magalu (
+    id SERIAL PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL,
+    purchased_at TIMESTAMP NOT NULL,
+    sku VARCHAR(50) NOT NULL,
+    produto VARCHAR(255),
+    unidades INTEGER NOT NULL DEFAULT 0,
+    valor_venda DECIMAL(10,2) NOT NULL DEFAULT 0,
+    comissao_magalu DECIMAL(10,2) NOT NULL DEFAULT 0,
+    frete_total DECIMAL(10,2) NOT NULL DEFAULT 0,
+    desconto_total DECIMAL(10,2) NOT NULL DEFAULT 0,
+    hash_linha CHAR(32),
+    inserted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Bancos em que a tabela já existia sem as colunas do importador
+ALTER TABLE vendas_magalu ADD COLUMN IF NOT EXISTS hash_linha CHAR(32);
+ALTER TABLE vendas_magalu ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP;
+
+-- Um pedido pode ter vários SKUs: a chave do upsert é (order_id, sku)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_vendas_magalu_pedido_sku ON vendas_magalu(order_id, sku);
+CREATE INDEX IF NOT EXISTS idx_vendas_magalu_purchased_at ON vendas_magalu(purchased_at);
+
+-- Log de sucesso
+DO $$
+BEGIN
+    RAISE NOTICE 'Migration executada com sucesso: tabela vendas_magalu criada!';
+END $$;
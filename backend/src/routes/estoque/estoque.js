@@ -12,6 +12,7 @@ const {
   buscarMetricasEstoque,
   buscarEstoquesPorStatus,
   buscarEstoquesCriticos,
+  buscarRecomendacoesCompra,
 } = require('../../services/estoqueService');
 
 const router = express.Router();
@@ -86,6 +87,23 @@ router.get('/criticos', async (req, res) => {
   }
 });
 
+/**
+ * GET /api/estoque/recomendacoes
+ * Buscar sugestões de compra por SKU
+ */
+router.get('/recomendacoes', async (req, res) => {
+  try {
+    const recomendacoes = await buscarRecomendacoesCompra();
+    res.json(recomendacoes);
+  } catch (error) {
+    console.error('Erro na rota GET /recomendacoes:', error);
+    res.status(500).json({
+      error: 'Erro ao buscar recomendações de compra',
+      details: error.message,
+    });
+  }
+});
+
 /**
  * GET /api/estoque/:sku
  * Buscar um produto específico pelo SKU
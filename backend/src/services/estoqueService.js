@@ -302,6 +302,30 @@ async function buscarEstoquesCriticos(diasMinimos = 5) {
   }
 }
 
+/**
+ * GET: Buscar sugestões de compra (calculadas pelo importador de estoque)
+ */
+async function buscarRecomendacoesCompra() {
+  try {
+    const { data, error } = await supabase
+      .from('recomendacao_compra')
+      .select('*')
+      .gt('quantidade_sugerida', 0)
+      .order('ruptura_antes_chegada', { ascending: false })
+      .order('quantidade_sugerida', { ascending: false });
+
+    if (error) {
+      console.error('Erro em buscarRecomendacoesCompra:', error);
+      throw error;
+    }
+
+    return data || [];
+  } catch (error) {
+    console.error('Erro em buscarRecomendacoesCompra:', error);
+    throw error;
+  }
+}
+
 module.exports = {
   buscarTodosEstoques,
   buscarEstoquePorSku,
@@ -312,4 +336,5 @@ module.exports = {
   buscarMetricasEstoque,
   buscarEstoquesPorStatus,
   buscarEstoquesCriticos,
+  buscarRecomendacoesCompra,
 };
@@ -0,0 +1,420 @@
+"""Benchmark da ingestão: planilhas sintéticas passadas pelos importadores.
+
+Gera planilhas de vendas (layout A-T lido por inserir_dados_no_banco) e de
+estoque com a formatação real (R$ 1.234,56, 12,5%, dd/mm/aa HH:MM:SS) e uma
+fração de células sujas, e mede cada etapa: conversão legada (tratar_valor),
+conversão colunar, validação/hash e as cargas no banco. Para cada etapa são
+informados linhas/s e o pico de memória.
+
+A conversão colunar é conferida célula a célula contra tratar_valor
+(paridade); qualquer diferença encerra o benchmark com código 1, assim como
+uma queda de vazão além da tolerância em relação a um resultado anterior
+(--comparar).
+
+As cargas só rodam com --dsn apontando para um Postgres local descartável:
+as tabelas são criadas no schema benchmark_ingestao (as migrations de
+backend/src/db/migrations são aplicadas) e o schema é removido no final.
+
+Uso:
+    python benchmark_ingestao.py --linhas 10000 100000
+    python benchmark_ingestao.py --dsn postgresql://postgres@localhost/postgres --saida base.json
+    python benchmark_ingestao.py --dsn ... --comparar base.json --tolerancia 0.25
+"""
+import argparse
+import contextlib
+import gc
+import io
+import json
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import psycopg2
+
+# Silencia os logs dos importadores (o basicConfig deles vira no-op)
+logging.basicConfig(level=logging.WARNING, format='%(levelname)s - %(message)s')
+
+import conexoes
+import importar_estoque
+import importar_vendas_ml
+from carga_lote import mesclar_em_lote, preparar_linhas
+from parser_colunar import ESQUEMA_ESTOQUE, ESQUEMA_VENDAS_ML, parsear_linhas, para_registros
+
+TAMANHOS_PADRAO = (10000, 100000, 1000000)
+SKUS_PADRAO = 2000
+
+# Acima disso as etapas legadas (linha a linha) são puladas: levariam minutos
+LIMITE_LEGADO = 100000
+LIMITE_LEGADO_BANCO = 10000
+
+SCHEMA_BENCHMARK = 'benchmark_ingestao'
+PASTA_MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                '..', 'backend', 'src', 'db', 'migrations')
+MIGRATIONS = ('add_hash_linha_vendas_ml.sql', 'create_quarentena_importacao.sql', 'create_vendas_diarias_sku.sql',
+              'create_estoque_historico.sql')
+
+# Tabelas base como em backend/src/db/init.js e backend/criar-tabela-estoque.sql
+DDL_BASE = """
+CREATE TABLE vendas_ml (
+    id SERIAL PRIMARY KEY,
+    marketplace VARCHAR(50) NOT NULL,
+    pedido VARCHAR(50) NOT NULL UNIQUE,
+    data DATE NOT NULL,
+    sku VARCHAR(50) NOT NULL,
+    unidades INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    valor_comprado DECIMAL(10,2) NOT NULL,
+    valor_vendido DECIMAL(10,2) NOT NULL,
+    taxas DECIMAL(10,2) NOT NULL,
+    frete DECIMAL(10,2) NOT NULL,
+    descontos DECIMAL(10,2) NOT NULL,
+    ctl DECIMAL(10,2) NOT NULL,
+    receita_envio DECIMAL(10,2) NOT NULL,
+    valor_liquido DECIMAL(10,2) NOT NULL,
+    lucro DECIMAL(10,2) NOT NULL,
+    markup DECIMAL(10,2) NOT NULL,
+    margem_lucro DECIMAL(10,2) NOT NULL,
+    envio VARCHAR(100),
+    numero_envio VARCHAR(100),
+    imposto DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE estoque (
+    id BIGSERIAL PRIMARY KEY,
+    sku VARCHAR(100) UNIQUE NOT NULL,
+    descricao TEXT,
+    estoque INTEGER DEFAULT 0,
+    minimo INTEGER DEFAULT 0,
+    cmv DECIMAL(10, 2) DEFAULT 0,
+    valor_liquido DECIMAL(10, 2) DEFAULT 0,
+    media_vendas DECIMAL(10, 2) DEFAULT 0,
+    total_vendas INTEGER DEFAULT 0,
+    vendas_quinzenais INTEGER DEFAULT 0,
+    ultima_venda TIMESTAMP,
+    status VARCHAR(50) DEFAULT 'Disponível',
+    previsao_dias INTEGER,
+    created_at TIMESTAMP DEFAULT NOW(),
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+"""
+
+CABECALHO_VENDAS = [
+    'MARKETPLACE', 'PEDIDOS', 'DATA', 'SKU', 'UNIDADES', 'STATUS', 'VALOR COMPRADO',
+    'VALOR VENDIDO', 'TAXAS', 'FRETE', 'DESCONTOS', 'CTL', 'RECEITA P/ ENVIO',
+    'VALOR LÍQUIDO', 'LUCRO', 'MARKUP', 'MARGEM DE LUCRO', 'ENVIO', 'NÚMERO ENVIO', 'IMPOSTO',
+]
+CABECALHO_ESTOQUE = ['SKU', 'DESCRIÇÃO', 'FULL', 'PRÓPRIO', 'ESTOQUE TOTAL']
+
+STATUS = ('Entregue', 'Entregue', 'Entregue', 'Entregue', 'Cancelado', 'Devolvido', 'A caminho')
+ENVIOS = ('FULL', 'Mercado Envios', 'Flex', '')
+
+# Células sujas encontradas nas planilhas reais
+SUJEIRA_NUMERO = ('', 'x', 'R$ -', '#N/A', '-', '1.234.567,891,2', '12 ,5', '#DIV/0!', ' R$ 12,50 ')
+SUJEIRA_INTEIRO = ('', 'x', '1,5', '#N/A', ' 3 ', '2.0')
+SUJEIRA_DATA = ('', '31/02/24 10:00:00', '2024-03-01 10:00:00', '01/13/24 10:00:00', '#N/A')
+
+
+def _reais(centavos):
+    """Inteiros em centavos -> 'R$ 1.234,56' (negativos como '-R$ 12,34')"""
+    textos = []
+    for valor in centavos.tolist():
+        sinal = '-' if valor < 0 else ''
+        reais, resto = divmod(abs(valor), 100)
+        textos.append(f"{sinal}R$ {reais:,}".replace(',', '.') + f",{resto:02d}")
+    return textos
+
+
+def _percentuais(centesimos):
+    return [f"{valor // 100},{valor % 100:02d}%".replace(',00%', '%') for valor in centesimos.tolist()]
+
+
+def _sujar(coluna, rng, fracao, opcoes):
+    """Troca uma fração das células da coluna por valores sujos"""
+    indices = np.flatnonzero(rng.random(len(coluna)) < fracao)
+    escolhas = rng.integers(0, len(opcoes), len(indices))
+    for indice, escolha in zip(indices.tolist(), escolhas.tolist()):
+        coluna[indice] = opcoes[escolha]
+
+
+def gerar_vendas(linhas, sujeira=0.01, semente=42):
+    """Planilha de vendas sintética (cabeçalho + linhas) no layout A-T"""
+    rng = np.random.default_rng(semente)
+    pedidos = 2000000000000 + np.arange(linhas, dtype=np.int64) * 7 + rng.integers(0, 7, linhas)
+    segundos = np.sort(rng.integers(0, 365 * 86400, linhas))
+    datas = (pd.Timestamp('2024-01-01') + pd.to_timedelta(segundos, unit='s')).strftime('%d/%m/%y %H:%M:%S')
+    skus = rng.zipf(1.3, linhas) % 400
+
+    vendido = rng.integers(1990, 250000, linhas)
+    colunas = [
+        ['Mercado Livre'] * linhas,
+        [str(p) for p in pedidos.tolist()],
+        list(datas),
+        [f"SKU-{s:04d}" for s in skus.tolist()],
+        [str(u) for u in rng.integers(1, 6, linhas).tolist()],
+        [STATUS[i] for i in rng.integers(0, len(STATUS), linhas).tolist()],
+        _reais(vendido * rng.integers(30, 70, linhas) // 100),     # valor comprado
+        _reais(vendido),                                           # valor vendido
+        _reais(vendido * rng.integers(10, 19, linhas) // 100),     # taxas
+        _reais(rng.integers(0, 4500, linhas)),                     # frete
+        _reais(-rng.integers(0, 2000, linhas)),                    # descontos
+        _reais(rng.integers(0, 1500, linhas)),                     # ctl
+        _reais(rng.integers(0, 2500, linhas)),                     # receita p/ envio
+        _reais(vendido * rng.integers(60, 85, linhas) // 100),     # valor líquido
+        _reais(vendido * rng.integers(-10, 40, linhas) // 100),    # lucro
+        _percentuais(rng.integers(0, 25000, linhas)),              # markup
+        _percentuais(rng.integers(-1000, 4000, linhas)),           # margem de lucro
+        [ENVIOS[i] for i in rng.integers(0, len(ENVIOS), linhas).tolist()],
+        [str(n) for n in rng.integers(40000000000, 49999999999, linhas).tolist()],
+        _reais(vendido * rng.integers(4, 12, linhas) // 100),      # imposto
+    ]
+
+    for indice, (_, _, tipo) in enumerate(ESQUEMA_VENDAS_ML):
+        if indice == 1:
+            continue
+        opcoes = {'data': SUJEIRA_DATA, 'inteiro': SUJEIRA_INTEIRO, 'numero': SUJEIRA_NUMERO}.get(tipo)
+        if opcoes:
+            _sujar(colunas[indice], rng, sujeira, opcoes)
+
+    dados = [list(linha) for linha in zip(*colunas)]
+    # Linhas cortadas (células vazias no fim omitidas) e linhas em branco
+    for indice in np.flatnonzero(rng.random(linhas) < sujeira / 10).tolist():
+        dados[indice] = dados[indice][:rng.integers(2, 19)]
+    for indice in np.flatnonzero(rng.random(linhas) < sujeira / 10).tolist():
+        dados[indice] = [''] * 20
+    return [list(CABECALHO_VENDAS)] + dados
+
+
+def gerar_estoque(skus, sujeira=0.01, semente=7):
+    """Aba de estoque sintética (colunas A-E)"""
+    rng = np.random.default_rng(semente)
+    estoques = [str(e) for e in rng.integers(0, 500, skus).tolist()]
+    _sujar(estoques, rng, sujeira, SUJEIRA_INTEIRO)
+    dados = [[f"SKU-{i:04d}", f"Produto {i}", '', '', estoque] for i, estoque in enumerate(estoques)]
+    return [list(CABECALHO_ESTOQUE)] + dados
+
+
+class Medidor:
+    """Cronometra etapas e registra linhas/s e pico de memória de cada uma"""
+
+    def __init__(self, rastrear_memoria=False):
+        self.rastrear_memoria = rastrear_memoria
+        self.resultados = []
+
+    @contextlib.contextmanager
+    def etapa(self, grupo, nome, linhas):
+        gc.collect()
+        if self.rastrear_memoria:
+            tracemalloc.start()
+        inicio = time.perf_counter()
+        # Os importadores imprimem uma linha por aviso/erro
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+        segundos = time.perf_counter() - inicio
+        if self.rastrear_memoria:
+            pico = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        else:
+            # ru_maxrss é o pico do processo inteiro (KB no Linux)
+            pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        resultado = {
+            'grupo': grupo, 'etapa': nome, 'linhas': linhas,
+            'segundos': round(segundos, 4),
+            'linhas_s': round(linhas / segundos) if segundos else None,
+            'pico_mb': round(pico, 1),
+        }
+        self.resultados.append(resultado)
+        print(f"  {nome:<28} {linhas:>9} linhas {segundos:>9.3f}s "
+              f"{resultado['linhas_s'] or 0:>11,} linhas/s {pico:>9.1f} MB")
+
+
+def conferir_paridade(legado, colunar, maximo_exemplos=5):
+    """Compara as tuplas de converter_linha() com as de para_registros(); retorna divergências"""
+    nomes = [nome for nome, _, _ in ESQUEMA_VENDAS_ML]
+    divergencias = []
+    for numero, (esperado, obtido) in enumerate(zip(legado, colunar), 2):
+        for nome, a, b in zip(nomes, esperado, obtido):
+            if a != b or type(a) is str and not isinstance(b, str):
+                divergencias.append((numero, nome, a, b))
+    if len(legado) != len(colunar):
+        divergencias.append((None, 'linhas', len(legado), len(colunar)))
+    for numero, nome, a, b in divergencias[:maximo_exemplos]:
+        print(f"    linha {numero}, coluna {nome}: tratar_valor={a!r} colunar={b!r}")
+    return len(divergencias)
+
+
+def preparar_banco(dsn):
+    """Cria o schema do benchmark e aponta os importadores para ele"""
+    opcoes = f"-c search_path={SCHEMA_BENCHMARK}"
+    conn = psycopg2.connect(dsn, options=opcoes)
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_BENCHMARK} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA_BENCHMARK}")
+    cursor.execute(DDL_BASE)
+    for migration in MIGRATIONS:
+        with open(os.path.join(PASTA_MIGRATIONS, migration), encoding='utf-8') as f:
+            cursor.execute(f.read())
+    conn.commit()
+    conexoes.usar_banco(dsn=dsn, options=opcoes)
+    return conn
+
+
+def limpar_tabelas(conn):
+    cursor = conn.cursor()
+    cursor.execute("TRUNCATE vendas_ml, estoque, quarentena_importacao RESTART IDENTITY")
+    conn.commit()
+    cursor.close()
+
+
+def alterar_status(dados, fracao, semente=3):
+    """Cópia da planilha com o status de uma fração dos pedidos alterado"""
+    rng = np.random.default_rng(semente)
+    alterados = [list(linha) for linha in dados]
+    for indice in np.flatnonzero(rng.random(len(dados) - 1) < fracao).tolist():
+        linha = alterados[indice + 1]
+        if len(linha) > 5:
+            linha[5] = 'Cancelado' if linha[5] != 'Cancelado' else 'Entregue'
+    return alterados
+
+
+def benchmark_vendas(medidor, linhas, conn, args):
+    grupo = f"vendas_{linhas}"
+    print(f"\nVendas ML - {linhas} linhas")
+    with medidor.etapa(grupo, 'gerar_planilha', linhas):
+        dados = gerar_vendas(linhas, args.sujeira, args.semente)
+
+    corpo = [linha for linha in dados[1:] if len(linha) >= 20 and linha[1]]
+    if linhas <= args.limite_legado:
+        with medidor.etapa(grupo, 'conversao_legada', len(corpo)):
+            legado = [importar_vendas_ml.converter_linha(linha) for linha in corpo]
+    else:
+        legado = None
+
+    with medidor.etapa(grupo, 'conversao_colunar', len(corpo)):
+        quadro, _ = parsear_linhas(corpo, ESQUEMA_VENDAS_ML)
+        colunar = para_registros(quadro, ESQUEMA_VENDAS_ML)
+
+    divergencias = 0
+    if legado is not None:
+        divergencias = conferir_paridade(legado, colunar)
+        print(f"  paridade com tratar_valor: {divergencias} divergências em {len(corpo) * 20} células")
+    del legado, colunar, quadro
+
+    with medidor.etapa(grupo, 'validacao_hash', linhas):
+        preparadas, _ = preparar_linhas(dados, ESQUEMA_VENDAS_ML, 'pedido')
+
+    if conn is not None:
+        limpar_tabelas(conn)
+        with medidor.etapa(grupo, 'copy_merge', len(preparadas)):
+            cursor = conn.cursor()
+            mesclar_em_lote(cursor, 'vendas_ml', importar_vendas_ml.COLUNAS_VENDAS_ML, 'pedido', preparadas)
+            conn.commit()
+
+        limpar_tabelas(conn)
+        with medidor.etapa(grupo, 'importador_carga_inicial', linhas):
+            importar_vendas_ml.inserir_dados_em_lote(dados)
+        with medidor.etapa(grupo, 'importador_sem_alteracoes', linhas):
+            importar_vendas_ml.inserir_dados_em_lote(dados)
+        alterados = alterar_status(dados, 0.01)
+        with medidor.etapa(grupo, 'importador_1pct_alterado', linhas):
+            importar_vendas_ml.inserir_dados_em_lote(alterados)
+        del alterados
+
+        if linhas <= args.limite_legado_banco:
+            limpar_tabelas(conn)
+            with medidor.etapa(grupo, 'importador_legado', linhas):
+                importar_vendas_ml.inserir_dados_linha_a_linha(dados)
+    return divergencias
+
+
+def benchmark_estoque(medidor, skus, conn, args):
+    grupo = f"estoque_{skus}"
+    print(f"\nEstoque - {skus} SKUs")
+    with medidor.etapa(grupo, 'gerar_planilha', skus):
+        dados = gerar_estoque(skus, args.sujeira, args.semente)
+    with medidor.etapa(grupo, 'conversao_validacao', skus):
+        _, erros = parsear_linhas(dados[1:], ESQUEMA_ESTOQUE, divisor_moeda=1)
+        importar_estoque.validar_linhas(dados[1:], erros)
+    if conn is not None:
+        limpar_tabelas(conn)
+        with medidor.etapa(grupo, 'atualizar_estoque', skus):
+            importar_estoque.atualizar_estoque(dados)
+
+
+def comparar(resultados, caminho, tolerancia):
+    """Lista as etapas cuja vazão caiu mais que a tolerância em relação ao arquivo"""
+    with open(caminho, encoding='utf-8') as f:
+        base = {(r['grupo'], r['etapa']): r for r in json.load(f)['resultados']}
+    regressoes = []
+    for resultado in resultados:
+        anterior = base.get((resultado['grupo'], resultado['etapa']))
+        if not anterior or not anterior['linhas_s'] or not resultado['linhas_s']:
+            continue
+        variacao = resultado['linhas_s'] / anterior['linhas_s'] - 1
+        if variacao < -tolerancia:
+            regressoes.append(f"{resultado['grupo']}/{resultado['etapa']}: "
+                              f"{anterior['linhas_s']:,} -> {resultado['linhas_s']:,} linhas/s ({variacao:+.0%})")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da ingestão com planilhas sintéticas")
+    parser.add_argument('--linhas', type=int, nargs='+', default=list(TAMANHOS_PADRAO),
+                        help="Tamanhos da planilha de vendas")
+    parser.add_argument('--skus', type=int, default=SKUS_PADRAO, help="Linhas da aba de estoque")
+    parser.add_argument('--sujeira', type=float, default=0.01, help="Fração de células sujas")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--dsn', default=os.getenv('BENCHMARK_DSN'),
+                        help="Postgres local descartável para as etapas de carga (nunca o de produção)")
+    parser.add_argument('--limite-legado', type=int, default=LIMITE_LEGADO,
+                        help="Maior planilha para a conversão legada e a conferência de paridade")
+    parser.add_argument('--limite-legado-banco', type=int, default=LIMITE_LEGADO_BANCO,
+                        help="Maior planilha para a carga linha a linha")
+    parser.add_argument('--tracemalloc', action='store_true',
+                        help="Pico de memória por etapa via tracemalloc (mais lento) em vez do pico do processo")
+    parser.add_argument('--saida', help="Grava os resultados em JSON")
+    parser.add_argument('--comparar', help="JSON de uma execução anterior para detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help="Queda de vazão tolerada na comparação (0.25 = 25%%)")
+    args = parser.parse_args()
+
+    conn = preparar_banco(args.dsn) if args.dsn else None
+    if conn is None:
+        print("Sem --dsn: etapas de carga no banco não serão executadas")
+
+    medidor = Medidor(args.tracemalloc)
+    divergencias = 0
+    try:
+        for linhas in args.linhas:
+            divergencias += benchmark_vendas(medidor, linhas, conn, args)
+        benchmark_estoque(medidor, args.skus, conn, args)
+    finally:
+        if conn is not None:
+            conn.rollback()
+            conn.cursor().execute(f"DROP SCHEMA IF EXISTS {SCHEMA_BENCHMARK} CASCADE")
+            conn.commit()
+            conn.close()
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'argumentos': vars(args) | {'dsn': bool(args.dsn)},
+                       'resultados': medidor.resultados}, f, ensure_ascii=False, indent=2)
+
+    falhou = False
+    if divergencias:
+        print(f"\n❌ Conversão colunar diverge de tratar_valor em {divergencias} células")
+        falhou = True
+    if args.comparar:
+        regressoes = comparar(medidor.resultados, args.comparar, args.tolerancia)
+        for regressao in regressoes:
+            print(f"❌ Regressão: {regressao}")
+        falhou = falhou or bool(regressoes)
+    sys.exit(1 if falhou else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark da renderização dos PDFs: Platypus x canvas (pdf_leve.py).
+
+Monta dados sintéticos com N SKUs (todos vendidos ontem e no mês, com meta)
+e renderiza os relatórios diário e mensal nos dois modos. Cada medição roda
+em um processo Python novo, para que o pico de memória (RSS máximo) de um
+modo não contamine o outro; o RSS de base (módulos e dados já carregados)
+é informado à parte.
+
+Uso:
+    python benchmark_relatorio_pdf.py                        # 5000 SKUs
+    python benchmark_relatorio_pdf.py --skus 1000 5000 20000 --modos leve
+    python benchmark_relatorio_pdf.py --saida pdf.json
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+SKUS_PADRAO = (5000,)
+RELATORIOS = ('diario', 'mensal')
+MODOS = ('platypus', 'leve')
+
+
+def _rss_mb():
+    """RSS máximo do processo até agora, em MB (ru_maxrss é KB no Linux, bytes no macOS)"""
+    maximo = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return maximo / (1024 * 1024 if sys.platform == 'darwin' else 1024)
+
+
+def dados_diario(skus, semente=42):
+    """DadosRelatorio sintético: todos os SKUs vendidos ontem, anteontem e no mês"""
+    from dados_relatorio import DadosRelatorio, Totais
+
+    rng = np.random.default_rng(semente)
+    nomes = [f'SKU{i:06d}' for i in range(skus)]
+    janelas = []
+    for escala in (1, 1, 20):
+        valores = rng.uniform(10, 500, skus) * escala
+        unidades = rng.integers(1, 20, skus) * escala
+        janelas.append({sku: Totais(float(v), int(u), float(v) * 0.2)
+                        for sku, v, u in zip(nomes, valores, unidades)})
+    metas = {sku: float(m) for sku, m in zip(nomes, rng.choice([0, 2000, 5000, 10000], skus))}
+    margens = {sku: float(m) for sku, m in zip(nomes, rng.uniform(5, 40, skus))}
+    return DadosRelatorio(janelas[0], janelas[1], janelas[2], metas, margens, 21.5)
+
+
+def dados_mensal(skus, semente=42):
+    """(df_vendas, df_metas) sintéticos no formato de buscar_dados_vendas/buscar_metas"""
+    rng = np.random.default_rng(semente)
+    nomes = [f'SKU{i:06d}' for i in range(skus)]
+    valores = rng.uniform(100, 20000, skus)
+    df_vendas = pd.DataFrame({
+        'sku': nomes,
+        'total_vendas': rng.integers(1, 200, skus),
+        'unidades_vendidas': rng.integers(1, 400, skus),
+        'lucro_total': valores * 0.2,
+        'margem_media': rng.uniform(5, 40, skus),
+        'valor_total_vendido': valores,
+    })
+    df_metas = pd.DataFrame({
+        'sku': nomes,
+        'meta_vendas': rng.choice([0, 5000, 10000, 20000], skus),
+        'meta_margem': 20.0,
+    })
+    return df_vendas, df_metas
+
+
+def executar(relatorio, modo, skus, arquivo):
+    """Uma medição (no processo filho); retorna o resultado em dict"""
+    leve = modo == 'leve'
+    if relatorio == 'diario':
+        from gerar_enviar_relatorio import gerar_relatorio_pdf
+        from modelo_relatorio import montar_modelo
+        modelo = montar_modelo(dados_diario(skus))
+        base = _rss_mb()
+        inicio = time.perf_counter()
+        gerar_relatorio_pdf(modelo, date(2026, 10, 17), arquivo, leve=leve)
+    else:
+        from gerar_relatorio_mensal import renderizar_relatorio_mensal
+        df_vendas, df_metas = dados_mensal(skus)
+        base = _rss_mb()
+        inicio = time.perf_counter()
+        renderizar_relatorio_mensal(df_vendas, df_metas, '2026-10-01', arquivo, leve=leve)
+    return {
+        'relatorio': relatorio,
+        'modo': modo,
+        'skus': skus,
+        'segundos': round(time.perf_counter() - inicio, 3),
+        'rss_base_mb': round(base, 1),
+        'rss_pico_mb': round(_rss_mb(), 1),
+        'bytes_pdf': os.path.getsize(arquivo),
+    }
+
+
+def medir(relatorio, modo, skus, pasta):
+    """Roda executar() em um processo novo"""
+    arquivo = os.path.join(pasta, f'{relatorio}_{modo}_{skus}.pdf')
+    comando = [sys.executable, os.path.abspath(__file__), '--executar', relatorio, modo, str(skus), arquivo]
+    saida = subprocess.run(comando, check=True, capture_output=True, text=True).stdout
+    return json.loads(saida.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark da renderização dos PDFs dos relatórios")
+    parser.add_argument('--skus', type=int, nargs='+', default=list(SKUS_PADRAO))
+    parser.add_argument('--relatorios', nargs='+', choices=RELATORIOS, default=list(RELATORIOS))
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    parser.add_argument('--saida', help="Grava os resultados em JSON")
+    parser.add_argument('--executar', nargs=4, metavar=('RELATORIO', 'MODO', 'SKUS', 'ARQUIVO'),
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.executar:
+        relatorio, modo, skus, arquivo = args.executar
+        print(json.dumps(executar(relatorio, modo, int(skus), arquivo)))
+        return
+
+    resultados = []
+    print(f"{'Relatório':<10} {'Modo':<9} {'SKUs':>7} {'Tempo (s)':>10} {'RSS base':>9} {'RSS pico':>9} "
+          f"{'Acréscimo':>10} {'PDF (KB)':>9}")
+    with tempfile.TemporaryDirectory() as pasta:
+        for skus in args.skus:
+            for relatorio in args.relatorios:
+                for modo in args.modos:
+                    r = medir(relatorio, modo, skus, pasta)
+                    resultados.append(r)
+                    print(f"{relatorio:<10} {modo:<9} {skus:>7} {r['segundos']:>10.2f} {r['rss_base_mb']:>8.0f}M "
+                          f"{r['rss_pico_mb']:>8.0f}M {r['rss_pico_mb'] - r['rss_base_mb']:>9.0f}M "
+                          f"{r['bytes_pdf'] / 1024:>9.0f}")
+
+    if args.saida:
+        with open(args.saida, 'w') as f:
+            json.dump(resultados, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
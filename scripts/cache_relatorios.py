@@ -0,0 +1,137 @@
+"""Cache em disco dos relatórios, indexado por uma marca d'água dos dados.
+
+Antes de consultar e renderizar, o relatório calcula uma marca d'água barata
+do período: quantidade de linhas e maior atualizado_em do resumo diário no
+período e um hash das metas; o relatório diário, que lê dados de fora do
+período, acrescenta o maior atualizado_em geral (índice da migration
+add_indice_atualizado_em_vendas_diarias.sql). A chave
+da entrada junta a marca ao hash do código que gera o relatório. Se já
+existe no cache um PDF com a mesma chave, ele é reaproveitado; se só os
+agregados estão no cache, o PDF é renderizado a partir deles sem consultar
+o banco. Qualquer alteração nas vendas ou metas do período, ou no código,
+muda a chave.
+
+O diretório (CACHE_RELATORIOS_DIR, padrão .cache_relatorios) é limitado
+por idade (CACHE_RELATORIOS_DIAS) e tamanho (CACHE_RELATORIOS_MB): ao
+gravar, as entradas mais antigas são apagadas primeiro.
+"""
+import hashlib
+import logging
+import os
+import pickle
+import shutil
+import time
+
+import psycopg2
+
+DIRETORIO = os.getenv('CACHE_RELATORIOS_DIR', '.cache_relatorios')
+MAX_DIAS = float(os.getenv('CACHE_RELATORIOS_DIAS', '30'))
+MAX_MB = float(os.getenv('CACHE_RELATORIOS_MB', '200'))
+
+# Marca d'água de um período do resumo diário; {geral} recebe SQL_MARCA_GERAL
+# (ou nada) em marca_dagua()
+SQL_MARCA_DAGUA = """
+    SELECT
+        (SELECT COUNT(*) FROM vendas_diarias_sku WHERE dia >= %(inicio)s AND dia < %(fim)s),
+        (SELECT MAX(atualizado_em) FROM vendas_diarias_sku WHERE dia >= %(inicio)s AND dia < %(fim)s),{geral}
+        (SELECT md5(string_agg(concat_ws('|', sku, mes_ano, meta_vendas), ',' ORDER BY sku, mes_ano))
+         FROM metas_ml WHERE mes_ano < %(fim)s)
+"""
+
+# Alterações fora do período que entram no relatório (ex.: margem histórica
+# por SKU no diário); qualquer importação muda este valor
+SQL_MARCA_GERAL = """
+        (SELECT MAX(atualizado_em) FROM vendas_diarias_sku),"""
+
+
+def marca_dagua(conn, periodo, geral=False):
+    """Marca d'água (texto) dos dados do período [inicio, fim), ou None se não
+    for possível calculá-la (o relatório segue sem cache). Com geral=True
+    inclui o maior atualizado_em de todo o resumo diário, para relatórios que
+    leem dados de fora do período."""
+    try:
+        cur = conn.cursor()
+        sql = SQL_MARCA_DAGUA.format(geral=SQL_MARCA_GERAL if geral else '')
+        cur.execute(sql, {'inicio': periodo.inicio, 'fim': periodo.fim})
+        return '|'.join(str(valor) for valor in cur.fetchone())
+    except psycopg2.Error as e:
+        conn.rollback()
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"Marca d'água dos relatórios não calculada ({erro}); gerando sem cache")
+        return None
+
+
+def chave(relatorio, referencia, marca, arquivos_codigo=()):
+    """Nome da entrada: relatório, período e hash da marca d'água e do código"""
+    resumo = hashlib.sha1(marca.encode())
+    for arquivo in arquivos_codigo:
+        with open(arquivo, 'rb') as f:
+            resumo.update(f.read())
+    return f"{relatorio}_{referencia}_{resumo.hexdigest()[:16]}"
+
+
+def _caminho(nome, extensao):
+    return os.path.join(DIRETORIO, f"{nome}.{extensao}")
+
+
+def recuperar_pdf(nome, destino):
+    """Copia o PDF em cache para `destino`; retorna False se não houver"""
+    origem = _caminho(nome, 'pdf')
+    if not os.path.exists(origem):
+        return False
+    shutil.copyfile(origem, destino)
+    os.utime(origem)
+    return True
+
+
+def recuperar_dados(nome):
+    """Agregados em cache (ou None)"""
+    try:
+        with open(_caminho(nome, 'pkl'), 'rb') as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+
+
+def guardar(nome, dados=None, arquivo_pdf=None):
+    """Grava os agregados e/ou o PDF e aplica os limites de idade e tamanho"""
+    try:
+        os.makedirs(DIRETORIO, exist_ok=True)
+        if dados is not None:
+            temporario = _caminho(nome, 'pkl.tmp')
+            with open(temporario, 'wb') as f:
+                pickle.dump(dados, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, _caminho(nome, 'pkl'))
+        if arquivo_pdf:
+            temporario = _caminho(nome, 'pdf.tmp')
+            shutil.copyfile(arquivo_pdf, temporario)
+            os.replace(temporario, _caminho(nome, 'pdf'))
+        limpar()
+    except OSError as e:
+        logging.warning(f"Cache de relatórios não gravado ({e})")
+
+
+def limpar(max_dias=None, max_mb=None):
+    """Apaga entradas mais velhas que max_dias e, se passar de max_mb, as menos usadas"""
+    max_dias = MAX_DIAS if max_dias is None else max_dias
+    max_mb = MAX_MB if max_mb is None else max_mb
+    if not os.path.isdir(DIRETORIO):
+        return
+
+    agora = time.time()
+    arquivos = []
+    for entrada in os.scandir(DIRETORIO):
+        if not entrada.is_file():
+            continue
+        info = entrada.stat()
+        if agora - info.st_mtime > max_dias * 86400:
+            os.remove(entrada.path)
+        else:
+            arquivos.append((info.st_mtime, info.st_size, entrada.path))
+
+    total = sum(tamanho for _, tamanho, _ in arquivos)
+    for _, tamanho, caminho in sorted(arquivos):
+        if total <= max_mb * 1024 * 1024:
+            break
+        os.remove(caminho)
+        total -= tamanho
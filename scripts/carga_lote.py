@@ -0,0 +1,160 @@
+"""Carga em lote das vendas dos marketplaces.
+
+Pipeline comum aos importadores: as linhas da fonte passam pela conversão
+colunar (parser_colunar), recebem o hash do conteúdo e são gravadas com um
+COPY para uma tabela temporária seguido de um único INSERT ... ON CONFLICT
+que insere os pedidos novos e atualiza apenas os que mudaram.
+"""
+import csv
+import io
+
+import numpy as np
+
+import metricas
+from parser_colunar import AJUSTE_DATA, DATA, hash_conteudo, parsear_linhas, para_registros
+from quarentena import Rejeicao, rejeicoes_de_celulas
+
+
+def preparar_linhas(dados_planilha, esquema, chave, primeira_linha=2, divisor_moeda=100,
+                    ajuste_data=AJUSTE_DATA, exigir_completas=True, chaves_vistas=None):
+    """Valida e converte em bloco as linhas da fonte (com cabeçalho).
+
+    Retorna (linhas, rejeicoes). Cada linha é a tupla gravada pelo COPY:
+    (número da linha na origem, valores do esquema..., hash_linha). Linhas
+    sem a chave são ignoradas; linhas com data inválida (e, com
+    exigir_completas, linhas com menos colunas que o esquema) são rejeitadas,
+    pois abortariam o COPY ou gravariam dados truncados. Células inválidas
+    das demais linhas recebem o valor padrão 0 e também são listadas nas
+    rejeicoes (marcadas como carregadas) para revisão na quarentena.
+
+    chaves_vistas (um set compartilhado pelos lotes de uma mesma importação)
+    descarta as chaves já gravadas por lotes anteriores, para que a primeira
+    ocorrência vença também entre lotes e não seja sobrescrita a cada ciclo.
+    """
+    indices = {nome: indice for nome, indice, _ in esquema}
+    chave = (chave,) if isinstance(chave, str) else tuple(chave)
+    indices_chave = [indices[nome] for nome in chave]
+    largura = max(indices.values()) + 1
+
+    numeros = []
+    corpo = []
+    chaves_lote = set()
+    for numero, linha in enumerate(dados_planilha[1:], primeira_linha):
+        if all(len(linha) > indice and linha[indice] for indice in indices_chave):
+            if chaves_vistas is not None:
+                chave_linha = tuple(linha[indice].strip() for indice in indices_chave)
+                if chave_linha in chaves_vistas:
+                    continue
+                chaves_lote.add(chave_linha)
+            numeros.append(numero)
+            corpo.append(linha)
+    if chaves_vistas is not None:
+        chaves_vistas |= chaves_lote
+
+    incompletas = np.fromiter(map(len, corpo), dtype=np.int64, count=len(corpo)) < largura
+    if not exigir_completas and incompletas.any():
+        # A API omite as células vazias no fim da linha
+        corpo = [linha + [''] * (largura - len(linha)) if curta else linha
+                 for linha, curta in zip(corpo, incompletas)]
+        incompletas[:] = False
+
+    quadro, erros = parsear_linhas(corpo, esquema, divisor_moeda, ajuste_data)
+    for coluna, total in erros.sum().items():
+        if total:
+            print(f"Aviso: {total} valores inválidos na coluna {coluna} (usado o valor padrão 0)")
+
+    invalidas = incompletas.copy()
+    datas_invalidas = {nome: quadro[nome].isna().to_numpy() for nome, _, tipo in esquema if tipo == DATA}
+    for mascara in datas_invalidas.values():
+        invalidas |= mascara
+    rejeicoes = []
+    for indice in np.flatnonzero(invalidas):
+        linha = corpo[indice]
+        if incompletas[indice]:
+            coluna, valor = '', ''
+            motivo = f"linha incompleta ({len(linha)} de {largura} colunas)"
+        else:
+            coluna = next(nome for nome, mascara in datas_invalidas.items() if mascara[indice])
+            valor = linha[indices[coluna]]
+            motivo = f"data inválida '{valor}'"
+        identificacao = ' / '.join(linha[i] for i in indices_chave)
+        print(f"Erro ao processar linha {numeros[indice]}: {motivo} no pedido {identificacao}")
+        rejeicoes.append(Rejeicao(numeros[indice], coluna, valor, motivo, linha, False))
+
+    validas = ~invalidas
+    rejeicoes += rejeicoes_de_celulas(erros, corpo, numeros, esquema, validas)
+    registros = para_registros(quadro[validas], esquema)
+    hashes = hash_conteudo([linha for linha, valida in zip(corpo, validas) if valida], largura)
+    linhas = [(numero,) + registro + (hash_linha,)
+              for numero, registro, hash_linha
+              in zip(np.asarray(numeros, dtype=np.int64)[validas].tolist(), registros, hashes)]
+    return linhas, rejeicoes
+
+
+def mesclar_em_lote(cursor, tabela, colunas, chave, linhas, dias_alterados=None, coluna_data='data'):
+    """Grava as linhas de preparar_linhas() em `tabela`; retorna (novos, atualizados).
+
+    Mantém a primeira ocorrência de cada chave (como no caminho linha a linha)
+    e só reescreve os registros existentes cujo hash_linha mudou (os antigos,
+    ainda sem hash, são reescritos uma única vez). São duas idas ao banco.
+
+    Com dias_alterados (um set), acrescenta a ele os dias (de coluna_data)
+    dos registros inseridos ou reescritos, antes e depois da alteração, para
+    a atualização incremental do resumo diário (uma ida a mais ao banco).
+    """
+    chave = (chave,) if isinstance(chave, str) else tuple(chave)
+    colunas = tuple(colunas) + ('hash_linha',)
+    lista_colunas = ', '.join(colunas)
+    lista_chave = ', '.join(chave)
+    staging = f"staging_{tabela}"
+
+    # QUOTE_NONNUMERIC diferencia texto vazio ('""') de NULL no COPY
+    buffer = io.StringIO()
+    csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC).writerows(linhas)
+    metricas.contar('bytes_copy', buffer.tell())
+    buffer.seek(0)
+
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging} ON COMMIT DROP AS
+        SELECT 0::integer AS linha, {lista_colunas} FROM {tabela} WITH NO DATA
+    """)
+    cursor.copy_expert(
+        f"COPY {staging} (linha, {lista_colunas}) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+
+    retorno_dia = ''
+    agregado_dias = ''
+    if dias_alterados is not None:
+        # O dia antigo dos registros que serão reescritos (a data pode ter mudado)
+        cursor.execute(f"""
+            SELECT DISTINCT t.{coluna_data}::date
+            FROM {tabela} t JOIN {staging} s USING ({lista_chave})
+            WHERE t.hash_linha IS DISTINCT FROM s.hash_linha
+        """)
+        dias_alterados.update(dia for dia, in cursor.fetchall())
+        retorno_dia = f", {coluna_data}::date AS dia"
+        agregado_dias = ", ARRAY_AGG(DISTINCT dia)"
+
+    # xmax = 0 identifica as linhas inseridas (as demais foram atualizadas)
+    atualizacoes = ',\n                    '.join(
+        f"{coluna} = EXCLUDED.{coluna}" for coluna in colunas if coluna not in chave)
+    cursor.execute(f"""
+        WITH mescla AS (
+            INSERT INTO {tabela} ({lista_colunas})
+            SELECT DISTINCT ON ({lista_chave}) {lista_colunas}
+            FROM {staging}
+            ORDER BY {lista_chave}, linha
+            ON CONFLICT ({lista_chave}) DO UPDATE SET
+                {atualizacoes},
+                updated_at = CURRENT_TIMESTAMP
+            WHERE {tabela}.hash_linha IS DISTINCT FROM EXCLUDED.hash_linha
+            RETURNING (xmax = 0) AS inserido{retorno_dia}
+        )
+        SELECT COUNT(*) FILTER (WHERE inserido), COUNT(*) FILTER (WHERE NOT inserido){agregado_dias}
+        FROM mescla
+    """)
+    novos, atualizados, *dias = cursor.fetchone()
+    if dias and dias[0]:
+        dias_alterados.update(dias[0])
+    return novos, atualizados
@@ -0,0 +1,197 @@
+"""Conexões compartilhadas entre os importadores.
+
+Executados isoladamente, os scripts continuam abrindo uma conexão nova com
+o Postgres a cada chamada. Quando o daemon de ingestão chama iniciar_pool(),
+conectar_banco() passa a entregar conexões de um pool (devolvidas ao pool
+no close()), e o cliente do Google Sheets é autorizado uma única vez e
+reaproveitado por todos os ciclos.
+"""
+import threading
+import time
+
+import gspread
+import psycopg2
+from psycopg2 import extensions, pool
+from oauth2client.client import Error as ErroOAuth
+from oauth2client.service_account import ServiceAccountCredentials
+
+from config import DATABASE_CONFIG, GOOGLE_SHEETS_CREDENTIALS
+import metricas
+
+ESCOPO_GOOGLE = ['https://spreadsheets.google.com/feeds',
+                 'https://www.googleapis.com/auth/drive']
+
+# Conexões ociosas há mais tempo que isso são testadas antes de reutilizar
+# (o proxy do Railway derruba conexões paradas)
+SEGUNDOS_OCIOSA_SEM_TESTE = 60
+
+_trava = threading.Lock()
+_parametros_banco = dict(DATABASE_CONFIG)
+_pool = None
+_devolvida_em = {}
+_cliente_google = None
+_abas = {}
+
+# Tempo gasto abrindo conexões/autenticando, acumulado por thread (overhead do ciclo)
+_local = threading.local()
+
+
+def _contabilizar(inicio):
+    _local.tempo_conexao = getattr(_local, 'tempo_conexao', 0.0) + (time.perf_counter() - inicio)
+
+
+def zerar_tempo_conexao():
+    _local.tempo_conexao = 0.0
+
+
+def tempo_conexao():
+    """Segundos gastos nesta thread obtendo conexões desde zerar_tempo_conexao()"""
+    return getattr(_local, 'tempo_conexao', 0.0)
+
+
+def usar_banco(**parametros):
+    """Aponta conectar_banco() para outro banco (ex.: Postgres local do benchmark)"""
+    global _parametros_banco
+    encerrar_pool()
+    _parametros_banco = parametros
+
+
+def iniciar_pool(minimo=1, maximo=4):
+    """Passa a servir conectar_banco() a partir de um pool com até `maximo` conexões"""
+    global _pool
+    with _trava:
+        if _pool is None:
+            _pool = pool.ThreadedConnectionPool(minimo, maximo, **_parametros_banco)
+    return _pool
+
+
+def encerrar_pool():
+    global _pool
+    with _trava:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _devolvida_em.clear()
+
+
+class ConexaoDoPool:
+    """Conexão emprestada do pool: close() devolve ao pool em vez de fechar"""
+
+    def __init__(self, pool_conexoes, conexao):
+        object.__setattr__(self, '_pool', pool_conexoes)
+        object.__setattr__(self, '_conexao', conexao)
+
+    def __getattr__(self, nome):
+        return getattr(self._conexao, nome)
+
+    def __setattr__(self, nome, valor):
+        setattr(self._conexao, nome, valor)
+
+    def __enter__(self):
+        self._conexao.__enter__()
+        return self
+
+    def __exit__(self, *excecao):
+        return self._conexao.__exit__(*excecao)
+
+    def close(self):
+        conexao = self._conexao
+        if conexao is None:
+            return
+        object.__setattr__(self, '_conexao', None)
+        descartar = bool(conexao.closed)
+        if not descartar and conexao.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                conexao.rollback()
+            except psycopg2.Error:
+                descartar = True
+        _devolvida_em[id(conexao)] = time.monotonic()
+        self._pool.putconn(conexao, close=descartar)
+
+
+def _conexao_valida(conexao):
+    if conexao.closed:
+        return False
+    ociosa = time.monotonic() - _devolvida_em.get(id(conexao), time.monotonic())
+    if ociosa < SEGUNDOS_OCIOSA_SEM_TESTE:
+        return True
+    try:
+        with conexao.cursor() as cursor:
+            cursor.execute("SELECT 1")
+        conexao.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def conectar_banco():
+    """Conexão com o Postgres: do pool, se iniciado, ou uma conexão nova"""
+    inicio = time.perf_counter()
+    try:
+        if _pool is None:
+            return psycopg2.connect(**_parametros_banco, cursor_factory=metricas.fabrica_cursor())
+        conexao = _pool.getconn()
+        if not _conexao_valida(conexao):
+            _pool.putconn(conexao, close=True)
+            conexao = _pool.getconn()
+        conexao.cursor_factory = metricas.fabrica_cursor()
+        return ConexaoDoPool(_pool, conexao)
+    finally:
+        _contabilizar(inicio)
+
+
+def cliente_google():
+    """Cliente gspread autorizado uma única vez por processo"""
+    global _cliente_google
+    inicio = time.perf_counter()
+    try:
+        with _trava:
+            if _cliente_google is None:
+                creds = ServiceAccountCredentials.from_json_keyfile_name(
+                    GOOGLE_SHEETS_CREDENTIALS, ESCOPO_GOOGLE)
+                _cliente_google = gspread.authorize(creds)
+                # Bytes recebidos da API entram nas métricas da execução corrente
+                _cliente_google.session.hooks['response'].append(metricas.contar_resposta_http)
+            return _cliente_google
+    finally:
+        _contabilizar(inicio)
+
+
+def abrir_aba(nome_planilha, nome_aba):
+    """Aba da planilha, aberta uma vez e reaproveitada nos ciclos seguintes"""
+    chave = (nome_planilha, nome_aba)
+    aba = _abas.get(chave)
+    if aba is None:
+        cliente = cliente_google()
+        inicio = time.perf_counter()
+        try:
+            aba = cliente.open(nome_planilha).worksheet(nome_aba)
+        finally:
+            _contabilizar(inicio)
+        _abas[chave] = aba
+    return aba
+
+
+def erro_de_credencial(erro):
+    """Erro que invalida o cliente autorizado (token recusado ou expirado).
+    Planilha ou aba inexistente e falhas de rede não entram aqui."""
+    if isinstance(erro, ErroOAuth):
+        return True
+    resposta = getattr(erro, 'response', None)
+    return isinstance(erro, gspread.exceptions.APIError) and getattr(resposta, 'status_code', None) == 401
+
+
+def tratar_erro_planilha(erro):
+    """Após falha ao abrir uma aba: descarta o cliente compartilhado só se a
+    credencial foi recusada, sem afetar os outros importadores no caso de uma
+    planilha ausente ou renomeada (abas com erro nunca entram no cache)"""
+    if erro_de_credencial(erro):
+        descartar_cliente_google()
+
+
+def descartar_cliente_google():
+    """Força nova autenticação (após erro de credencial)"""
+    global _cliente_google
+    with _trava:
+        _cliente_google = None
+        _abas.clear()
@@ -0,0 +1,271 @@
+"""Carga dos dados do relatório diário de vendas em uma única consulta.
+
+Tudo o que o relatório usa (totais de ontem, de anteontem e do mês por SKU,
+metas, margens por SKU e a margem média do mês) vem de um só comando com
+CTEs sobre o resumo diário (vendas_diarias_sku), limitado às janelas de
+datas do relatório:
+
+- vendas: uma passada pelos dias de anteontem (ou do início do mês) até
+  ontem, com os totais de cada janela separados por FILTER; o mês também
+  para em ontem, então um dia reprocessado não soma as vendas posteriores;
+- margens: histórico só dos SKUs vendidos ontem (os únicos exibidos);
+- metas: a meta mais recente até o mês corrente dos SKUs vendidos no mês.
+
+Com `marketplace`, vendas e margens ficam restritas a esse marketplace (as
+metas são por SKU e valem para todos).
+
+Para reprocessar vários dias (carregar_dados_intervalo), uma única consulta
+traz os totais por SKU de cada dia do intervalo, com as metas de cada mês e
+as margens (GROUPING SETS); os DadosRelatorio de cada dia são montados em
+memória, com os totais do mês acumulados dia a dia, iguais aos de
+carregar_dados_relatorio.
+
+Executado diretamente, mede o tempo da carga:
+
+    python dados_relatorio.py [--repeticoes 5]
+"""
+import argparse
+import time
+from collections import namedtuple
+from datetime import date, timedelta
+
+import periodos
+
+Totais = namedtuple('Totais', ['total', 'quantidade', 'lucro'])
+
+# ontem/anteontem/mes: {sku: Totais}; metas e margens: {sku: float}
+DadosRelatorio = namedtuple('DadosRelatorio', [
+    'ontem', 'anteontem', 'mes', 'metas', 'margens', 'margem_media_mes',
+])
+
+SQL_DADOS_RELATORIO = """
+    WITH vendas AS (
+        SELECT
+            sku,
+            COUNT(*) FILTER (WHERE dia = %(ontem)s) AS linhas_ontem,
+            SUM(valor_vendido) FILTER (WHERE dia = %(ontem)s) AS valor_ontem,
+            SUM(unidades) FILTER (WHERE dia = %(ontem)s) AS unidades_ontem,
+            SUM(lucro) FILTER (WHERE dia = %(ontem)s) AS lucro_ontem,
+            COUNT(*) FILTER (WHERE dia = %(anteontem)s) AS linhas_anteontem,
+            SUM(valor_vendido) FILTER (WHERE dia = %(anteontem)s) AS valor_anteontem,
+            SUM(unidades) FILTER (WHERE dia = %(anteontem)s) AS unidades_anteontem,
+            SUM(lucro) FILTER (WHERE dia = %(anteontem)s) AS lucro_anteontem,
+            COUNT(*) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS linhas_mes,
+            SUM(valor_vendido) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS valor_mes,
+            SUM(unidades) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS unidades_mes,
+            SUM(lucro) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS lucro_mes,
+            SUM(soma_margem_lucro) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS soma_margem_mes,
+            SUM(pedidos) FILTER (WHERE dia >= %(inicio_mes)s AND dia < %(hoje)s) AS pedidos_mes
+        FROM vendas_diarias_sku
+        WHERE dia >= LEAST(%(anteontem)s::date, %(inicio_mes)s::date)
+        AND dia < %(hoje)s
+        AND (%(marketplace)s::text IS NULL OR marketplace = %(marketplace)s)
+        GROUP BY sku
+    ),
+    margens AS (
+        SELECT sku, SUM(soma_margem_venda) / SUM(pedidos_com_valor) AS margem
+        FROM vendas_diarias_sku
+        WHERE pedidos_com_valor > 0
+        AND (%(marketplace)s::text IS NULL OR marketplace = %(marketplace)s)
+        AND sku IN (SELECT sku FROM vendas WHERE linhas_ontem > 0)
+        GROUP BY sku
+    ),
+    metas AS (
+        SELECT DISTINCT ON (sku) sku, meta_vendas
+        FROM metas_ml
+        WHERE mes_ano < %(fim_mes)s
+        AND sku IN (SELECT sku FROM vendas WHERE linhas_mes > 0)
+        ORDER BY sku, mes_ano DESC
+    ),
+    mes AS (
+        SELECT SUM(soma_margem_mes) / NULLIF(SUM(pedidos_mes), 0) AS margem_media
+        FROM vendas
+    )
+    SELECT
+        v.sku,
+        v.linhas_ontem, v.valor_ontem, v.unidades_ontem, v.lucro_ontem,
+        v.linhas_anteontem, v.valor_anteontem, v.unidades_anteontem, v.lucro_anteontem,
+        v.linhas_mes, v.valor_mes, v.unidades_mes, v.lucro_mes,
+        mt.meta_vendas, mg.margem, mes.margem_media
+    FROM mes
+    LEFT JOIN vendas v ON TRUE
+    LEFT JOIN margens mg ON mg.sku = v.sku
+    LEFT JOIN metas mt ON mt.sku = v.sku
+"""
+
+
+SQL_DADOS_INTERVALO = """
+    WITH base AS (
+        SELECT sku, dia, date_trunc('month', dia)::date AS mes,
+               valor_vendido, unidades, lucro, soma_margem_lucro, pedidos
+        FROM vendas_diarias_sku
+        WHERE dia >= %(inicio)s AND dia < %(fim)s
+        AND (%(marketplace)s::text IS NULL OR marketplace = %(marketplace)s)
+    ),
+    totais AS (
+        -- nivel 0: (sku, dia), com os totais; 1: (sku, mês), só para metas e margens
+        SELECT
+            GROUPING(dia) AS nivel, mes, sku, dia,
+            COUNT(*) AS linhas, SUM(valor_vendido) AS valor, SUM(unidades) AS unidades, SUM(lucro) AS lucro,
+            SUM(soma_margem_lucro) AS soma_margem, SUM(pedidos) AS pedidos
+        FROM base
+        GROUP BY GROUPING SETS ((mes, sku, dia), (mes, sku))
+    ),
+    margens AS (
+        SELECT sku, SUM(soma_margem_venda) / SUM(pedidos_com_valor) AS margem
+        FROM vendas_diarias_sku
+        WHERE pedidos_com_valor > 0
+        AND (%(marketplace)s::text IS NULL OR marketplace = %(marketplace)s)
+        AND sku IN (SELECT sku FROM base WHERE dia >= %(de)s AND dia <= %(ate)s)
+        GROUP BY sku
+    )
+    SELECT t.nivel, t.mes, t.sku, t.dia, t.linhas, t.valor, t.unidades, t.lucro, t.soma_margem, t.pedidos,
+           mt.meta_vendas, mg.margem
+    FROM totais t
+    LEFT JOIN margens mg ON t.nivel = 1 AND mg.sku = t.sku
+    LEFT JOIN LATERAL (
+        SELECT meta_vendas
+        FROM metas_ml
+        WHERE t.nivel = 1 AND sku = t.sku AND mes_ano < t.mes + INTERVAL '1 month'
+        ORDER BY mes_ano DESC
+        LIMIT 1
+    ) mt ON TRUE
+"""
+
+
+def _totais(linhas, valor, unidades, lucro):
+    """Totais de uma janela, ou None se o SKU não teve vendas nela"""
+    if not linhas:
+        return None
+    return Totais(float(valor or 0), int(unidades or 0), float(lucro or 0))
+
+
+def parametros_relatorio(hoje=None, marketplace=None):
+    """Parâmetros de SQL_DADOS_RELATORIO para o relatório do dia anterior a `hoje`"""
+    hoje = hoje or date.today()
+    mes_atual = periodos.mes(hoje)
+    return {
+        'ontem': hoje - timedelta(days=1),
+        'anteontem': hoje - timedelta(days=2),
+        'inicio_mes': mes_atual.inicio,
+        'fim_mes': mes_atual.fim,
+        'hoje': hoje,
+        'marketplace': marketplace,
+    }
+
+
+def carregar_dados_relatorio(conn, hoje=None, marketplace=None):
+    """Busca os dados do relatório do dia anterior a `hoje` em uma ida ao banco"""
+    cur = conn.cursor()
+    cur.execute(SQL_DADOS_RELATORIO, parametros_relatorio(hoje, marketplace))
+    linhas = cur.fetchall()
+
+    ontem, anteontem, mes, metas, margens = {}, {}, {}, {}, {}
+    margem_media_mes = 0
+    for (sku, l_ontem, v_ontem, u_ontem, lu_ontem, l_ant, v_ant, u_ant, lu_ant,
+         l_mes, v_mes, u_mes, lu_mes, meta, margem, margem_media) in linhas:
+        margem_media_mes = float(margem_media) if margem_media else 0
+        if sku is None:
+            continue
+        for janela, totais in ((ontem, _totais(l_ontem, v_ontem, u_ontem, lu_ontem)),
+                               (anteontem, _totais(l_ant, v_ant, u_ant, lu_ant)),
+                               (mes, _totais(l_mes, v_mes, u_mes, lu_mes))):
+            if totais:
+                janela[sku] = totais
+        if meta is not None:
+            metas[sku] = float(meta) if meta else 0
+        if margem is not None:
+            margens[sku] = float(margem) if margem else 0
+
+    print(f"Dados encontrados: {len(ontem)} SKUs ontem, {len(anteontem)} anteontem, {len(mes)} no mês")
+    return DadosRelatorio(ontem, anteontem, mes, metas, margens, margem_media_mes)
+
+
+def carregar_dados_intervalo(conn, de, ate, marketplace=None):
+    """{dia: DadosRelatorio} dos relatórios de `de` a `ate` (dias do relatório,
+    os dois inclusive) em uma ida ao banco, seja qual for o número de dias.
+
+    Os totais e a margem média do mês de cada dia são acumulados em memória
+    do início do mês até o dia do relatório: vendas posteriores ficam de fora,
+    como no relatório gerado naquele dia."""
+    primeiro = parametros_relatorio(de + timedelta(days=1))
+    parametros = {
+        'inicio': min(primeiro['anteontem'], primeiro['inicio_mes']),
+        'fim': ate + timedelta(days=1),
+        'de': de,
+        'ate': ate,
+        'marketplace': marketplace,
+    }
+    cur = conn.cursor()
+    cur.execute(SQL_DADOS_INTERVALO, parametros)
+
+    # dias: {dia: {sku: (linhas, valor, unidades, lucro, soma_margem, pedidos)}}
+    dias, metas, margens = {}, {}, {}
+    for nivel, mes, sku, dia, linhas, valor, unidades, lucro, soma_margem, pedidos, meta, margem in cur.fetchall():
+        if nivel == 1:
+            if meta is not None:
+                metas.setdefault(mes, {})[sku] = float(meta) if meta else 0
+            if margem is not None:
+                margens[sku] = float(margem) if margem else 0
+        else:
+            dias.setdefault(dia, {})[sku] = (linhas, valor or 0, unidades or 0, lucro or 0,
+                                             soma_margem or 0, pedidos or 0)
+
+    def do_dia(dia):
+        return {sku: _totais(*valores[:4]) for sku, valores in dias.get(dia, {}).items()}
+
+    dados = {}
+    # Acumulado do mês: {sku: [linhas, valor, unidades, lucro]}, soma das margens
+    # e pedidos, dos dias de mes_acumulado até antes de `proximo`
+    mes_acumulado, proximo = None, None
+    dia = de
+    while dia <= ate:
+        hoje = dia + timedelta(days=1)
+        mes = periodos.mes(hoje).inicio
+        if mes != mes_acumulado:
+            acumulado, soma_margem_mes, pedidos_mes = {}, 0, 0
+            mes_acumulado, proximo = mes, mes
+        while proximo < hoje:
+            for sku, (linhas, valor, unidades, lucro, soma_margem, pedidos) in dias.get(proximo, {}).items():
+                totais = acumulado.setdefault(sku, [0, 0, 0, 0])
+                for i, parcela in enumerate((linhas, valor, unidades, lucro)):
+                    totais[i] += parcela
+                soma_margem_mes += soma_margem
+                pedidos_mes += pedidos
+            proximo += timedelta(days=1)
+
+        metas_mes = metas.get(mes, {})
+        margem_media = soma_margem_mes / pedidos_mes if pedidos_mes else 0
+        ontem = do_dia(dia)
+        dados[dia] = DadosRelatorio(
+            ontem, do_dia(dia - timedelta(days=1)),
+            {sku: _totais(*totais) for sku, totais in acumulado.items()},
+            {sku: metas_mes[sku] for sku in acumulado if sku in metas_mes},
+            {sku: margens[sku] for sku in ontem if sku in margens},
+            float(margem_media) if margem_media else 0,
+        )
+        dia = hoje
+
+    print(f"Dados encontrados: {len(dados)} dias de {de} a {ate}, {len(margens)} SKUs com margem")
+    return dados
+
+
+if __name__ == "__main__":
+    from gerar_enviar_relatorio import conectar_banco
+
+    parser = argparse.ArgumentParser(description="Mede a carga dos dados do relatório diário")
+    parser.add_argument('--repeticoes', type=int, default=5)
+    args = parser.parse_args()
+
+    conn = conectar_banco()
+    if conn:
+        try:
+            tempos = []
+            for _ in range(args.repeticoes):
+                inicio = time.perf_counter()
+                carregar_dados_relatorio(conn)
+                tempos.append(time.perf_counter() - inicio)
+            print(f"Carga dos dados do relatório: melhor {min(tempos) * 1000:.1f} ms, "
+                  f"média {sum(tempos) / len(tempos) * 1000:.1f} ms em {args.repeticoes} execuções")
+        finally:
+            conn.close()
@@ -0,0 +1,296 @@
+"""Daemon de ingestão: um único processo que executa todos os importadores.
+
+Substitui os laços `while True: main(); sleep()` de cada script. As tarefas
+ficam numa fila de prioridade ordenada pelo próximo horário de execução;
+cada tarefa tem seu intervalo (ancorado no horário agendado, sem acumular
+atraso) e um jitter aleatório, nunca roda sobreposta a si mesma e o
+processo encerra de forma limpa com SIGTERM/SIGINT, esperando os ciclos em
+andamento terminarem. O cliente do Google Sheets e as conexões com o banco
+(pool) são compartilhados entre todos os ciclos.
+
+Uso:
+    python daemon_ingestao.py
+    python daemon_ingestao.py --intervalo vendas=5 --intervalo estoque=30 --jitter 20
+"""
+import argparse
+import heapq
+import itertools
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configurado antes de importar os importadores (o basicConfig deles vira no-op)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+    handlers=[
+        logging.FileHandler('daemon_ingestao.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+
+import conexoes
+import importar_estoque
+import importar_vendas_ml
+import sincronizar_vendas
+
+# Intervalo padrão de cada tarefa, em minutos
+INTERVALOS_PADRAO = {
+    'vendas': 10,
+    'estoque': 10,
+}
+
+# Jitter máximo (segundos) somado a cada horário agendado
+JITTER_PADRAO = 30
+
+# Intervalo do resumo de latência/overhead no log, em minutos
+INTERVALO_RESUMO = 60
+
+
+def funcoes_das_tarefas(modo):
+    """Tarefas disponíveis no daemon: nome -> função sem argumentos que retorna sucesso"""
+    return {
+        # Todos os marketplaces em paralelo dentro do mesmo ciclo
+        'vendas': lambda: sincronizar_vendas.sincronizar(modo=modo),
+        'estoque': importar_estoque.main,
+    }
+
+
+class Tarefa:
+    """Tarefa periódica e suas estatísticas de execução"""
+
+    def __init__(self, nome, funcao, intervalo, jitter=0, trava_banco=True):
+        self.nome = nome
+        self.funcao = funcao
+        self.intervalo = intervalo
+        self.jitter = jitter
+        self.trava_banco = trava_banco
+        self.executando = threading.Lock()
+        self.base = None  # horário agendado sem jitter (time.monotonic)
+
+        self.ciclos = 0
+        self.falhas = 0
+        self.ignorados = 0
+        self.soma_atraso = 0.0
+        self.maior_atraso = 0.0
+        self.soma_overhead = 0.0
+        self.soma_duracao = 0.0
+
+    def proximo_horario(self, agora):
+        """Próximo horário: base + intervalo (pulando horários perdidos) + jitter"""
+        if self.base is None:
+            # Primeiro ciclo imediato, espalhado pelo jitter
+            self.base = agora
+        else:
+            self.base += self.intervalo
+            while self.base <= agora:
+                self.base += self.intervalo
+        return self.base + random.uniform(0, self.jitter)
+
+    def registrar(self, atraso, overhead, duracao, sucesso):
+        self.ciclos += 1
+        self.falhas += 0 if sucesso else 1
+        self.soma_atraso += atraso
+        self.maior_atraso = max(self.maior_atraso, atraso)
+        self.soma_overhead += overhead
+        self.soma_duracao += duracao
+
+    def resumo(self):
+        if not self.ciclos:
+            return f"[{self.nome}] nenhum ciclo executado ({self.ignorados} ignorados por sobreposição)"
+        return (f"[{self.nome}] {self.ciclos} ciclos ({self.falhas} com falha, {self.ignorados} ignorados) | "
+                f"atraso de início médio {self.soma_atraso / self.ciclos:.3f}s (máx {self.maior_atraso:.3f}s) | "
+                f"overhead médio {self.soma_overhead / self.ciclos:.3f}s | "
+                f"duração média {self.soma_duracao / self.ciclos:.2f}s")
+
+
+class Agendador:
+    """Fila de prioridade de tarefas despachadas para um pool de threads"""
+
+    def __init__(self, max_paralelo=2):
+        self.fila = []
+        self.sequencia = itertools.count()
+        self.tarefas = []
+        self.parar = threading.Event()
+        self.executor = ThreadPoolExecutor(max_workers=max_paralelo, thread_name_prefix='ingestao')
+
+    def adicionar(self, tarefa):
+        self.tarefas.append(tarefa)
+        self._agendar(tarefa, time.monotonic())
+
+    def _agendar(self, tarefa, agora):
+        heapq.heappush(self.fila, (tarefa.proximo_horario(agora), next(self.sequencia), tarefa))
+
+    def executar(self):
+        """Laço principal: dorme até o próximo horário ou até parar() ser chamado"""
+        while not self.parar.is_set():
+            if not self.fila:
+                self.parar.wait(1)
+                continue
+            horario, _, tarefa = self.fila[0]
+            espera = horario - time.monotonic()
+            if espera > 0:
+                self.parar.wait(espera)
+                continue
+
+            heapq.heappop(self.fila)
+            if tarefa.executando.acquire(blocking=False):
+                self.executor.submit(self._executar_tarefa, tarefa, horario)
+            else:
+                tarefa.ignorados += 1
+                logging.warning(f"⏭️  [{tarefa.nome}] ciclo anterior ainda em execução - ciclo ignorado")
+            self._agendar(tarefa, time.monotonic())
+
+        em_andamento = [t.nome for t in self.tarefas if t.executando.locked()]
+        if em_andamento:
+            logging.info(f"⏳ Aguardando ciclos em andamento: {', '.join(em_andamento)}")
+        self.executor.shutdown(wait=True)
+
+    def _executar_tarefa(self, tarefa, horario):
+        inicio = time.monotonic()
+        atraso = inicio - horario
+        conexoes.zerar_tempo_conexao()
+        trava = None
+        sucesso = False
+        tempo_funcao = 0.0
+        try:
+            if tarefa.trava_banco:
+                try:
+                    trava = self._travar_no_banco(tarefa)
+                except Exception as e:
+                    logging.error(f"❌ [{tarefa.nome}] erro ao obter a trava no banco: {e}")
+                    return
+                if trava is None:
+                    tarefa.ignorados += 1
+                    logging.warning(f"⏭️  [{tarefa.nome}] em execução por outro processo - ciclo ignorado")
+                    return
+
+            inicio_funcao = time.monotonic()
+            conexao_antes = conexoes.tempo_conexao()
+            try:
+                sucesso = bool(tarefa.funcao())
+            except (Exception, SystemExit) as e:
+                # Os importadores chamam exit() quando não conseguem conectar
+                logging.error(f"❌ [{tarefa.nome}] erro no ciclo: {e!r}")
+            # Tempo de conexão dentro da tarefa conta como overhead, não como trabalho
+            tempo_funcao = (time.monotonic() - inicio_funcao) - (conexoes.tempo_conexao() - conexao_antes)
+        finally:
+            if trava is not None:
+                self._destravar_no_banco(trava, tarefa)
+            tarefa.executando.release()
+
+            duracao = time.monotonic() - inicio
+            if trava is not None or not tarefa.trava_banco:
+                overhead = duracao - tempo_funcao
+                tarefa.registrar(atraso, overhead, duracao, sucesso)
+                logging.info(f"⏱️  [{tarefa.nome}] ciclo {tarefa.ciclos} {'concluído' if sucesso else 'com falha'} "
+                             f"em {duracao:.2f}s | atraso de início {atraso:.3f}s | "
+                             f"overhead {overhead:.3f}s (conexões {conexoes.tempo_conexao():.3f}s)")
+
+    def _travar_no_banco(self, tarefa):
+        """Advisory lock por tarefa: impede sobreposição com outra instância do daemon"""
+        conn = conexoes.conectar_banco()
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_try_advisory_lock(hashtext(%s))", (f"ingestao:{tarefa.nome}",))
+            obtida = cursor.fetchone()[0]
+            # A trava é de sessão: sobrevive ao commit e não deixa a transação aberta
+            conn.commit()
+            cursor.close()
+        except Exception:
+            conn.close()
+            raise
+        if not obtida:
+            conn.close()
+            return None
+        return conn
+
+    def _destravar_no_banco(self, conn, tarefa):
+        try:
+            cursor = conn.cursor()
+            cursor.execute("SELECT pg_advisory_unlock(hashtext(%s))", (f"ingestao:{tarefa.nome}",))
+            conn.commit()
+            cursor.close()
+        except Exception as e:
+            logging.warning(f"⚠️  [{tarefa.nome}] erro ao liberar a trava: {e}")
+        finally:
+            conn.close()
+
+    def registrar_resumo(self):
+        for tarefa in self.tarefas:
+            if tarefa.nome != 'resumo':
+                logging.info(f"📊 {tarefa.resumo()}")
+        return True
+
+
+def ler_intervalos(valores):
+    """Converte ['vendas=5', ...] em {'vendas': 5.0, ...} sobre os padrões"""
+    intervalos = dict(INTERVALOS_PADRAO)
+    for valor in valores or []:
+        nome, _, minutos = valor.partition('=')
+        if nome not in intervalos or not minutos:
+            raise argparse.ArgumentTypeError(f"Intervalo inválido: '{valor}' (use NOME=MINUTOS)")
+        intervalos[nome] = float(minutos)
+    return intervalos
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Executa os importadores em um único processo agendado")
+    parser.add_argument('--tarefas', nargs='+', choices=sorted(INTERVALOS_PADRAO),
+                        default=sorted(INTERVALOS_PADRAO), help="Tarefas a executar")
+    parser.add_argument('--intervalo', action='append', metavar='NOME=MINUTOS',
+                        help="Intervalo de uma tarefa em minutos (pode repetir)")
+    parser.add_argument('--jitter', type=float, default=JITTER_PADRAO,
+                        help="Atraso aleatório máximo, em segundos, somado a cada ciclo")
+    parser.add_argument('--paralelo', type=int, default=2, help="Tarefas executadas ao mesmo tempo")
+    parser.add_argument('--modo', choices=['lote', 'legado'], default=importar_vendas_ml.MODO_CARGA,
+                        help="Modo de carga das vendas do Mercado Livre")
+    parser.add_argument('--sem-trava-banco', action='store_true',
+                        help="Não usa advisory lock para evitar sobreposição entre processos")
+    args = parser.parse_args()
+
+    try:
+        intervalos = ler_intervalos(args.intervalo)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    # Por tarefa: uma conexão de trava e uma de trabalho por marketplace
+    marketplaces = len(sincronizar_vendas.marketplaces_disponiveis())
+    conexoes.iniciar_pool(1, args.paralelo * (marketplaces + 1) + 1)
+    agendador = Agendador(args.paralelo)
+
+    funcoes = funcoes_das_tarefas(args.modo)
+    for nome in args.tarefas:
+        agendador.adicionar(Tarefa(nome, funcoes[nome], intervalos[nome] * 60, args.jitter,
+                                   trava_banco=not args.sem_trava_banco))
+        logging.info(f"🗓️  Tarefa '{nome}' agendada a cada {intervalos[nome]:g} minutos (jitter até {args.jitter:g}s)")
+
+    resumo = Tarefa('resumo', agendador.registrar_resumo, INTERVALO_RESUMO * 60, trava_banco=False)
+    resumo.base = time.monotonic()  # primeiro resumo só depois de um intervalo
+    agendador.adicionar(resumo)
+
+    def encerrar(sinal, _frame):
+        if agendador.parar.is_set():
+            logging.warning("🛑 Segundo sinal recebido - encerrando imediatamente")
+            os._exit(1)
+        logging.info(f"🛑 Sinal {signal.Signals(sinal).name} recebido - encerrando após os ciclos em andamento")
+        agendador.parar.set()
+
+    signal.signal(signal.SIGTERM, encerrar)
+    signal.signal(signal.SIGINT, encerrar)
+
+    logging.info(f"🚀 Daemon de ingestão iniciado (PID {os.getpid()})")
+    try:
+        agendador.executar()
+    finally:
+        agendador.registrar_resumo()
+        conexoes.encerrar_pool()
+        logging.info("👋 Daemon de ingestão encerrado")
+
+
+if __name__ == "__main__":
+    main()
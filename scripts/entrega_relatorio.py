@@ -0,0 +1,188 @@
+"""Entrega dos relatórios: vários destinatários e canais em paralelo.
+
+Cada envio (canal, destinatário) roda em uma thread própria, então um canal
+lento ou fora do ar não atrasa nem derruba os outros. Falhas temporárias
+são repetidas com espera exponencial (ENTREGA_TENTATIVAS,
+ENTREGA_ESPERA_SEGUNDOS; ver falha_definitiva()) e cada
+envio termina em um Resultado com a quantidade de tentativas, a latência e
+o erro, se houver; os totais por canal entram nas métricas da execução.
+
+Um canal é só uma função `enviar(destinatario)`, o que permite testar a
+entrega com um servidor SMTP local (ex.: aiosmtpd) e um cliente de
+mensagens falso:
+
+    with SessaoSmtp('localhost', 8025, starttls=False) as sessao:
+        resultados = entregar({'email': lambda d: sessao.enviar(montar(d))},
+                              [Envio('email', 'a@x.com'), Envio('email', 'b@x.com')])
+
+O e-mail usa uma única sessão SMTP autenticada por execução (SessaoSmtp),
+compartilhada pelos destinatários: SMTP é um protocolo sequencial, então
+as mensagens passam uma de cada vez pela sessão, que é reaberta se o
+servidor a derrubar.
+"""
+import logging
+import os
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import metricas
+
+TENTATIVAS = int(os.getenv('ENTREGA_TENTATIVAS', '3'))
+ESPERA_SEGUNDOS = float(os.getenv('ENTREGA_ESPERA_SEGUNDOS', '2'))
+
+Envio = namedtuple('Envio', ['canal', 'destinatario'])
+
+# erro: tipo e mensagem da última falha, ou None se o envio deu certo
+Resultado = namedtuple('Resultado', ['canal', 'destinatario', 'sucesso', 'tentativas', 'segundos', 'erro'])
+
+
+def destinatarios(valor):
+    """Lista de destinatários de uma variável separada por vírgulas"""
+    return [item.strip() for item in (valor or '').split(',') if item.strip()]
+
+
+class SessaoSmtp:
+    """Conexão SMTP autenticada, aberta no primeiro envio e reaproveitada pelos seguintes"""
+
+    def __init__(self, host, porta, usuario=None, senha=None, starttls=True, timeout=30, fabrica=smtplib.SMTP):
+        self.host, self.porta = host, porta
+        self.usuario, self.senha = usuario, senha
+        self.starttls = starttls
+        self.timeout = timeout
+        self.fabrica = fabrica
+        self.conexoes = 0
+        self._servidor = None
+        self._trava = threading.Lock()
+
+    def _abrir(self):
+        servidor = self.fabrica(self.host, self.porta, timeout=self.timeout)
+        try:
+            if self.starttls:
+                servidor.starttls()
+            if self.usuario and self.senha:
+                servidor.login(self.usuario, self.senha)
+        except Exception:
+            servidor.close()
+            raise
+        self.conexoes += 1
+        return servidor
+
+    def enviar(self, mensagem):
+        with self._trava:
+            if self._servidor is None:
+                self._servidor = self._abrir()
+            try:
+                self._servidor.send_message(mensagem)
+            except smtplib.SMTPServerDisconnected:
+                self._descartar()
+                raise
+            except smtplib.SMTPException as e:
+                # Recusa do servidor (ex.: 451, 550): a sessão continua válida,
+                # exceto no 421, em que o smtplib já fechou a conexão
+                if 421 in _codigos_smtp(e):
+                    self._descartar()
+                raise
+            except OSError:
+                self._descartar()
+                raise
+
+    def _descartar(self):
+        # Sessão perdida: o próximo envio abre outra
+        self._servidor.close()
+        self._servidor = None
+
+    def fechar(self):
+        with self._trava:
+            if self._servidor is not None:
+                try:
+                    self._servidor.quit()
+                except (smtplib.SMTPException, OSError):
+                    self._servidor.close()
+                self._servidor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *excecao):
+        self.fechar()
+
+
+def _codigos_smtp(erro):
+    """Códigos SMTP de uma recusa (um por destinatário em SMTPRecipientsRefused)"""
+    if isinstance(erro, smtplib.SMTPRecipientsRefused):
+        return [codigo for codigo, _ in erro.recipients.values()]
+    if isinstance(erro, smtplib.SMTPResponseException):
+        return [erro.smtp_code]
+    return []
+
+
+def falha_definitiva(erro):
+    """Erros que não adianta repetir: credenciais e recusas SMTP 5xx (de todos
+    os destinatários) e respostas 4xx de APIs HTTP, como a do Twilio (exceto
+    429). Recusas 4xx (ex.: 450/451 de greylisting, 452) e 421 são repetidas."""
+    if isinstance(erro, smtplib.SMTPAuthenticationError):
+        return True
+    codigos = _codigos_smtp(erro)
+    if codigos:
+        return all(codigo >= 500 for codigo in codigos)
+    status = getattr(erro, 'status', None)
+    return isinstance(status, int) and 400 <= status < 500 and status != 429
+
+
+def com_novas_tentativas(funcao, tentativas=None, espera=None, dormir=time.sleep):
+    """Chama funcao() até dar certo, esperando espera, 2*espera, 4*espera... entre
+    as tentativas; retorna (tentativas feitas, última exceção ou None)"""
+    tentativas = TENTATIVAS if tentativas is None else tentativas
+    espera = ESPERA_SEGUNDOS if espera is None else espera
+    for tentativa in range(1, tentativas + 1):
+        try:
+            funcao()
+            return tentativa, None
+        except Exception as e:
+            erro = e
+            if falha_definitiva(e):
+                return tentativa, e
+            if tentativa < tentativas:
+                logging.warning(f"Falha na tentativa {tentativa} de {tentativas} ({type(e).__name__}: {e}); "
+                                f"nova tentativa em {espera * 2 ** (tentativa - 1):.1f}s")
+                dormir(espera * 2 ** (tentativa - 1))
+    return tentativas, erro
+
+
+def _enviar(canais, envio, tentativas, espera):
+    inicio = time.perf_counter()
+    feitas, erro = com_novas_tentativas(lambda: canais[envio.canal](envio.destinatario), tentativas, espera)
+    return Resultado(envio.canal, envio.destinatario, erro is None, feitas, time.perf_counter() - inicio,
+                     f"{type(erro).__name__}: {erro}" if erro else None)
+
+
+def entregar(canais, envios, tentativas=None, espera=None, threads=None):
+    """Faz os envios [Envio] em paralelo com as funções de `canais`
+    ({canal: enviar(destinatario)}); retorna os Resultados na ordem dos envios"""
+    envios = list(envios)
+    if not envios:
+        return []
+    with ThreadPoolExecutor(max_workers=threads or len(envios)) as executor:
+        resultados = list(executor.map(lambda envio: _enviar(canais, envio, tentativas, espera), envios))
+
+    for r in resultados:
+        if r.sucesso:
+            logging.info(f"📨 {r.canal} -> {r.destinatario}: entregue em {r.segundos:.2f}s ({r.tentativas} tentativa(s))")
+        else:
+            logging.error(f"❌ {r.canal} -> {r.destinatario}: falhou após {r.tentativas} tentativa(s) ({r.erro})")
+    registrar_metricas(resultados)
+    return resultados
+
+
+def registrar_metricas(resultados):
+    """Latência e resultado por canal nas métricas da execução corrente"""
+    for canal in sorted({r.canal for r in resultados}):
+        do_canal = [r for r in resultados if r.canal == canal]
+        # Latência do canal: o envio mais demorado (os envios correm em paralelo)
+        metricas.somar_etapa(f'envio_{canal}', max(r.segundos for r in do_canal))
+        metricas.contar(f'entregas_{canal}', sum(1 for r in do_canal if r.sucesso))
+        metricas.contar(f'falhas_entrega_{canal}', sum(1 for r in do_canal if not r.sucesso))
+        metricas.contar(f'tentativas_entrega_{canal}', sum(r.tentativas for r in do_canal))
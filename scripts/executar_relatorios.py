@@ -0,0 +1,224 @@
+"""Gera vários relatórios de uma vez, renderizando os PDFs em paralelo.
+
+Cada relatório é um job `tipo:AAAA-MM-DD[:marketplace]`:
+
+- diario: relatório de vendas do dia informado (o "ontem" do relatório);
+- mensal: relatório do mês que contém a data.
+
+Os dados são carregados no processo principal, em uma única conexão, uma vez
+por conjunto distinto (jobs repetidos viram um só; as metas de um mês são
+lidas uma vez para todos os marketplaces). Os relatórios diários de um
+marketplace saem de uma só consulta que cobre do primeiro ao último dia
+(dados_relatorio.carregar_dados_intervalo), então reprocessar um trimestre
+com --de/--ate custa uma carga, não uma por dia. A renderização — quase todo o
+tempo de um relatório, no doc.build de thread única do ReportLab — roda em um
+pool de processos com um processo por núcleo disponível, então um lote
+termina perto do tempo do relatório mais lento.
+
+Ao final grava <saida>/manifesto.json com um item por relatório (arquivo,
+tamanho, sha256 e quantidade de SKUs), em ordem de tipo, período e
+marketplace. Os PDFs são gerados em modo invariante do ReportLab (sem data
+de criação nem identificador aleatório), então os mesmos dados produzem o
+mesmo manifesto.
+
+    python executar_relatorios.py diario:2026-10-17 mensal:2026-10-01 mensal:2026-10-01:mercado_livre
+    python executar_relatorios.py diario:2026-10-17 --saida relatorios --processos 4
+    python executar_relatorios.py --de 2026-07-01 --ate 2026-09-30 --saida reprocessamento
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import psycopg2
+
+import metricas
+import periodos
+from dados_relatorio import carregar_dados_intervalo
+from gerar_enviar_relatorio import conectar_banco, gerar_relatorio_pdf
+from gerar_relatorio_mensal import buscar_dados_vendas, buscar_metas, renderizar_relatorio_mensal
+from modelo_relatorio import montar_modelo, skus_de_ontem
+
+TIPOS = ('diario', 'mensal')
+ARQUIVO_MANIFESTO = 'manifesto.json'
+
+# periodo: dia do relatório diário ou primeiro dia do mês; marketplace None = todos
+Job = namedtuple('Job', ['tipo', 'periodo', 'marketplace'])
+
+
+def ler_job(texto):
+    """Job a partir de 'tipo:AAAA-MM-DD[:marketplace]'"""
+    partes = texto.split(':', 2)
+    if len(partes) < 2 or partes[0] not in TIPOS:
+        raise argparse.ArgumentTypeError(f"job inválido '{texto}' (use tipo:AAAA-MM-DD[:marketplace], tipo em {TIPOS})")
+    try:
+        periodo = date.fromisoformat(partes[1])
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"data inválida em '{texto}'")
+    if partes[0] == 'mensal':
+        periodo = periodos.mes(periodo).inicio
+    marketplace = partes[2] if len(partes) > 2 and partes[2] else None
+    return Job(partes[0], periodo, marketplace)
+
+
+def jobs_intervalo(de, ate, marketplace=None):
+    """Jobs diários de `de` a `ate` (os dois inclusive)"""
+    return [Job('diario', de + timedelta(days=n), marketplace) for n in range((ate - de).days + 1)]
+
+
+def _ordem(job):
+    return (job.tipo, job.periodo, job.marketplace or '')
+
+
+def nome_arquivo(job):
+    """Nome do PDF do job (sem diretório)"""
+    sufixo = f"_{re.sub(r'[^0-9A-Za-z]+', '_', job.marketplace)}" if job.marketplace else ''
+    if job.tipo == 'diario':
+        return f"relatorio_vendas_{job.periodo.isoformat()}{sufixo}.pdf"
+    return f"relatorio_mensal_{job.periodo.strftime('%Y-%m')}{sufixo}.pdf"
+
+
+def carregar_dados(conn, jobs):
+    """{job: dados} com cada consulta feita uma única vez para o lote"""
+    dados, metas = {}, {}
+    diarios = {}
+    for job in jobs:
+        if job.tipo == 'diario':
+            diarios.setdefault(job.marketplace, []).append(job.periodo)
+    for marketplace, dias in diarios.items():
+        por_dia = carregar_dados_intervalo(conn, min(dias), max(dias), marketplace)
+        for dia in dias:
+            dados[Job('diario', dia, marketplace)] = por_dia[dia]
+
+    for job in jobs:
+        if job.tipo == 'mensal':
+            mes_ano = job.periodo.isoformat()
+            if job.periodo not in metas:
+                metas[job.periodo] = buscar_metas(conn, mes_ano)
+            dados[job] = (buscar_dados_vendas(conn, mes_ano, job.marketplace), metas[job.periodo])
+    return dados
+
+
+def _iniciar_processo():
+    # PDFs reprodutíveis: sem data de criação nem ID aleatório no arquivo
+    from reportlab import rl_config
+    rl_config.invariant = 1
+
+
+def renderizar(job, dados, arquivo):
+    """Renderiza um job (executa nos processos do pool); retorna (SKUs, segundos)"""
+    inicio = time.perf_counter()
+    if job.tipo == 'diario':
+        modelo = montar_modelo(dados)
+        gerar_relatorio_pdf(modelo, job.periodo, arquivo)
+        skus = len(skus_de_ontem(modelo))
+    else:
+        df_vendas, df_metas = dados
+        renderizar_relatorio_mensal(df_vendas, df_metas, job.periodo.isoformat(), arquivo)
+        skus = len(df_vendas)
+    return skus, time.perf_counter() - inicio
+
+
+def _sha256(caminho):
+    resumo = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1 << 20), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def nucleos_disponiveis():
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def renderizar_lote(jobs, dados, saida, processos=None):
+    """Renderiza os jobs em paralelo; retorna os itens do manifesto na ordem dos jobs"""
+    processos = min(len(jobs), processos or nucleos_disponiveis())
+    itens = []
+    with ProcessPoolExecutor(max_workers=processos, initializer=_iniciar_processo) as executor:
+        futuros = [executor.submit(renderizar, job, dados[job], os.path.join(saida, nome_arquivo(job)))
+                   for job in jobs]
+        for job, futuro in zip(jobs, futuros):
+            item = {
+                'tipo': job.tipo,
+                'periodo': job.periodo.isoformat(),
+                'marketplace': job.marketplace,
+                'arquivo': nome_arquivo(job),
+            }
+            try:
+                skus, segundos = futuro.result()
+            except Exception as e:
+                # Só o tipo do erro no manifesto: a mensagem pode trazer endereços de memória
+                logging.error(f"❌ {item['arquivo']}: {e}")
+                item['erro'] = type(e).__name__
+            else:
+                caminho = os.path.join(saida, item['arquivo'])
+                item.update(skus=skus, bytes=os.path.getsize(caminho), sha256=_sha256(caminho))
+                metricas.contar('bytes_pdf', item['bytes'])
+                logging.info(f"📄 {item['arquivo']}: {skus} SKUs em {segundos:.2f}s")
+            itens.append(item)
+    return itens
+
+
+def gravar_manifesto(itens, saida):
+    caminho = os.path.join(saida, ARQUIVO_MANIFESTO)
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'relatorios': itens}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    return caminho
+
+
+@metricas.medir_execucao('executar_relatorios')
+def main(jobs, saida='.', processos=None, dsn=None):
+    """Gera os relatórios dos jobs em `saida`; retorna True se todos foram gerados"""
+    jobs = sorted(set(jobs), key=_ordem)
+    os.makedirs(saida, exist_ok=True)
+
+    with metricas.etapa('conexao_banco'):
+        conn = psycopg2.connect(dsn, cursor_factory=metricas.fabrica_cursor()) if dsn else conectar_banco()
+    if not conn:
+        return False
+    try:
+        with metricas.etapa('consultas'):
+            dados = carregar_dados(conn, jobs)
+    finally:
+        conn.close()
+
+    with metricas.etapa('geracao_pdf'):
+        itens = renderizar_lote(jobs, dados, saida, processos)
+    manifesto = gravar_manifesto(itens, saida)
+
+    falhas = sum(1 for item in itens if 'erro' in item)
+    logging.info(f"✅ {len(itens) - falhas} de {len(itens)} relatórios gerados; manifesto em {manifesto}")
+    return falhas == 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Gera vários relatórios em paralelo")
+    parser.add_argument('jobs', nargs='*', type=ler_job, metavar='tipo:AAAA-MM-DD[:marketplace]')
+    parser.add_argument('--de', type=date.fromisoformat,
+                        help="Com --ate, acrescenta os relatórios diários de cada dia do intervalo")
+    parser.add_argument('--ate', type=date.fromisoformat)
+    parser.add_argument('--marketplace', help="Marketplace dos relatórios de --de/--ate (padrão: todos)")
+    parser.add_argument('--saida', default='.', help="Diretório dos PDFs e do manifesto")
+    parser.add_argument('--processos', type=int,
+                        help="Processos de renderização (padrão: núcleos disponíveis)")
+    parser.add_argument('--dsn', help="Conexão do Postgres (padrão: variáveis DB_* do relatório diário)")
+    args = parser.parse_args()
+    if bool(args.de) != bool(args.ate) or (args.de and args.de > args.ate):
+        parser.error("informe --de e --ate, com --de <= --ate")
+    if args.de:
+        args.jobs += jobs_intervalo(args.de, args.ate, args.marketplace)
+    if not args.jobs:
+        parser.error("informe ao menos um job ou --de/--ate")
+    sys.exit(0 if main(args.jobs, args.saida, args.processos, args.dsn) else 1)
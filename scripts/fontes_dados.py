@@ -0,0 +1,188 @@
+"""Fontes de dados dos importadores.
+
+Toda fonte entrega lotes no mesmo formato de get_all_values(): uma lista de
+linhas de strings com o cabeçalho na primeira posição. Assim o mesmo
+pipeline (conversão colunar -> carga em lote) serve tanto para a planilha do
+Google quanto para exportações locais em CSV, XLSX ou Parquet, usadas em
+cargas históricas e para testar os importadores sem rede.
+"""
+import abc
+import csv
+import os
+from collections import namedtuple
+from datetime import date, datetime
+
+# Linhas por lote ao ler arquivos grandes
+TAMANHO_LOTE_PADRAO = 50000
+
+# Formato de data exibido na planilha (o mesmo esperado pelo parser)
+FORMATO_DATA_PLANILHA = '%d/%m/%y %H:%M:%S'
+
+# dados: cabeçalho + linhas; primeira_linha: número (base 1) da linha dados[1] na origem
+Lote = namedtuple('Lote', ['dados', 'primeira_linha'])
+
+
+class FonteDados(abc.ABC):
+    """Interface das fontes: lotes() entrega os dados e confirmar() é chamado
+    depois que todos os lotes foram gravados no banco."""
+
+    descricao = 'fonte'
+
+    @abc.abstractmethod
+    def lotes(self):
+        """Gera os Lotes da fonte, cada um com o cabeçalho na primeira linha"""
+
+    def confirmar(self):
+        pass
+
+    def ler_tudo(self):
+        """Junta todos os lotes em uma única matriz (para fontes pequenas, como o estoque)"""
+        dados = None
+        for lote in self.lotes():
+            if dados is None:
+                dados = list(lote.dados)
+            else:
+                dados.extend(lote.dados[1:])
+        return dados or []
+
+
+class FontePlanilha(FonteDados):
+    """Aba do Google Sheets lida inteira com get_all_values()"""
+
+    def __init__(self, aba, tamanho_lote=None):
+        self.aba = aba
+        self.tamanho_lote = tamanho_lote
+        self.descricao = f"planilha '{getattr(aba, 'title', aba)}'"
+
+    def lotes(self):
+        dados = self.aba.get_all_values()
+        yield from dividir_em_lotes(dados, self.tamanho_lote)
+
+
+class FonteArquivo(FonteDados):
+    """Exportação local (CSV, XLSX ou Parquet) lida em lotes, sem carregar o arquivo inteiro.
+
+    Células numéricas e de data de XLSX/Parquet são convertidas para o texto
+    que a planilha exibiria (vírgula decimal, datas em dd/mm/aa HH:MM:SS),
+    então passam pelas mesmas regras de conversão dos dados do Google Sheets.
+    """
+
+    FORMATOS = ('.csv', '.txt', '.xlsx', '.xlsm', '.parquet', '.pq')
+
+    def __init__(self, caminho, tamanho_lote=TAMANHO_LOTE_PADRAO, aba=None,
+                 separador=None, codificacao='utf-8-sig'):
+        extensao = os.path.splitext(caminho)[1].lower()
+        if extensao not in self.FORMATOS:
+            raise ValueError(f"Formato de arquivo não suportado: {caminho} (use CSV, XLSX ou Parquet)")
+        self.caminho = caminho
+        self.extensao = extensao
+        self.tamanho_lote = tamanho_lote
+        self.aba = aba
+        self.separador = separador
+        self.codificacao = codificacao
+        self.descricao = f"arquivo '{caminho}'"
+
+    def lotes(self):
+        if self.extensao in ('.csv', '.txt'):
+            linhas = self._linhas_csv()
+        elif self.extensao in ('.xlsx', '.xlsm'):
+            linhas = self._linhas_xlsx()
+        else:
+            linhas = self._linhas_parquet()
+        yield from agrupar_linhas(linhas, self.tamanho_lote)
+
+    def _linhas_csv(self):
+        with open(self.caminho, newline='', encoding=self.codificacao) as f:
+            separador = self.separador
+            if separador is None:
+                amostra = f.read(64 * 1024)
+                f.seek(0)
+                try:
+                    separador = csv.Sniffer().sniff(amostra, delimiters=',;\t|').delimiter
+                except csv.Error:
+                    separador = ','
+            yield from csv.reader(f, delimiter=separador)
+
+    def _linhas_xlsx(self):
+        try:
+            from openpyxl import load_workbook
+        except ImportError:
+            raise RuntimeError("Leitura de XLSX requer o pacote openpyxl (pip install openpyxl)")
+
+        livro = load_workbook(self.caminho, read_only=True, data_only=True)
+        try:
+            planilha = livro[self.aba] if self.aba else livro.worksheets[0]
+            for linha in planilha.iter_rows():
+                yield [formatar_celula(celula.value, getattr(celula, 'number_format', None))
+                       for celula in linha]
+        finally:
+            livro.close()
+
+    def _linhas_parquet(self):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise RuntimeError("Leitura de Parquet requer o pacote pyarrow (pip install pyarrow)")
+
+        arquivo = pq.ParquetFile(self.caminho)
+        yield list(arquivo.schema_arrow.names)
+        for bloco in arquivo.iter_batches(batch_size=self.tamanho_lote):
+            colunas = [[formatar_celula(valor) for valor in coluna.to_pylist()]
+                       for coluna in bloco.columns]
+            yield from (list(linha) for linha in zip(*colunas))
+
+
+def formatar_celula(valor, formato_numero=None):
+    """Converte um valor tipado no texto que a planilha exibiria"""
+    if valor is None:
+        return ''
+    if isinstance(valor, str):
+        return valor
+    if isinstance(valor, bool):
+        return 'TRUE' if valor else 'FALSE'
+    if isinstance(valor, datetime):
+        return valor.strftime(FORMATO_DATA_PLANILHA)
+    if isinstance(valor, date):
+        return datetime(valor.year, valor.month, valor.day).strftime(FORMATO_DATA_PLANILHA)
+    if isinstance(valor, float) and formato_numero and '%' in formato_numero:
+        return _numero_pt_br(valor * 100) + '%'
+    if isinstance(valor, (int, float)):
+        return _numero_pt_br(valor)
+    return str(valor)
+
+
+def _numero_pt_br(valor):
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).replace('.', ',')
+
+
+def agrupar_linhas(linhas, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """Agrupa um iterador de linhas (cabeçalho primeiro) em lotes com o cabeçalho repetido"""
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        return
+
+    primeira_linha = 2
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if tamanho_lote and len(lote) >= tamanho_lote:
+            yield Lote([cabecalho] + lote, primeira_linha)
+            primeira_linha += len(lote)
+            lote = []
+    if lote:
+        yield Lote([cabecalho] + lote, primeira_linha)
+
+
+def dividir_em_lotes(dados, tamanho_lote=None, primeira_linha=2):
+    """Divide uma matriz já em memória (cabeçalho + linhas) em lotes"""
+    if not dados:
+        return
+    if not tamanho_lote:
+        yield Lote(dados, primeira_linha)
+        return
+    cabecalho = dados[0]
+    for inicio in range(1, len(dados), tamanho_lote):
+        yield Lote([cabecalho] + dados[inicio:inicio + tamanho_lote], primeira_linha + inicio - 1)
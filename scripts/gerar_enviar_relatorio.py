@@ -1,3 +1,4 @@
+import argparse
 import os
 from datetime import datetime, timedelta, date
 import psycopg2
@@ -8,7 +9,6 @@ from reportlab.lib import colors
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib.units import inch
 from dotenv import load_dotenv
-import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.mime.application import MIMEApplication
@@ -16,6 +16,19 @@ import requests
 import json
 from twilio.rest import Client
 import mimetypes
+import pandas as pd
+import metricas
+import periodos
+import cache_relatorios
+import dados_relatorio
+import modelo_relatorio
+from dados_relatorio import carregar_dados_relatorio
+from modelo_relatorio import montar_modelo, progresso_mensal, skus_de_ontem
+import pdf_leve
+import saidas_relatorio
+from entrega_relatorio import Envio, SessaoSmtp, destinatarios, entregar
+from pdf_leve import DocumentoLeve, EstiloLinha, Grade
+from saidas_relatorio import Conteudo, Secao
 
 # Carrega as variáveis de ambiente
 load_dotenv()
@@ -43,153 +56,98 @@ def conectar_banco():
             user=DB_CONFIG['user'],
             password=DB_CONFIG['password'],
             host=DB_CONFIG['host'],
-            port=DB_CONFIG['port']
+            port=DB_CONFIG['port'],
+            cursor_factory=metricas.fabrica_cursor()
         )
     except Exception as e:
         print(f"Erro ao conectar ao banco de dados: {str(e)}")
         return None
 
-def buscar_dados_dia(conn, data):
-    """Busca dados de vendas de um dia específico"""
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT 
-                sku,
-                SUM(valor_vendido) as valor_vendido,
-                SUM(unidades) as unidades,
-                SUM(lucro) as lucro
-            FROM vendas_ml
-            WHERE DATE(data) = %s
-            GROUP BY sku
-        """, (data,))
-        
-        resultados = cur.fetchall()
-        print(f"Dados encontrados para {data}: {len(resultados)} registros")
-        return resultados
-    except Exception as e:
-        print(f"Erro ao buscar dados do dia {data}: {str(e)}")
-        return []
+# Código que gera o relatório: alterá-lo invalida os PDFs em cache
+ARQUIVOS_CODIGO = [__file__, dados_relatorio.__file__, modelo_relatorio.__file__, pdf_leve.__file__]
 
-def buscar_dados_mes_atual(conn):
-    """Busca dados de vendas do mês atual"""
-    try:
-        cur = conn.cursor()
-        primeiro_dia_mes = date.today().replace(day=1)
-        
-        cur.execute("""
-            SELECT 
-                sku,
-                SUM(valor_vendido) as valor_vendido,
-                SUM(unidades) as unidades,
-                SUM(lucro) as lucro
-            FROM vendas_ml
-            WHERE DATE(data) >= %s
-            GROUP BY sku
-        """, (primeiro_dia_mes,))
-        
-        return cur.fetchall()
-    except Exception as e:
-        print(f"Erro ao buscar dados do mês: {str(e)}")
-        return []
+# Cores
+header_color = colors.HexColor('#303F9F')  # Azul médio elegante
+subheader_color = colors.HexColor('#3949AB')  # Azul um pouco mais claro
+background_color = colors.HexColor('#FAFAFA')  # Cinza muito claro
+border_color = colors.HexColor('#E0E0E0')  # Cinza claro para bordas
+status_colors = {
+    'success': colors.HexColor('#E8F5E9'),
+    'reachable': colors.HexColor('#E3F2FD'),
+    'warning': colors.HexColor('#FFF3E0'),
+    'danger': colors.HexColor('#FFEBEE'),
+    'undefined': colors.HexColor('#F5F5F5')
+}
+cor_alta = colors.HexColor('#1B5E20')
+cor_baixa = colors.HexColor('#B71C1C')
 
-def buscar_metas(conn):
-    """Busca as metas de vendas do banco de dados"""
-    try:
-        cur = conn.cursor()
-        cur.execute("SELECT sku, meta_vendas FROM metas_ml")
-        metas = {}
-        for sku, meta in cur.fetchall():
-            metas[sku] = float(meta) if meta else 0
-        return metas
-    except Exception as e:
-        print(f"Erro ao buscar metas: {str(e)}")
-        return {}
+# Acima disso o PDF é desenhado direto no canvas (pdf_leve.py)
+LIMITE_SKUS_PLATYPUS = int(os.getenv('RELATORIO_LIMITE_SKUS_PLATYPUS', '300'))
 
-def buscar_margens(conn):
-    """Busca as margens por SKU do banco de dados"""
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT 
-                sku,
-                AVG(CASE 
-                    WHEN valor_vendido > 0 
-                    THEN (lucro / valor_vendido) * 100
-                    ELSE 0 
-                END) as margem_media
-            FROM vendas_ml 
-            WHERE valor_vendido > 0
-            GROUP BY sku
-        """)
-        
-        margens = {}
-        for sku, margem in cur.fetchall():
-            margens[sku] = float(margem) if margem else 0
-        return margens
-    except Exception as e:
-        print(f"Erro ao buscar margens: {str(e)}")
-        return {}
+# Estilo comum dos quadros por SKU; cada quadro acrescenta só a cor do status e das variações
+ESTILO_SKU = TableStyle([
+    # Cabeçalho SKU
+    ('BACKGROUND', (0, 0), (0, 0), header_color),
+    ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0, 0), (-1, 0), 14),
+    # Subcabeçalho
+    ('BACKGROUND', (0, 1), (-1, 1), subheader_color),
+    ('TEXTCOLOR', (0, 1), (-1, 1), colors.white),
+    ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+    # Corpo
+    ('BACKGROUND', (0, 2), (-1, -1), background_color),
+    ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+    ('FONTNAME', (0, 2), (-1, -1), 'Helvetica'),
+    ('FONTSIZE', (0, 2), (-1, -1), 12),
+    # Espaçamento
+    ('TOPPADDING', (0, 0), (-1, -1), 8),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    # Bordas
+    ('GRID', (0, 0), (-1, -1), 1, border_color),
+    ('BOX', (0, 0), (-1, -1), 2, header_color),
+])
 
-def buscar_margem_media_mes(conn):
-    """Busca a média das margens de lucro de todos os pedidos do mês atual"""
-    try:
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT AVG(margem_lucro)
-            FROM vendas_ml
-            WHERE EXTRACT(MONTH FROM data) = EXTRACT(MONTH FROM CURRENT_DATE)
-            AND EXTRACT(YEAR FROM data) = EXTRACT(YEAR FROM CURRENT_DATE)
-        """)
-        
-        result = cur.fetchone()
-        return float(result[0]) if result[0] else 0
-    except Exception as e:
-        print(f"Erro ao buscar margem média do mês: {str(e)}")
-        return 0
+def nome_relatorio(ontem=None):
+    """Nome do PDF do relatório do dia `ontem` (padrão: ontem)"""
+    ontem = ontem or datetime.now() - timedelta(days=1)
+    return f'relatorio_vendas_{ontem.strftime("%Y-%m-%d")}.pdf'
 
-def calcular_totais(vendas):
-    """Calcula totais por SKU"""
-    totais = {}
-    for sku, valor_vendido, unidades, lucro in vendas:
-        if sku not in totais:
-            totais[sku] = {
-                'total': 0,
-                'quantidade': 0,
-                'lucro': 0
-            }
-        
-        valor = float(valor_vendido) if valor_vendido else 0
-        unids = int(unidades) if unidades else 0
-        luc = float(lucro) if lucro else 0
-        
-        totais[sku]['total'] += valor
-        totais[sku]['quantidade'] += unids
-        totais[sku]['lucro'] += luc
-    
-    return totais
+def linhas_sku(linha):
+    """Células do quadro de um SKU (linha de skus_de_ontem)"""
+    return [
+        [f'SKU: {linha.Index}', linha.status_text],
+        ['Indicador', 'Ontem', 'Hoje', 'Variação'],
+        ['Vendas', f'R$ {linha.total_anteontem:,.2f}', f'R$ {linha.total_ontem:,.2f}', f'{linha.var_vendas:+.1f}%'],
+        ['Lucro', f'R$ {linha.lucro_anteontem:,.2f}', f'R$ {linha.lucro_ontem:,.2f}', f'{linha.var_lucro:+.1f}%'],
+        ['Unidades', str(linha.quantidade_anteontem), str(linha.quantidade_ontem), '-'],
+        ['Margem', f'{linha.margem:.1f}%', '', ''],
+    ]
 
-def calcular_status_mensal(total_vendas, meta_vendas):
-    """Calcula o status do SKU baseado no progresso mensal"""
-    if not meta_vendas:
-        return 'undefined', 'Meta não definida'
-    
-    progresso = (total_vendas / meta_vendas * 100) if meta_vendas > 0 else 0
-    
-    if progresso >= 100:
-        return 'success', 'Meta atingida!'
-    elif progresso >= 60:
-        return 'reachable', 'Meta alcançável'
-    elif progresso >= 40:
-        return 'warning', 'Atenção necessária'
-    else:
-        return 'danger', 'Risco alto'
+def linhas_progresso(modelo):
+    """(células, cor de fundo) de cada linha da tabela de progresso mensal"""
+    for item in progresso_mensal(modelo).itertuples():
+        yield [
+            item.Index,
+            f'R$ {item.meta:,.2f}',
+            f'R$ {item.total_mes:,.2f}',
+            str(item.quantidade_mes),
+            f'{item.progresso:.1f}%',
+            item.status_text
+        ], status_colors.get(item.status_code, colors.white)
 
-def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens, margem_media_mes):
-    """Gera o relatório PDF"""
-    hoje = datetime.now()
-    ontem = hoje - timedelta(days=1)
-    nome_arquivo = f'relatorio_vendas_{ontem.strftime("%Y-%m-%d")}.pdf'
+def gerar_relatorio_pdf(modelo, ontem=None, nome_arquivo=None, leve=None):
+    """Gera o relatório PDF a partir de um ModeloRelatorio (só formata os valores).
+    
+    Com leve=True (padrão acima de LIMITE_SKUS_PLATYPUS SKUs) usa o
+    renderizador de canvas, com memória limitada qualquer que seja o catálogo.
+    """
+    ontem = ontem or datetime.now() - timedelta(days=1)
+    nome_arquivo = nome_arquivo or nome_relatorio(ontem)
+    if leve is None:
+        leve = len(modelo.skus) > LIMITE_SKUS_PLATYPUS
+    if leve:
+        return gerar_relatorio_pdf_leve(modelo, ontem, nome_arquivo)
     
     # Configuração da página
     doc = SimpleDocTemplate(
@@ -222,19 +180,6 @@ def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens,
         fontName='Helvetica-Bold'
     )
     
-    # Cores
-    header_color = colors.HexColor('#303F9F')  # Azul médio elegante
-    subheader_color = colors.HexColor('#3949AB')  # Azul um pouco mais claro
-    background_color = colors.HexColor('#FAFAFA')  # Cinza muito claro
-    border_color = colors.HexColor('#E0E0E0')  # Cinza claro para bordas
-    status_colors = {
-        'success': colors.HexColor('#E8F5E9'),
-        'reachable': colors.HexColor('#E3F2FD'),
-        'warning': colors.HexColor('#FFF3E0'),
-        'danger': colors.HexColor('#FFEBEE'),
-        'undefined': colors.HexColor('#F5F5F5')
-    }
-    
     elements = []
     
     # Título do relatório
@@ -247,26 +192,15 @@ def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens,
     elements.append(subtitle)
     elements.append(Spacer(1, 20))
     
-    # Calcular totais
-    totais_ontem = calcular_totais(dados_ontem)
-    status_mensais = {}
-    totais_mes = calcular_totais(dados_mes)
-    for sku in totais_mes.keys():
-        vendas = totais_mes[sku]
-        meta = metas.get(sku, 0)
-        status_code, status_text = calcular_status_mensal(vendas['total'], meta)
-        status_mensais[sku] = {'code': status_code, 'text': status_text}
-    
     # Resumo Geral
-    total_vendas = sum(dados['total'] for dados in totais_ontem.values())
-    total_unidades = sum(dados['quantidade'] for dados in totais_ontem.values())
-    total_lucro = sum(dados['lucro'] for dados in totais_ontem.values())
+    resumo = modelo.resumo
+    margem_media_mes = modelo.margem_media_mes
     
     resumo_data = [
         ['Resumo Geral'],
-        ['Total de Vendas', f'R$ {total_vendas:,.2f}'],
-        ['Total de Unidades', str(total_unidades)],
-        ['Total de Lucro', f'R$ {total_lucro:,.2f}'],
+        ['Total de Vendas', f'R$ {resumo.total:,.2f}'],
+        ['Total de Unidades', str(resumo.quantidade)],
+        ['Total de Lucro', f'R$ {resumo.lucro:,.2f}'],
         ['Margem Média Mensal', f'{margem_media_mes:.1f}%'],
     ]
     
@@ -294,57 +228,18 @@ def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens,
     elements.append(Spacer(1, 30))
     
     # Detalhes por SKU
-    for sku in sorted(totais_ontem.keys()):
-        dados = totais_ontem[sku]
-        dados_ant = calcular_totais(dados_anteontem).get(sku, {'total': 0, 'quantidade': 0, 'lucro': 0})
-        status_mensal = status_mensais.get(sku, {'code': 'undefined', 'text': 'Meta não definida'})
-        
-        # Calcular variações
-        var_vendas = ((dados['total'] - dados_ant['total']) / dados_ant['total'] * 100) if dados_ant['total'] > 0 else 0
-        var_lucro = ((dados['lucro'] - dados_ant['lucro']) / dados_ant['lucro'] * 100) if dados_ant['lucro'] > 0 else 0
-        margem_sku = margens.get(sku, 0)
-        
+    for linha in skus_de_ontem(modelo).itertuples():
         # Nova estrutura mais compacta e intuitiva
-        sku_data = [
-            [f'SKU: {sku}', status_mensal['text']],
-            ['Indicador', 'Ontem', 'Hoje', 'Variação'],
-            ['Vendas', f'R$ {dados_ant["total"]:,.2f}', f'R$ {dados["total"]:,.2f}', f'{var_vendas:+.1f}%'],
-            ['Lucro', f'R$ {dados_ant["lucro"]:,.2f}', f'R$ {dados["lucro"]:,.2f}', f'{var_lucro:+.1f}%'],
-            ['Unidades', str(dados_ant['quantidade']), str(dados['quantidade']), '-'],
-            ['Margem', f'{margem_sku:.1f}%', '', ''],
-        ]
-        
-        t_sku = Table(sku_data, colWidths=[1.5*inch, 2*inch, 2*inch, 1.5*inch])
-        
-        t_sku.setStyle(TableStyle([
-            # Cabeçalho SKU
-            ('BACKGROUND', (0, 0), (0, 0), header_color),
-            ('BACKGROUND', (1, 0), (1, 0), status_colors[status_mensal['code']]),
-            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 14),
-            # Subcabeçalho
-            ('BACKGROUND', (0, 1), (-1, 1), subheader_color),
-            ('TEXTCOLOR', (0, 1), (-1, 1), colors.white),
-            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
-            # Corpo
-            ('BACKGROUND', (0, 2), (-1, -1), background_color),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 2), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 2), (-1, -1), 12),
-            # Espaçamento
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            # Bordas
-            ('GRID', (0, 0), (-1, -1), 1, border_color),
-            ('BOX', (0, 0), (-1, -1), 2, header_color),
+        t_sku = Table(linhas_sku(linha), colWidths=[1.5*inch, 2*inch, 2*inch, 1.5*inch])
+        t_sku.setStyle(ESTILO_SKU)
+        t_sku.setStyle([
+            ('BACKGROUND', (1, 0), (1, 0), status_colors[linha.status_code]),
             # Variações
-            ('TEXTCOLOR', (3, 2), (3, -2), colors.HexColor('#1B5E20') if var_vendas > 0 else colors.HexColor('#B71C1C')),
-        ]))
+            ('TEXTCOLOR', (3, 2), (3, -2), cor_alta if linha.var_vendas > 0 else cor_baixa),
+        ])
+        t_sku.hAlign = 'CENTER'
         
-        elements.append(Table([[t_sku]], colWidths=[8.2*inch], style=[
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-        ]))
+        elements.append(t_sku)
         elements.append(Spacer(1, 20))
     
     elements.append(PageBreak())
@@ -354,42 +249,15 @@ def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens,
     elements.append(subtitle)
     elements.append(Spacer(1, 20))
     
-    # Preparar e ordenar dados
-    progress_data = []
-    for sku in totais_mes.keys():
-        vendas = totais_mes[sku]
-        meta = metas.get(sku, 0)
-        progresso = (vendas['total'] / meta * 100) if meta > 0 else 0
-        status_code, status_text = calcular_status_mensal(vendas['total'], meta)
-        
-        progress_data.append({
-            'sku': sku,
-            'meta': meta,
-            'vendas': vendas['total'],
-            'unidades': vendas['quantidade'],
-            'progresso': progresso,
-            'status_code': status_code,
-            'status_text': status_text
-        })
-    
-    progress_data.sort(key=lambda x: x['progresso'], reverse=True)
-    
     # Tabela de progresso
     table_data = [
         ['SKU', 'Meta Mensal', 'Vendas Atual', 'Unidades', 'Progresso', 'Status']
     ]
     
     row_colors = []
-    for item in progress_data:
-        table_data.append([
-            item['sku'],
-            f'R$ {item["meta"]:,.2f}',
-            f'R$ {item["vendas"]:,.2f}',
-            str(item['unidades']),
-            f'{item["progresso"]:.1f}%',
-            item['status_text']
-        ])
-        row_colors.append(status_colors.get(item['status_code'], colors.white))
+    for celulas, cor in linhas_progresso(modelo):
+        table_data.append(celulas)
+        row_colors.append(cor)
     
     progress_table = Table(
         table_data,
@@ -420,100 +288,275 @@ def gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens,
     
     progress_table.setStyle(TableStyle(table_style))
     
-    # Centralizar tabela de progresso
-    elements.append(Table([[progress_table]], colWidths=[8.2*inch], style=[
-        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-    ]))
+    # Centralizar tabela de progresso (fora de outra Table, para poder quebrar entre páginas)
+    progress_table.hAlign = 'CENTER'
+    elements.append(progress_table)
     
     # Gerar PDF
     doc.build(elements)
     return nome_arquivo
 
-def enviar_email(arquivo_pdf):
-    """Envia o relatório por e-mail"""
-    try:
-        # Configurações do e-mail
-        remetente = os.getenv('EMAIL_REMETENTE')
-        senha = os.getenv('EMAIL_SENHA')
-        destinatario = os.getenv('EMAIL_DESTINATARIO')
-        
-        # Criar mensagem
-        msg = MIMEMultipart()
-        msg['From'] = remetente
-        msg['To'] = destinatario
-        msg['Subject'] = f"Relatório de Vendas - {datetime.now().strftime('%d/%m/%Y')}"
-        
-        # Corpo do e-mail
+def gerar_relatorio_pdf_leve(modelo, ontem, nome_arquivo):
+    """Mesmo relatório de gerar_relatorio_pdf desenhado direto no canvas"""
+    doc = DocumentoLeve(nome_arquivo, pagesize=letter)
+    cabecalho = EstiloLinha('Helvetica-Bold', 16, header_color, colors.white, 36)
+    corpo = EstiloLinha('Helvetica', 12, background_color, colors.black, 36)
+    
+    doc.titulo(f"Relatório de Vendas\n{ontem.strftime('%d/%m/%Y')}", 'Helvetica-Bold', 28,
+               colors.HexColor('#1A237E'), 40)
+    doc.titulo("Parte 1: Comparação de Vendas", 'Helvetica-Bold', 22, colors.HexColor('#303F9F'), 30)
+    
+    # Resumo Geral
+    resumo = modelo.resumo
+    grade_resumo = Grade((6*inch,), border_color, header_color, 2)
+    grade_valores = Grade((3*inch, 3*inch), border_color, header_color, 2)
+    doc.garantir(5 * corpo.altura)
+    topo = doc.linha(['Resumo Geral'], grade_resumo, cabecalho)
+    for rotulo, valor in (('Total de Vendas', f'R$ {resumo.total:,.2f}'),
+                          ('Total de Unidades', str(resumo.quantidade)),
+                          ('Total de Lucro', f'R$ {resumo.lucro:,.2f}'),
+                          ('Margem Média Mensal', f'{modelo.margem_media_mes:.1f}%')):
+        doc.linha([rotulo, valor], grade_valores, corpo)
+    doc.borda(grade_resumo, topo)
+    doc.espaco(30)
+    
+    # Detalhes por SKU: estilos montados uma vez para todos os quadros
+    grade_sku = Grade((1.5*inch, 2*inch, 2*inch, 1.5*inch), border_color, header_color, 2)
+    titulo_sku = EstiloLinha('Helvetica-Bold', 14, None, colors.black, 30)
+    subtitulo_sku = EstiloLinha('Helvetica-Bold', 10, subheader_color, colors.white, 28)
+    corpo_sku = EstiloLinha('Helvetica', 12, background_color, colors.black, 28)
+    cores_variacao = {True: (colors.black,) * 3 + (cor_alta,), False: (colors.black,) * 3 + (cor_baixa,)}
+    for linha in skus_de_ontem(modelo).itertuples():
+        celulas = linhas_sku(linha)
+        variacao = cores_variacao[linha.var_vendas > 0]
+        doc.bloco([
+            (celulas[0] + ['', ''], titulo_sku,
+             (header_color, status_colors[linha.status_code], colors.white, colors.white),
+             (colors.white, colors.black, colors.black, colors.black)),
+            (celulas[1], subtitulo_sku, None, None),
+            (celulas[2], corpo_sku, None, variacao),
+            (celulas[3], corpo_sku, None, variacao),
+            (celulas[4], corpo_sku, None, variacao),
+            (celulas[5], corpo_sku, None, None),
+        ], grade_sku)
+        doc.espaco(20)
+    
+    # Parte 2: Progresso Mensal
+    doc.nova_pagina()
+    doc.titulo("Parte 2: Progresso Mensal de Vendas", 'Helvetica-Bold', 22, colors.HexColor('#303F9F'), 30)
+    doc.tabela(
+        ['SKU', 'Meta Mensal', 'Vendas Atual', 'Unidades', 'Progresso', 'Status'],
+        EstiloLinha('Helvetica-Bold', 12, header_color, colors.white, 36),
+        Grade((1.2*inch, 1.5*inch, 1.5*inch, 1*inch, 1*inch, 2*inch), border_color, header_color, 2),
+        linhas_progresso(modelo),
+        EstiloLinha('Helvetica', 10, colors.white, colors.black, 36),
+    )
+    
+    doc.salvar()
+    return nome_arquivo
+
+def conteudo_relatorio(modelo, ontem=None):
+    """Conteudo (saidas_relatorio) do relatório: as mesmas tabelas do PDF e o quadro por SKU"""
+    ontem = ontem or datetime.now() - timedelta(days=1)
+    def secoes():
+        resumo = modelo.resumo
+        comparacao = []
+        for linha in skus_de_ontem(modelo).itertuples():
+            celulas = linhas_sku(linha)
+            comparacao.append(([linha.Index, linha.status_text] + celulas[2][1:] + celulas[3][1:]
+                               + celulas[4][1:3] + [celulas[5][1]], status_colors[linha.status_code]))
+        return [
+            Secao('Resumo Geral', ['Indicador', 'Valor'], [
+                (['Total de Vendas', f'R$ {resumo.total:,.2f}'], None),
+                (['Total de Unidades', str(resumo.quantidade)], None),
+                (['Total de Lucro', f'R$ {resumo.lucro:,.2f}'], None),
+                (['Margem Média Mensal', f'{modelo.margem_media_mes:.1f}%'], None),
+            ]),
+            Secao('Parte 1: Comparação de Vendas', [
+                'SKU', 'Status', 'Vendas ontem', 'Vendas hoje', 'Variação', 'Lucro ontem', 'Lucro hoje',
+                'Variação', 'Unidades ontem', 'Unidades hoje', 'Margem',
+            ], comparacao),
+            Secao('Parte 2: Progresso Mensal de Vendas',
+                  ['SKU', 'Meta Mensal', 'Vendas Atual', 'Unidades', 'Progresso', 'Status'],
+                  list(linhas_progresso(modelo))),
+        ]
+    
+    dados = modelo.skus.reset_index()
+    dados.insert(0, 'dia', pd.Timestamp(ontem).normalize())
+    dados['margem_media_mes'] = modelo.margem_media_mes
+    return Conteudo(f"Relatório de Vendas {ontem.strftime('%d/%m/%Y')}", secoes, dados)
+
+def mensagem_email(destinatario, arquivo_pdf=None, html=None):
+    """E-mail do relatório para um destinatário (PDF em anexo e/ou HTML no corpo)"""
+    msg = MIMEMultipart()
+    msg['From'] = os.getenv('EMAIL_REMETENTE')
+    msg['To'] = destinatario
+    msg['Subject'] = f"Relatório de Vendas - {datetime.now().strftime('%d/%m/%Y')}"
+    
+    # Corpo do e-mail
+    if html:
+        msg.attach(MIMEText(html, 'html', 'utf-8'))
+    else:
         corpo = "Segue em anexo o relatório de vendas."
         msg.attach(MIMEText(corpo, 'plain'))
-        
-        # Anexar PDF
+    
+    # Anexar PDF
+    if arquivo_pdf:
         with open(arquivo_pdf, "rb") as f:
             part = MIMEApplication(f.read(), _subtype="pdf")
             part.add_header('Content-Disposition', 'attachment', filename=arquivo_pdf)
             msg.attach(part)
-        
-        # Enviar e-mail
-        server = smtplib.SMTP('smtp.gmail.com', 587)
-        server.starttls()
-        server.login(remetente, senha)
-        server.send_message(msg)
-        server.quit()
-        
-        print("Relatório enviado com sucesso!")
-    except Exception as e:
-        print(f"Erro ao enviar e-mail: {str(e)}")
+    return msg
 
-def enviar_whatsapp(arquivo_pdf):
-    """Envia o relatório por WhatsApp usando Twilio"""
-    try:
-        # Configurações do Twilio
-        account_sid = 'AC59c08fd41f93aa7c44ce1fa6c0dc6ec1'
-        auth_token = '06c1ea753ec043afeee3ed15f9de572f'
-        client = Client(account_sid, auth_token)
+def sessao_smtp():
+    """Sessão SMTP da execução (SMTP_HOST/SMTP_PORT, padrão Gmail com STARTTLS)"""
+    return SessaoSmtp(os.getenv('SMTP_HOST', 'smtp.gmail.com'), int(os.getenv('SMTP_PORT', '587')),
+                      os.getenv('EMAIL_REMETENTE'), os.getenv('EMAIL_SENHA'),
+                      starttls=os.getenv('SMTP_STARTTLS', '1') != '0')
+
+def cliente_whatsapp():
+    """Cliente do Twilio (TWILIO_ACCOUNT_SID/TWILIO_AUTH_TOKEN), ou None se não configurado"""
+    account_sid = os.getenv('TWILIO_ACCOUNT_SID')
+    auth_token = os.getenv('TWILIO_AUTH_TOKEN')
+    if not (account_sid and auth_token):
+        return None
+    return Client(account_sid, auth_token)
+
+def _numero_whatsapp(numero):
+    return numero if numero.startswith('whatsapp:') else f'whatsapp:{numero}'
 
-        # Enviamos a mensagem com o PDF
-        data_hoje = datetime.now().strftime('%d/%m/%Y')
-        message = client.messages.create(
-            from_='whatsapp:+14155238886',
+def canal_whatsapp(cliente):
+    """Função de envio do relatório por WhatsApp a um número, com o `cliente` do Twilio"""
+    remetente = _numero_whatsapp(os.getenv('TWILIO_WHATSAPP_NUMBER', '+14155238886'))
+    data_hoje = datetime.now().strftime('%d/%m/%Y')
+    
+    def enviar(destinatario):
+        message = cliente.messages.create(
+            from_=remetente,
             body=f'*Relatório de Vendas - {data_hoje}*\n\nSegue o relatório diário de vendas com os resultados atualizados.',
             media_url=['https://www.africau.edu/images/default/sample.pdf'],  # Por enquanto usando um PDF de exemplo
-            to='whatsapp:+553182568421'
+            to=_numero_whatsapp(destinatario)
         )
+        print(f"Mensagem enviada para {destinatario}! ID: {message.sid}")
+    return enviar
 
-        print(f"Mensagem enviada com sucesso! ID: {message.sid}")
-        return True
-
-    except Exception as e:
-        print(f"Erro ao enviar relatório pelo WhatsApp: {str(e)}")
-        return False
+def enviar_relatorio(arquivo_pdf=None, html=None, sessao=None, cliente=None):
+    """Envia o relatório a todos os destinatários ao mesmo tempo: e-mail (PDF
+    e/ou HTML) para EMAIL_DESTINATARIO e WhatsApp (só com PDF) para
+    WHATSAPP_NUMBER, ambos separados por vírgulas. Retorna os Resultados."""
+    canais, envios = {}, []
+    sessao = sessao or sessao_smtp()
+    emails = destinatarios(os.getenv('EMAIL_DESTINATARIO'))
+    if emails and (arquivo_pdf or html):
+        canais['email'] = lambda destinatario: sessao.enviar(mensagem_email(destinatario, arquivo_pdf, html))
+        envios += [Envio('email', email) for email in emails]
+    numeros = destinatarios(os.getenv('WHATSAPP_NUMBER'))
+    if numeros and arquivo_pdf:
+        cliente = cliente or cliente_whatsapp()
+        if cliente:
+            canais['whatsapp'] = canal_whatsapp(cliente)
+            envios += [Envio('whatsapp', numero) for numero in numeros]
+        else:
+            print("WhatsApp não enviado: defina TWILIO_ACCOUNT_SID e TWILIO_AUTH_TOKEN")
+    elif arquivo_pdf:
+        print("WhatsApp não enviado: defina WHATSAPP_NUMBER")
+    
+    with sessao:
+        resultados = entregar(canais, envios)
+    
+    for r in resultados:
+        if r.sucesso:
+            print(f"Relatório enviado por {r.canal} para {r.destinatario} em {r.segundos:.2f}s")
+        else:
+            print(f"Erro ao enviar relatório por {r.canal} para {r.destinatario}: {r.erro}")
+    return resultados
 
-def main():
+@metricas.medir_execucao('gerar_enviar_relatorio')
+def main(forcar=False, formatos=('pdf',)):
     try:
-        conn = conectar_banco()
+        with metricas.etapa('conexao_banco'):
+            conn = conectar_banco()
         if not conn:
-            return
+            return False
         
+        # Marca d'água dos dados lidos pelo relatório (de anteontem ao fim do mês)
         hoje = date.today()
-        ontem = hoje - timedelta(days=1)
-        anteontem = hoje - timedelta(days=2)
+        mes_atual = periodos.mes(hoje)
+        periodo = periodos.Periodo(min(hoje - timedelta(days=2), mes_atual.inicio), mes_atual.fim)
+        with metricas.etapa('marca_dagua'):
+            marca = cache_relatorios.marca_dagua(conn, periodo, geral=True)
+        entrada = marca and cache_relatorios.chave('diario', hoje - timedelta(days=1), marca, ARQUIVOS_CODIGO)
         
-        dados_ontem = buscar_dados_dia(conn, ontem)
-        dados_anteontem = buscar_dados_dia(conn, anteontem)
-        dados_mes = buscar_dados_mes_atual(conn)
-        metas = buscar_metas(conn)
-        margens = buscar_margens(conn)
-        margem_media_mes = buscar_margem_media_mes(conn)
+        arquivo_pdf = nome_relatorio() if 'pdf' in formatos else None
+        pdf_em_cache = bool(arquivo_pdf and entrada and not forcar
+                            and cache_relatorios.recuperar_pdf(entrada, arquivo_pdf))
+        if pdf_em_cache:
+            print("Dados sem alteração desde a última geração: relatório reaproveitado do cache")
         
-        arquivo_pdf = gerar_relatorio_pdf(dados_ontem, dados_anteontem, dados_mes, metas, margens, margem_media_mes)
+        arquivos = {}
+        if not pdf_em_cache or set(formatos) - {'pdf'}:
+            dados = cache_relatorios.recuperar_dados(entrada) if entrada and not forcar else None
+            if dados is None:
+                with metricas.etapa('consultas'):
+                    dados = carregar_dados_relatorio(conn)
+            
+            with metricas.etapa('calculo'):
+                modelo = montar_modelo(dados)
+            
+            # Formatos leves (HTML, CSV, Parquet): milissegundos, sem ReportLab
+            with metricas.etapa('geracao_saidas'):
+                arquivos = saidas_relatorio.escrever(conteudo_relatorio(modelo), nome_relatorio()[:-len('.pdf')],
+                                                     formatos)
+            
+            if arquivo_pdf and not pdf_em_cache:
+                with metricas.etapa('geracao_pdf'):
+                    arquivo_pdf = gerar_relatorio_pdf(modelo)
+            
+            if entrada:
+                cache_relatorios.guardar(entrada, dados, arquivo_pdf if not pdf_em_cache else None)
+        
+        for arquivo in arquivos.values():
+            print(f"Relatório gerado: {arquivo}")
+        html = None
+        if 'html' in arquivos:
+            with open(arquivos['html'], encoding='utf-8') as f:
+                html = f.read()
         
         if arquivo_pdf:
-            enviar_email(arquivo_pdf)
-            enviar_whatsapp(arquivo_pdf)  # Adiciona o envio por WhatsApp
+            metricas.contar('bytes_pdf', os.path.getsize(arquivo_pdf))
+        # E-mail e WhatsApp em paralelo, com novas tentativas
+        if arquivo_pdf or html:
+            with metricas.etapa('entrega'):
+                enviar_relatorio(arquivo_pdf, html)
         
         conn.close()
     except Exception as e:
         print(f"Erro na execução principal: {str(e)}")
+        return False
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Gera e envia o relatório diário de vendas")
+    parser.add_argument('--forcar', '--force', action='store_true',
+                        help="Ignora o cache e refaz consultas e PDF")
+    parser.add_argument('--formatos', nargs='+', choices=saidas_relatorio.FORMATOS, default=['pdf'],
+                        help="Saídas a gerar (padrão: pdf); html vira o corpo do e-mail")
+    parser.add_argument('--de', type=date.fromisoformat,
+                        help="Reprocessamento: gera os PDFs de cada dia de --de a --ate, sem enviar")
+    parser.add_argument('--ate', type=date.fromisoformat)
+    parser.add_argument('--saida', default='.', help="Diretório dos PDFs do reprocessamento")
+    parser.add_argument('--processos', type=int,
+                        help="Processos de renderização do reprocessamento (padrão: núcleos disponíveis)")
+    args = parser.parse_args()
+    if args.de or args.ate:
+        if not (args.de and args.ate) or args.de > args.ate:
+            parser.error("informe --de e --ate, com --de <= --ate")
+        if args.formatos != ['pdf']:
+            parser.error("o reprocessamento gera só PDFs")
+        # Uma carga de dados para o intervalo inteiro; renderização em paralelo
+        import logging
+        import executar_relatorios
+        logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+        sucesso = executar_relatorios.main(executar_relatorios.jobs_intervalo(args.de, args.ate),
+                                           args.saida, args.processos)
+        raise SystemExit(0 if sucesso else 1)
+    main(forcar=args.forcar, formatos=args.formatos)
@@ -1,5 +1,5 @@
+import argparse
 import os
-import sys
 from datetime import datetime, timedelta
 import pandas as pd
 from reportlab.lib import colors
@@ -10,6 +10,13 @@ from reportlab.lib.units import inch
 import psycopg2
 from dotenv import load_dotenv
 from babel.numbers import format_currency
+import metricas
+import periodos
+import cache_relatorios
+import pdf_leve
+import saidas_relatorio
+from pdf_leve import DocumentoLeve, EstiloLinha, Grade
+from saidas_relatorio import Conteudo, Secao
 
 # Carrega variáveis de ambiente
 load_dotenv()
@@ -29,32 +36,37 @@ def conectar_banco():
         database=DB_CONFIG['dbname'],
         user=DB_CONFIG['user'],
         password=DB_CONFIG['password'],
-        port=DB_CONFIG['port']
+        port=DB_CONFIG['port'],
+        cursor_factory=metricas.fabrica_cursor()
     )
 
-def buscar_dados_vendas(conn, mes_ano):
-    query = """
+SQL_VENDAS_MES = f"""
     SELECT 
         v.sku,
-        COUNT(*) as total_vendas,
+        SUM(v.pedidos) as total_vendas,
         SUM(v.unidades) as unidades_vendidas,
         SUM(v.lucro) as lucro_total,
-        AVG(v.margem_lucro) as margem_media,
+        SUM(v.soma_margem_lucro) / NULLIF(SUM(v.pedidos), 0) as margem_media,
         SUM(v.valor_vendido) as valor_total_vendido
-    FROM vendas_ml v
-    WHERE DATE_TRUNC('month', v.data) = DATE_TRUNC('month', %s::date)
+    FROM vendas_diarias_sku v
+    WHERE {periodos.filtro('v.dia', 'mes')}
+    AND (%(marketplace)s::text IS NULL OR v.marketplace = %(marketplace)s)
     GROUP BY v.sku
     ORDER BY v.sku
-    """
-    return pd.read_sql_query(query, conn, params=[mes_ano])
+"""
 
-def buscar_metas(conn, mes_ano):
-    query = """
+SQL_METAS_MES = f"""
     SELECT m.sku, m.meta_vendas, m.meta_margem
     FROM metas_ml m
-    WHERE DATE_TRUNC('month', m.mes_ano) = DATE_TRUNC('month', %s::date)
-    """
-    return pd.read_sql_query(query, conn, params=[mes_ano])
+    WHERE {periodos.filtro('m.mes_ano', 'mes')}
+"""
+
+def buscar_dados_vendas(conn, mes_ano, marketplace=None):
+    params = dict(periodos.parametros(mes=periodos.mes(mes_ano)), marketplace=marketplace)
+    return pd.read_sql_query(SQL_VENDAS_MES, conn, params=params)
+
+def buscar_metas(conn, mes_ano):
+    return pd.read_sql_query(SQL_METAS_MES, conn, params=periodos.parametros(mes=periodos.mes(mes_ano)))
 
 def formatar_moeda(valor):
     return format_currency(valor, 'BRL', locale='pt_BR')
@@ -72,13 +84,39 @@ def calcular_status_meta(vendas, meta):
     else:
         return 'Risco alto'
 
-def gerar_relatorio_mensal(mes_ano):
-    conn = conectar_banco()
-    
-    # Busca os dados
-    df_vendas = buscar_dados_vendas(conn, mes_ano)
-    df_metas = buscar_metas(conn, mes_ano)
-    
+# Definindo as cores para cada status
+cores_status = {
+    'Meta atingida!': colors.HexColor('#E8F5E9'),  # Verde claro
+    'Meta alcançável': colors.HexColor('#E3F2FD'),  # Azul claro
+    'Atenção necessária': colors.HexColor('#FFF3E0'),  # Laranja claro
+    'Risco alto': colors.HexColor('#FFEBEE'),  # Vermelho claro
+    'Meta não definida': colors.HexColor('#F5F5F5')  # Cinza claro
+}
+cor_cabecalho = colors.HexColor('#1e3799')  # Azul escuro para o cabeçalho
+
+# Acima disso o PDF é desenhado direto no canvas (pdf_leve.py)
+LIMITE_SKUS_PLATYPUS = int(os.getenv('RELATORIO_LIMITE_SKUS_PLATYPUS', '300'))
+
+CABECALHO_RESUMO = ['SKU', 'Total de Vendas', 'Unidades', 'Lucro Total', 'Margem Média']
+CABECALHO_METAS = ['SKU', 'Meta Mensal', 'Vendas Atual', 'Unidades', 'Progresso', 'Status']
+LARGURAS_RESUMO = [1.5*inch, 1.5*inch, 1*inch, 1.5*inch, 1.2*inch]
+LARGURAS_METAS = [1.2*inch, 1.4*inch, 1.4*inch, 0.8*inch, 1*inch, 1.3*inch]
+
+def get_status_e_cor(meta_vendas, vendas_realizadas):
+    if pd.isna(meta_vendas) or meta_vendas == 0:
+        return 'Meta não definida', cores_status['Meta não definida']
+    percentual = (vendas_realizadas / meta_vendas) * 100
+    if percentual >= 100:
+        return 'Meta atingida!', cores_status['Meta atingida!']
+    elif percentual >= 60:
+        return 'Meta alcançável', cores_status['Meta alcançável']
+    elif percentual >= 40:
+        return 'Atenção necessária', cores_status['Atenção necessária']
+    else:
+        return 'Risco alto', cores_status['Risco alto']
+
+def preparar_tabelas(df_vendas, df_metas):
+    """(vendas por lucro decrescente, vendas + metas por progresso decrescente)"""
     # Ordena df_vendas por lucro_total de forma decrescente
     df_vendas = df_vendas.sort_values('lucro_total', ascending=False)
     
@@ -86,19 +124,58 @@ def gerar_relatorio_mensal(mes_ano):
     df_completo = pd.merge(df_vendas, df_metas, on='sku', how='outer')
     
     # Calcula o progresso para ordenação
-    df_completo['progresso'] = df_completo.apply(
-        lambda row: (row['valor_total_vendido'] / row['meta_vendas'] * 100) 
-        if not pd.isna(row['meta_vendas']) and not pd.isna(row['valor_total_vendido']) and row['meta_vendas'] > 0 
-        else 0, 
-        axis=1
-    )
+    meta = df_completo['meta_vendas']
+    vendido = df_completo['valor_total_vendido']
+    valida = meta.notna() & vendido.notna() & (meta.fillna(0) > 0)
+    df_completo['progresso'] = (vendido / meta.where(valida) * 100).where(valida, 0).astype(float)
     
     # Ordena df_completo por progresso de forma decrescente
-    df_completo = df_completo.sort_values('progresso', ascending=False)
+    return df_vendas, df_completo.sort_values('progresso', ascending=False)
+
+def linhas_resumo(df_vendas):
+    """Células da tabela de resumo de vendas por SKU"""
+    for row in df_vendas.itertuples(index=False):
+        yield [
+            row.sku,
+            formatar_moeda(row.valor_total_vendido),
+            int(row.unidades_vendidas),
+            formatar_moeda(row.lucro_total),
+            f"{row.margem_media:.1f}%"
+        ]
+
+def linhas_metas(df_completo):
+    """(células, cor de fundo) da tabela de acompanhamento de metas"""
+    for row in df_completo.itertuples(index=False):
+        meta_vendas = row.meta_vendas if not pd.isna(row.meta_vendas) else 0
+        vendas_realizadas = row.valor_total_vendido if not pd.isna(row.valor_total_vendido) else 0
+        unidades = int(row.unidades_vendidas) if not pd.isna(row.unidades_vendidas) else 0
+        
+        status, cor_fundo = get_status_e_cor(meta_vendas, vendas_realizadas)
+        
+        yield [
+            row.sku,
+            formatar_moeda(meta_vendas),
+            formatar_moeda(vendas_realizadas),
+            unidades,
+            f"{row.progresso:.1f}%",
+            status
+        ], cor_fundo
+
+def renderizar_relatorio_mensal(df_vendas, df_metas, mes_ano, nome_arquivo, leve=None):
+    """Monta e grava o PDF do mês a partir dos dados já carregados.
     
-    # Cria o documento PDF
+    Com leve=True (padrão acima de LIMITE_SKUS_PLATYPUS SKUs) usa o
+    renderizador de canvas, com memória limitada qualquer que seja o catálogo.
+    """
     data_ref = datetime.strptime(mes_ano, '%Y-%m-%d')
-    nome_arquivo = f'relatorio_mensal_{data_ref.strftime("%Y-%m")}.pdf'
+    df_vendas, df_completo = preparar_tabelas(df_vendas, df_metas)
+    titulo = f'Relatório Mensal de Vendas - {data_ref.strftime("%B/%Y")}'
+    if leve is None:
+        leve = len(df_completo) > LIMITE_SKUS_PLATYPUS
+    if leve:
+        return renderizar_relatorio_mensal_leve(df_vendas, df_completo, titulo, nome_arquivo)
+    
+    # Cria o documento PDF
     doc = SimpleDocTemplate(nome_arquivo, pagesize=A4, rightMargin=30, leftMargin=30, topMargin=30, bottomMargin=30)
     
     # Estilos
@@ -115,28 +192,16 @@ def gerar_relatorio_mensal(mes_ano):
     elements = []
     
     # Título do relatório
-    titulo = Paragraph(f'Relatório Mensal de Vendas - {data_ref.strftime("%B/%Y")}', titulo_style)
-    elements.append(titulo)
+    elements.append(Paragraph(titulo, titulo_style))
     
     # Parte 1: Resumo de vendas por SKU
     elements.append(Paragraph('Resumo de Vendas por SKU', styles['Heading2']))
     elements.append(Spacer(1, 12))
     
-    # Dados para a tabela de resumo
-    dados_resumo = [['SKU', 'Total de Vendas', 'Unidades', 'Lucro Total', 'Margem Média']]
-    for _, row in df_vendas.iterrows():
-        dados_resumo.append([
-            row['sku'],
-            formatar_moeda(row['valor_total_vendido']),
-            int(row['unidades_vendidas']),
-            formatar_moeda(row['lucro_total']),
-            f"{row['margem_media']:.1f}%"
-        ])
-    
     # Cria e estiliza a tabela de resumo
-    tabela_resumo = Table(dados_resumo, colWidths=[1.5*inch, 1.5*inch, 1*inch, 1.5*inch, 1.2*inch])
+    tabela_resumo = Table([CABECALHO_RESUMO] + list(linhas_resumo(df_vendas)), colWidths=LARGURAS_RESUMO)
     tabela_resumo.setStyle(TableStyle([
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3799')),  # Azul escuro para o cabeçalho
+        ('BACKGROUND', (0, 0), (-1, 0), cor_cabecalho),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centraliza todos os dados
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -158,52 +223,9 @@ def gerar_relatorio_mensal(mes_ano):
     elements.append(Spacer(1, 12))
     
     # Prepara dados para a tabela de metas
-    dados_metas = [['SKU', 'Meta Mensal', 'Vendas Atual', 'Unidades', 'Progresso', 'Status']]
-    
-    # Definindo as cores para cada status
-    cores_status = {
-        'Meta atingida!': colors.HexColor('#E8F5E9'),  # Verde claro
-        'Meta alcançável': colors.HexColor('#E3F2FD'),  # Azul claro
-        'Atenção necessária': colors.HexColor('#FFF3E0'),  # Laranja claro
-        'Risco alto': colors.HexColor('#FFEBEE'),  # Vermelho claro
-        'Meta não definida': colors.HexColor('#F5F5F5')  # Cinza claro
-    }
-
-    def get_status_e_cor(progresso, meta_vendas, vendas_realizadas):
-        if pd.isna(meta_vendas) or meta_vendas == 0:
-            return 'Meta não definida', cores_status['Meta não definida']
-        percentual = (vendas_realizadas / meta_vendas) * 100
-        if percentual >= 100:
-            return 'Meta atingida!', cores_status['Meta atingida!']
-        elif percentual >= 60:
-            return 'Meta alcançável', cores_status['Meta alcançável']
-        elif percentual >= 40:
-            return 'Atenção necessária', cores_status['Atenção necessária']
-        else:
-            return 'Risco alto', cores_status['Risco alto']
-
-    for _, row in df_completo.iterrows():
-        meta_vendas = row['meta_vendas'] if not pd.isna(row['meta_vendas']) else 0
-        vendas_realizadas = row['valor_total_vendido'] if not pd.isna(row['valor_total_vendido']) else 0
-        unidades = int(row['unidades_vendidas']) if not pd.isna(row['unidades_vendidas']) else 0
-        
-        status, cor_fundo = get_status_e_cor(row['progresso'], meta_vendas, vendas_realizadas)
-        
-        dados_metas.append([
-            row['sku'],
-            formatar_moeda(meta_vendas),
-            formatar_moeda(vendas_realizadas),
-            unidades,
-            f"{row['progresso']:.1f}%",
-            status
-        ])
-    
-    # Cria e estiliza a tabela de metas
-    tabela_metas = Table(dados_metas, colWidths=[1.2*inch, 1.4*inch, 1.4*inch, 0.8*inch, 1*inch, 1.3*inch])
-    
-    # Estilo base da tabela
+    dados_metas = [CABECALHO_METAS]
     estilo_tabela = [
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e3799')),  # Azul escuro para o cabeçalho
+        ('BACKGROUND', (0, 0), (-1, 0), cor_cabecalho),
         ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
         ('ALIGN', (0, 0), (-1, -1), 'CENTER'),  # Centraliza todos os dados
         ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
@@ -216,27 +238,118 @@ def gerar_relatorio_mensal(mes_ano):
     ]
     
     # Adiciona cores de fundo baseadas no status
-    for i in range(1, len(dados_metas)):
-        status = dados_metas[i][-1]
-        cor_fundo = cores_status[status]
+    for i, (celulas, cor_fundo) in enumerate(linhas_metas(df_completo), start=1):
+        dados_metas.append(celulas)
         estilo_tabela.append(('BACKGROUND', (0, i), (-1, i), cor_fundo))
     
+    # Cria e estiliza a tabela de metas
+    tabela_metas = Table(dados_metas, colWidths=LARGURAS_METAS)
     tabela_metas.setStyle(TableStyle(estilo_tabela))
     
     elements.append(tabela_metas)
     
     # Gera o PDF
     doc.build(elements)
-    print(f"Relatório mensal gerado com sucesso: {nome_arquivo}")
+    return nome_arquivo
+
+def renderizar_relatorio_mensal_leve(df_vendas, df_completo, titulo, nome_arquivo):
+    """Mesmo relatório de renderizar_relatorio_mensal desenhado direto no canvas"""
+    doc = DocumentoLeve(nome_arquivo, pagesize=A4, margem=30)
+    cabecalho = EstiloLinha('Helvetica-Bold', 10, cor_cabecalho, colors.whitesmoke, 24)
+    corpo = EstiloLinha('Helvetica', 9, colors.white, colors.black, 18)
     
-    conn.close()
+    doc.titulo(titulo, 'Helvetica-Bold', 16, colors.black, 30)
+    
+    # Parte 1: Resumo de vendas por SKU
+    doc.titulo('Resumo de Vendas por SKU', 'Helvetica-Bold', 14, colors.black, 12)
+    grade = Grade(LARGURAS_RESUMO, colors.lightgrey, colors.lightgrey, 1)
+    doc.tabela(CABECALHO_RESUMO, cabecalho, grade, ((celulas, None) for celulas in linhas_resumo(df_vendas)), corpo)
+    doc.espaco(20)
+    
+    # Parte 2: Acompanhamento de Metas
+    doc.titulo('Acompanhamento de Metas', 'Helvetica-Bold', 14, colors.black, 12)
+    grade = Grade(LARGURAS_METAS, colors.lightgrey, colors.lightgrey, 1)
+    doc.tabela(CABECALHO_METAS, cabecalho, grade, linhas_metas(df_completo), corpo)
+    
+    doc.salvar()
     return nome_arquivo
 
+def conteudo_relatorio_mensal(df_vendas, df_metas, mes_ano):
+    """Conteudo (saidas_relatorio) do mês: as tabelas do PDF e o quadro por SKU com meta e status"""
+    data_ref = datetime.strptime(mes_ano, '%Y-%m-%d')
+    df_vendas, df_completo = preparar_tabelas(df_vendas, df_metas)
+    
+    dados = df_completo.copy()
+    for coluna in dados.columns.drop('sku'):
+        dados[coluna] = pd.to_numeric(dados[coluna], errors='coerce').astype(float)
+    dados['status'] = [get_status_e_cor(meta, vendido)[0] for meta, vendido in
+                       zip(df_completo['meta_vendas'].fillna(0), df_completo['valor_total_vendido'].fillna(0))]
+    dados.insert(0, 'mes', pd.Timestamp(data_ref))
+    
+    return Conteudo(
+        f'Relatório Mensal de Vendas - {data_ref.strftime("%B/%Y")}',
+        lambda: [
+            Secao('Resumo de Vendas por SKU', CABECALHO_RESUMO,
+                  [(celulas, None) for celulas in linhas_resumo(df_vendas)]),
+            Secao('Acompanhamento de Metas', CABECALHO_METAS, list(linhas_metas(df_completo))),
+        ],
+        dados,
+    )
+
+@metricas.medir_execucao('gerar_relatorio_mensal')
+def gerar_relatorio_mensal(mes_ano, forcar=False, formatos=('pdf',)):
+    with metricas.etapa('conexao_banco'):
+        conn = conectar_banco()
+    
+    # Reaproveita o PDF (ou os dados) se nada mudou no mês desde a última geração
+    data_ref = datetime.strptime(mes_ano, '%Y-%m-%d')
+    nome_arquivo = f'relatorio_mensal_{data_ref.strftime("%Y-%m")}.pdf'
+    with metricas.etapa('marca_dagua'):
+        marca = cache_relatorios.marca_dagua(conn, periodos.mes(mes_ano))
+    entrada = marca and cache_relatorios.chave('mensal', data_ref.strftime('%Y-%m'), marca, [__file__, pdf_leve.__file__])
+    gerar_pdf = 'pdf' in formatos
+    if gerar_pdf and entrada and not forcar and cache_relatorios.recuperar_pdf(entrada, nome_arquivo):
+        print(f"Dados do mês sem alteração: relatório reaproveitado do cache: {nome_arquivo}")
+        gerar_pdf = False
+        if set(formatos) == {'pdf'}:
+            conn.close()
+            return nome_arquivo
+    dados = cache_relatorios.recuperar_dados(entrada) if entrada and not forcar else None
+    
+    # Busca os dados
+    if dados is None:
+        with metricas.etapa('consultas'):
+            dados = (buscar_dados_vendas(conn, mes_ano), buscar_metas(conn, mes_ano))
+    df_vendas, df_metas = dados
+    metricas.contar('linhas_lidas', len(df_vendas) + len(df_metas))
+    
+    # Formatos leves (HTML, CSV, Parquet): milissegundos, sem ReportLab
+    with metricas.etapa('geracao_saidas'):
+        arquivos = saidas_relatorio.escrever(conteudo_relatorio_mensal(df_vendas, df_metas, mes_ano),
+                                             nome_arquivo[:-len('.pdf')], formatos)
+    for arquivo in arquivos.values():
+        print(f"Relatório mensal gerado com sucesso: {arquivo}")
+    
+    if gerar_pdf:
+        with metricas.etapa('geracao_pdf'):
+            renderizar_relatorio_mensal(df_vendas, df_metas, mes_ano, nome_arquivo)
+        metricas.contar('bytes_pdf', os.path.getsize(nome_arquivo))
+        print(f"Relatório mensal gerado com sucesso: {nome_arquivo}")
+    if entrada:
+        cache_relatorios.guardar(entrada, dados, nome_arquivo if gerar_pdf else None)
+    
+    conn.close()
+    return nome_arquivo if 'pdf' in formatos else None
+
 if __name__ == "__main__":
     # Se não for fornecida uma data, usa o mês atual
-    if len(sys.argv) > 1:
-        mes_ano = sys.argv[1]
-    else:
-        mes_ano = datetime.now().strftime('%Y-%m-01')
+    parser = argparse.ArgumentParser(description="Gera o relatório mensal de vendas")
+    parser.add_argument('mes_ano', nargs='?', default=datetime.now().strftime('%Y-%m-01'),
+                        help="Data do mês (AAAA-MM-DD, padrão: mês atual)")
+    parser.add_argument('--forcar', '--force', action='store_true',
+                        help="Ignora o cache e refaz consultas e PDF")
+    parser.add_argument('--formatos', nargs='+', choices=saidas_relatorio.FORMATOS, default=['pdf'],
+                        help="Saídas a gerar (padrão: pdf)")
+    args = parser.parse_args()
     
-    gerar_relatorio_mensal(mes_ano)
+    gerar_relatorio_mensal(args.mes_ano, forcar=args.forcar, formatos=args.formatos)
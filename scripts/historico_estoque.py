@@ -0,0 +1,146 @@
+"""Histórico do nível de estoque (tabela estoque_historico).
+
+O histórico é gravado em run-length: cada linha diz que o SKU passou a ter
+`estoque` unidades a partir de `valido_desde`, até a próxima linha do mesmo
+SKU. O importador só acrescenta uma linha quando a quantidade muda, então o
+tamanho da tabela acompanha o número de alterações e não o de ciclos.
+
+Consultas:
+
+    nivel_em(cursor, 'SKU-1', momento)        -> quantidade no instante
+    niveis_em(cursor, momento)                -> {sku: quantidade} de todos os SKUs
+    serie_diaria(cursor, ['SKU-1'], de, ate)  -> nível no fim e mínimo de cada dia
+
+Executado diretamente, imprime a série diária de um ou mais SKUs:
+
+    python historico_estoque.py SKU-1 SKU-2 --de 2026-10-01 --ate 2026-10-18
+"""
+import argparse
+import logging
+from datetime import date, timedelta
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import conexoes
+
+# Só grava o SKU se a quantidade for diferente da última registrada (uma
+# edição feita pelo dashboard entre dois ciclos não gera linha repetida)
+SQL_REGISTRAR = """
+    INSERT INTO estoque_historico (sku, estoque)
+    SELECT n.sku, n.estoque
+    FROM (VALUES %s) AS n(sku, estoque)
+    WHERE n.estoque IS DISTINCT FROM (
+        SELECT h.estoque FROM estoque_historico h
+        WHERE h.sku = n.sku
+        ORDER BY h.valido_desde DESC
+        LIMIT 1
+    )
+"""
+
+# Nível no fim do dia e menor nível ao longo do dia (rupturas que duraram
+# só algumas horas aparecem como estoque_minimo = 0)
+SQL_SERIE_DIARIA = """
+    SELECT s.sku, d.dia::date, fim.estoque AS estoque_fim,
+           LEAST(inicio.estoque, durante.minimo) AS estoque_minimo
+    FROM {skus} AS s(sku)
+    CROSS JOIN generate_series(%s::date, %s::date, INTERVAL '1 day') AS d(dia)
+    LEFT JOIN LATERAL (
+        SELECT h.estoque FROM estoque_historico h
+        WHERE h.sku = s.sku AND h.valido_desde < d.dia + INTERVAL '1 day'
+        ORDER BY h.valido_desde DESC LIMIT 1
+    ) fim ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT h.estoque FROM estoque_historico h
+        WHERE h.sku = s.sku AND h.valido_desde <= d.dia
+        ORDER BY h.valido_desde DESC LIMIT 1
+    ) inicio ON TRUE
+    LEFT JOIN LATERAL (
+        SELECT MIN(h.estoque) AS minimo FROM estoque_historico h
+        WHERE h.sku = s.sku AND h.valido_desde > d.dia AND h.valido_desde < d.dia + INTERVAL '1 day'
+    ) durante ON TRUE
+    ORDER BY s.sku, d.dia
+"""
+
+
+def registrar_alteracoes(cursor, alteracoes):
+    """Acrescenta ao histórico os pares (sku, estoque) gravados no ciclo.
+
+    Roda dentro da transação do cursor; sem a tabela (migration não
+    aplicada) apenas registra um aviso.
+    """
+    if not alteracoes:
+        return 0
+    cursor.execute("SAVEPOINT historico_estoque")
+    try:
+        alteracoes = list(alteracoes)
+        execute_values(cursor, SQL_REGISTRAR, alteracoes, page_size=len(alteracoes))
+        cursor.execute("RELEASE SAVEPOINT historico_estoque")
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT historico_estoque")
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"⚠️  Histórico de estoque não gravado ({erro})")
+        return 0
+    return cursor.rowcount
+
+
+def nivel_em(cursor, sku, momento):
+    """Quantidade do SKU no instante `momento` (None se não havia registro)"""
+    cursor.execute("""
+        SELECT estoque FROM estoque_historico
+        WHERE sku = %s AND valido_desde <= %s
+        ORDER BY valido_desde DESC
+        LIMIT 1
+    """, (sku, momento))
+    linha = cursor.fetchone()
+    return linha[0] if linha else None
+
+
+def niveis_em(cursor, momento, skus=None):
+    """{sku: quantidade} no instante `momento`, para todos os SKUs ou os informados"""
+    filtro = "AND sku = ANY(%s)" if skus is not None else ''
+    parametros = (momento, list(skus)) if skus is not None else (momento,)
+    cursor.execute(f"""
+        SELECT DISTINCT ON (sku) sku, estoque
+        FROM estoque_historico
+        WHERE valido_desde <= %s {filtro}
+        ORDER BY sku, valido_desde DESC
+    """, parametros)
+    return dict(cursor.fetchall())
+
+
+def serie_diaria(cursor, skus, de, ate):
+    """[(sku, dia, estoque_fim, estoque_minimo)] de `de` até `ate` (inclusive).
+
+    skus=None usa todos os SKUs da tabela estoque. Cada dia custa uma busca
+    no índice por SKU, independente de quantas alterações existem.
+    """
+    if skus is None:
+        origem = "(SELECT sku FROM estoque)"
+        parametros = (de, ate)
+    else:
+        origem = "unnest(%s::text[])"
+        parametros = (list(skus), de, ate)
+    cursor.execute(SQL_SERIE_DIARIA.format(skus=origem), parametros)
+    return cursor.fetchall()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Série diária do nível de estoque a partir do histórico")
+    parser.add_argument('skus', nargs='*', help="SKUs consultados (todos, se omitido)")
+    parser.add_argument('--de', type=date.fromisoformat, default=date.today() - timedelta(days=30),
+                        help="Primeiro dia (AAAA-MM-DD, padrão: 30 dias atrás)")
+    parser.add_argument('--ate', type=date.fromisoformat, default=date.today(),
+                        help="Último dia (AAAA-MM-DD, padrão: hoje)")
+    args = parser.parse_args()
+
+    conn = conexoes.conectar_banco()
+    try:
+        cursor = conn.cursor()
+        print(f"{'SKU':<20} {'Dia':<10} {'Fim do dia':>10} {'Mínimo':>8}")
+        for sku, dia, estoque_fim, estoque_minimo in serie_diaria(cursor, args.skus or None, args.de, args.ate):
+            fim = '-' if estoque_fim is None else estoque_fim
+            minimo = '-' if estoque_minimo is None else estoque_minimo
+            print(f"{sku:<20} {dia.isoformat():<10} {fim:>10} {minimo:>8}")
+    finally:
+        conn.close()
@@ -1,13 +1,53 @@
-import gspread
-import psycopg2
-from oauth2client.service_account import ServiceAccountCredentials
+import argparse
 import time
 import logging
 import requests
-from config import DATABASE_CONFIG, GOOGLE_SHEETS_CREDENTIALS, PLANILHA_NOME
+import psycopg2
+from psycopg2.extras import execute_values
+from config import PLANILHA_NOME
+from parser_colunar import ESQUEMA_ESTOQUE, parsear_linhas
+from quarentena import Rejeicao
+from status_estoque import calcular_status, sql_status
+import quarentena
+import metricas
+import historico_estoque
+import previsao_estoque
+import recomendacao_compra
+from fontes_dados import FonteArquivo, FontePlanilha
+import conexoes
 
 # Nome da aba de estoque na planilha
 ABA_ESTOQUE = "estoque"
+# Colunas lidas da aba de estoque (A-E)
+LARGURA_ESTOQUE = 5
+# SKUs gravados por comando (cada página em um SAVEPOINT)
+TAMANHO_PAGINA = 500
+
+# Mínimo dos SKUs novos, cadastrados a partir da planilha
+MINIMO_PADRAO = 30
+
+# Atualiza só a quantidade (e o status) dos SKUs existentes cuja quantidade
+# mudou, mantendo os outros dados; SKUs sem alteração não são reescritos e
+# não voltam no RETURNING. xmax = 0 identifica as linhas inseridas
+SQL_UPSERT_ESTOQUE = f"""
+    INSERT INTO estoque AS e (sku, descricao, estoque, minimo, cmv, valor_liquido, status)
+    VALUES %s
+    ON CONFLICT (sku) DO UPDATE SET
+        estoque = EXCLUDED.estoque,
+        status = {sql_status('EXCLUDED.estoque', 'e.minimo')},
+        updated_at = CURRENT_TIMESTAMP
+    WHERE e.estoque IS DISTINCT FROM EXCLUDED.estoque
+    RETURNING e.sku, (e.xmax = 0) AS inserido, e.estoque
+"""
+TEMPLATE_UPSERT_ESTOQUE = f"(%s, %s, %s, {MINIMO_PADRAO}, 0, 0, %s)"
+
+# Acerta o status dos SKUs cujo mínimo foi alterado fora da sincronização
+# (pelo dashboard); só grava as linhas em que o status calculado difere
+SQL_RECALCULAR_STATUS = f"""
+    UPDATE estoque
+    SET status = {sql_status()}
+    WHERE status IS DISTINCT FROM ({sql_status()})
+"""
 
 # Configurar logging para arquivo e console
 logging.basicConfig(
@@ -23,7 +63,7 @@ def conectar_banco():
     """Estabelece conexão com o banco de dados PostgreSQL"""
     try:
         logging.info("🔗 Tentando conectar ao banco de dados PostgreSQL...")
-        conn = psycopg2.connect(**DATABASE_CONFIG)
+        conn = conexoes.conectar_banco()
         logging.info("✅ Conexão com o banco de dados estabelecida com sucesso!")
         return conn
     except Exception as e:
@@ -35,21 +75,15 @@ def conectar_planilha():
     """Estabelece conexão com a planilha do Google Sheets"""
     try:
         logging.info("📊 Tentando conectar ao Google Sheets...")
-        scope = ['https://spreadsheets.google.com/feeds',
-                 'https://www.googleapis.com/auth/drive']
-        
-        logging.info("🔐 Autenticando com as credenciais do Google...")
-        creds = ServiceAccountCredentials.from_json_keyfile_name(
-            GOOGLE_SHEETS_CREDENTIALS, scope)
-        client = gspread.authorize(creds)
         
+        # A autenticação acontece só na primeira chamada do processo
         logging.info(f"📋 Abrindo planilha: {PLANILHA_NOME}")
-        planilha = client.open(PLANILHA_NOME)
-        aba = planilha.worksheet(ABA_ESTOQUE)
+        aba = conexoes.abrir_aba(PLANILHA_NOME, ABA_ESTOQUE)
         
         logging.info(f"✅ Conexão com a aba '{ABA_ESTOQUE}' estabelecida com sucesso!")
         return aba
     except Exception as e:
+        conexoes.tratar_erro_planilha(e)
         erro = f"❌ Erro ao conectar à planilha: {e}"
         logging.error(erro)
         exit()
@@ -77,6 +111,85 @@ def tratar_valor(valor, tipo=float, default=0):
         logging.warning(f"⚠️  Erro ao tratar valor '{valor}' do tipo {tipo}: {e} - Usando valor padrão: {default}")
         return default
 
+def validar_linhas(linhas, erros):
+    """Rejeições das linhas de estoque: sem SKU/estoque ou com estoque ilegível.
+
+    Linhas totalmente vazias são ignoradas sem registro. O número da linha é
+    o da planilha (a linha 1 é o cabeçalho).
+    """
+    rejeicoes = []
+    estoque_invalido = erros['estoque'].to_numpy()
+    for i, linha in enumerate(linhas):
+        if len(linha) < 5 or not linha[0] or not linha[4]:  # Precisa ter pelo menos SKU e estoque total
+            if any(str(celula).strip() for celula in linha):
+                rejeicoes.append(Rejeicao(i + 2, '', '', 'dados insuficientes: SKU (A) e estoque (E) são obrigatórios',
+                                          linha, False))
+        elif estoque_invalido[i]:
+            rejeicoes.append(Rejeicao(i + 2, 'estoque', linha[4], f"estoque inválido '{linha[4]}'", linha, False))
+    return rejeicoes
+
+def _valores_estoque(sku, estoque):
+    # Novos SKUs entram com descrição padrão (o nome do SKU) e o mínimo padrão
+    return (sku, f"Produto {sku}", estoque, calcular_status(estoque, MINIMO_PADRAO))
+
+def _upsert_estoque(cursor, pagina):
+    """Um comando para a página; retorna [(sku, inserido, estoque)] dos SKUs gravados"""
+    return execute_values(cursor, SQL_UPSERT_ESTOQUE,
+                          [_valores_estoque(sku, estoque) for _, sku, estoque, _ in pagina],
+                          template=TEMPLATE_UPSERT_ESTOQUE, page_size=len(pagina), fetch=True)
+
+def gravar_estoque(cursor, itens):
+    """Grava os itens (linha, sku, estoque, conteúdo) em páginas de TAMANHO_PAGINA.
+
+    Cada página roda dentro de um SAVEPOINT. Se a página falhar, ela é
+    desfeita e refeita SKU a SKU (cada um com o seu SAVEPOINT), então só o
+    SKU com problema fica de fora, como na antiga transação por SKU. Os SKUs
+    inseridos ou com quantidade alterada entram no histórico de estoque.
+    Retorna (atualizados, inseridos, inalterados, rejeicoes).
+    """
+    atualizados = 0
+    inseridos = 0
+    inalterados = 0
+    rejeicoes = []
+    alteracoes = []
+    for inicio in range(0, len(itens), TAMANHO_PAGINA):
+        pagina = itens[inicio:inicio + TAMANHO_PAGINA]
+        logging.info(f"📊 Gravando SKUs {inicio + 1}-{inicio + len(pagina)} de {len(itens)}")
+
+        erros_antes = len(rejeicoes)
+        cursor.execute("SAVEPOINT pagina_estoque")
+        try:
+            resultado = _upsert_estoque(cursor, pagina)
+            cursor.execute("RELEASE SAVEPOINT pagina_estoque")
+        except psycopg2.Error as e:
+            cursor.execute("ROLLBACK TO SAVEPOINT pagina_estoque")
+            erro = str(e).strip().splitlines()[0]
+            logging.warning(f"⚠️  Falha na página ({erro}); gravando os {len(pagina)} SKUs um a um")
+            resultado = []
+            for item in pagina:
+                linha_planilha, sku, _, linha = item
+                cursor.execute("SAVEPOINT sku_estoque")
+                try:
+                    resultado += _upsert_estoque(cursor, [item])
+                    cursor.execute("RELEASE SAVEPOINT sku_estoque")
+                except psycopg2.Error as e:
+                    cursor.execute("ROLLBACK TO SAVEPOINT sku_estoque")
+                    logging.error(f"❌ Erro ao processar SKU {sku} (linha {linha_planilha}): {str(e).strip()}")
+                    rejeicoes.append(Rejeicao(linha_planilha, 'sku', linha[0], f"erro ao gravar: {e}".strip(),
+                                              linha, False))
+
+        for sku, inserido, estoque in resultado:
+            alteracoes.append((sku, estoque))
+            if inserido:
+                inseridos += 1
+                logging.info(f"➕ Novo SKU {sku} inserido")
+            else:
+                atualizados += 1
+        inalterados += len(pagina) - len(resultado) - (len(rejeicoes) - erros_antes)
+
+    historico_estoque.registrar_alteracoes(cursor, alteracoes)
+    return atualizados, inseridos, inalterados, rejeicoes
+
 def atualizar_estoque(dados_planilha):
     """Atualiza os dados de estoque no banco de dados"""
     conn = None
@@ -85,134 +198,109 @@ def atualizar_estoque(dados_planilha):
         conn = conectar_banco()
         cursor = conn.cursor()
 
-        # Contadores para o relatório
-        skus_atualizados = 0
-        skus_nao_encontrados = 0
-        skus_inseridos = 0
         total_linhas = len(dados_planilha) - 1  # Excluindo cabeçalho
         
         logging.info(f"📦 Iniciando processamento de {total_linhas} linhas de estoque...")
         
-        # Pular o cabeçalho
+        # Converte e valida as colunas de SKU e estoque de uma vez
+        with metricas.etapa('conversao'):
+            quadro, erros = parsear_linhas(dados_planilha[1:], ESQUEMA_ESTOQUE, divisor_moeda=1)
+            skus = quadro['sku'].tolist()
+            estoques = quadro['estoque'].tolist()
+            rejeicoes = validar_linhas(dados_planilha[1:], erros)
+        rejeitadas = {rejeicao.linha - 1 for rejeicao in rejeicoes}
+        if rejeicoes:
+            # Linhas inválidas não são gravadas (antes um estoque ilegível virava 0)
+            with metricas.etapa('quarentena'):
+                quarentena.registrar(cursor, 'estoque', rejeicoes, LARGURA_ESTOQUE)
+                conn.commit()
+            logging.warning(f"⚠️  {quarentena.resumo(rejeicoes)}")
+        
+        # Pular o cabeçalho; se o SKU se repete na planilha vale a última linha
+        itens = {}
         for i, linha in enumerate(dados_planilha[1:], 1):
-            # Usamos uma nova transação para cada SKU para evitar que um erro afete todos
-            conn_item = conectar_banco()
-            cursor_item = conn_item.cursor()
-            try:
-                if len(linha) < 5 or not linha[0] or not linha[4]:  # Verifica se a linha tem pelo menos SKU e estoque total
-                    logging.warning(f"⚠️  Linha {i} ignorada: dados insuficientes ou vazios")
-                    continue
-                
-                sku = tratar_valor(linha[0], tipo=str)  # Coluna A - SKU
-                estoque_atual = tratar_valor(linha[4], tipo=int)  # Coluna E - Estoque Total
-                
-                if i % 10 == 0:  # Log de progresso a cada 10 itens
-                    logging.info(f"📊 Processando linha {i}/{total_linhas} - SKU: {sku}")
-                
-                # Verifica se o SKU existe no banco de dados
-                cursor_item.execute("SELECT * FROM estoque WHERE sku = %s", (sku,))
-                produto = cursor_item.fetchone()
-                
-                if produto:
-                    # Atualiza apenas a quantidade em estoque, mantendo os outros dados
-                    cursor_item.execute("""
-                        UPDATE estoque 
-                        SET estoque = %s, updated_at = CURRENT_TIMESTAMP
-                        WHERE sku = %s
-                    """, (estoque_atual, sku))
-                    skus_atualizados += 1
-                    logging.debug(f"🔄 SKU {sku} atualizado: estoque = {estoque_atual}")
-                else:
-                    # Se o SKU não existe, insere um novo registro com valores padrão
-                    # Usamos o nome do SKU como descrição padrão
-                    descricao = f"Produto {sku}"
-                    
-                    cursor_item.execute("""
-                        INSERT INTO estoque (
-                            sku, descricao, estoque, minimo, cmv, valor_liquido, status
-                        ) VALUES (%s, %s, %s, 30, 0, 0, %s)
-                    """, (
-                        sku, 
-                        descricao, 
-                        estoque_atual,
-                        'Em estoque' if estoque_atual > 0 else 'Sem Estoque'
-                    ))
-                    skus_inseridos += 1
-                    logging.info(f"➕ Novo SKU {sku} inserido: estoque = {estoque_atual}")
-                
-                # Confirma a transação para este SKU
-                conn_item.commit()
-            
-            except Exception as e:
-                # Se houver erro, faz rollback apenas desta transação
-                conn_item.rollback()
-                logging.error(f"❌ Erro ao processar SKU {sku} (linha {i}): {e}")
-                skus_nao_encontrados += 1
-            finally:
-                # Fecha a conexão para este SKU
-                cursor_item.close()
-                conn_item.close()
+            if i in rejeitadas or len(linha) < 5 or not linha[0] or not linha[4]:
+                continue
+            itens[skus[i - 1]] = (i + 1, skus[i - 1], estoques[i - 1], linha)
 
-        # Atualiza o status de todos os produtos com base no estoque e mínimo
-        logging.info("🔄 Atualizando status dos produtos baseado no estoque...")
-        cursor.execute("""
-            UPDATE estoque
-            SET status = CASE 
-                WHEN estoque = 0 THEN 'Sem Estoque'
-                WHEN estoque < minimo THEN 'Em reposição'
-                WHEN estoque < minimo * 1.2 THEN 'Em negociação'
-                WHEN estoque <= minimo * 1.5 THEN 'Em estoque'
-                ELSE 'Estoque alto'
-            END
-        """)
-        produtos_atualizados = cursor.rowcount
-        logging.info(f"✅ Status atualizado para {produtos_atualizados} produtos")
+        # Todos os SKUs na mesma conexão, em páginas de INSERT ... ON CONFLICT
+        with metricas.etapa('gravacao'):
+            skus_atualizados, skus_inseridos, skus_inalterados, rejeicoes_banco = gravar_estoque(
+                cursor, list(itens.values()))
+            conn.commit()
+        skus_nao_encontrados = len(rejeicoes_banco)
 
-        conn.commit()
+        # Erros do banco também ficam registrados para revisão
+        if rejeicoes_banco:
+            with metricas.etapa('quarentena'):
+                quarentena.registrar(cursor, 'estoque', rejeicoes_banco, LARGURA_ESTOQUE)
+                conn.commit()
+
+        # O status dos SKUs gravados já foi calculado no upsert; aqui só entram
+        # os SKUs cujo mínimo mudou desde o último ciclo
+        logging.info("🔄 Conferindo status dos produtos com mínimo alterado...")
+        with metricas.etapa('status'):
+            cursor.execute(SQL_RECALCULAR_STATUS)
+            produtos_atualizados = cursor.rowcount
+            conn.commit()
+        logging.info(f"✅ Status recalculado para {produtos_atualizados} produtos")
         
-        # Atualiza as métricas de vendas para cada SKU
+        # Atualiza as métricas de vendas para cada SKU (a partir do resumo diário)
         logging.info("📈 Calculando métricas de vendas dos últimos 30 dias...")
-        cursor.execute("""
-            WITH vendas_ultimos_30_dias AS (
-                SELECT 
-                    sku,
-                    COUNT(*) as total_vendas,
-                    COUNT(*)::float / 30 as media_diaria
-                FROM vendas_ml
-                WHERE data >= CURRENT_DATE - INTERVAL '30 days'
-                GROUP BY sku
-            ),
-            ultima_venda AS (
-                SELECT 
-                    sku,
-                    MAX(data) as ultima_data_venda
-                FROM vendas_ml
-                GROUP BY sku
-            )
-            UPDATE estoque e
-            SET 
-                media_vendas = COALESCE(v.media_diaria, 0),
-                total_vendas = COALESCE(v.total_vendas, 0),
-                ultima_venda = COALESCE(uv.ultima_data_venda, NULL)
-            FROM vendas_ultimos_30_dias v
-            LEFT JOIN ultima_venda uv ON v.sku = uv.sku
-            WHERE e.sku = v.sku
-        """)
-        metricas_atualizadas = cursor.rowcount
+        with metricas.etapa('metricas_vendas'):
+            cursor.execute("""
+                WITH vendas_ultimos_30_dias AS (
+                    SELECT 
+                        sku,
+                        SUM(pedidos) as total_vendas
+                    FROM vendas_diarias_sku
+                    WHERE dia >= CURRENT_DATE - 30
+                    GROUP BY sku
+                ),
+                ultima_venda AS (
+                    SELECT 
+                        sku,
+                        MAX(ultima_venda) as ultima_data_venda
+                    FROM vendas_diarias_sku
+                    GROUP BY sku
+                )
+                UPDATE estoque e
+                SET 
+                    total_vendas = COALESCE(v.total_vendas, 0),
+                    ultima_venda = COALESCE(uv.ultima_data_venda, NULL)
+                FROM vendas_ultimos_30_dias v
+                LEFT JOIN ultima_venda uv ON v.sku = uv.sku
+                WHERE e.sku = v.sku
+            """)
+            metricas_atualizadas = cursor.rowcount
+            conn.commit()
         logging.info(f"📊 Métricas de vendas atualizadas para {metricas_atualizadas} produtos")
-        
-        conn.commit()
+
+        # Média de vendas e previsão de ruptura (suavização exponencial sobre o resumo diário)
+        with metricas.etapa('previsao'):
+            previsao_estoque.atualizar_previsoes_opcional(cursor)
+            conn.commit()
+
+        # Sugestão de compra (estoque + pedidos em aberto contra a demanda prevista)
+        with metricas.etapa('recomendacao_compra'):
+            recomendacao_compra.atualizar_recomendacoes_opcional(cursor)
+            conn.commit()
         
         # Relatório final detalhado
-        total_processados = skus_atualizados + skus_inseridos
+        total_processados = skus_atualizados + skus_inseridos + skus_inalterados
+        metricas.contar('linhas_lidas', total_linhas)
+        metricas.contar('linhas_gravadas', skus_atualizados + skus_inseridos)
+        metricas.contar('linhas_rejeitadas', len(rejeitadas))
         logging.info("\n" + "="*60)
         logging.info("📋 RELATÓRIO DE ATUALIZAÇÃO DE ESTOQUE")
         logging.info("="*60)
         logging.info(f"📦 Total de linhas processadas: {total_linhas}")
         logging.info(f"🔄 SKUs atualizados: {skus_atualizados}")
         logging.info(f"➕ Novos SKUs inseridos: {skus_inseridos}")
+        logging.info(f"⏸️  SKUs sem alteração: {skus_inalterados}")
         logging.info(f"✅ Total processados com sucesso: {total_processados}")
         logging.info(f"❌ SKUs com erro: {skus_nao_encontrados}")
+        logging.info(f"🚫 Linhas rejeitadas (quarentena): {len(rejeitadas)}")
         logging.info(f"📊 Taxa de sucesso: {(total_processados/total_linhas*100):.1f}%")
         logging.info("="*60)
         
@@ -248,29 +336,36 @@ def notificar_atualizacao():
     except Exception as e:
         logging.error(f"❌ Erro ao notificar dashboard: {e}")
 
-def main():
+@metricas.medir_execucao('importar_estoque')
+def main(fonte=None):
     """Função principal que executa o processo de atualização"""
     try:
         logging.info("\n" + "="*60)
         logging.info("🚀 INICIANDO ATUALIZAÇÃO DOS DADOS DE ESTOQUE")
         logging.info("="*60)
         
-        # Conecta à planilha
-        aba = conectar_planilha()
-        logging.info("📥 Obtendo dados da planilha...")
-        dados = aba.get_all_values()
-        logging.info(f"📊 {len(dados)} linhas obtidas da planilha (incluindo cabeçalho)")
+        # Sem fonte explícita, conecta à planilha
+        if fonte is None:
+            with metricas.etapa('conexao_planilha'):
+                fonte = FontePlanilha(conectar_planilha())
+        logging.info(f"📥 Obtendo dados de {fonte.descricao}...")
+        with metricas.etapa('leitura_fonte'):
+            dados = fonte.ler_tudo()
+        logging.info(f"📊 {len(dados)} linhas obtidas (incluindo cabeçalho)")
         
         # Atualiza os dados no banco
         if atualizar_estoque(dados):
             logging.info("🎉 Dados de estoque atualizados com sucesso!")
-            notificar_atualizacao()
-        else:
-            logging.error("💥 Falha ao atualizar os dados de estoque!")
+            with metricas.etapa('notificacao'):
+                notificar_atualizacao()
+            return True
+        logging.error("💥 Falha ao atualizar os dados de estoque!")
+        return False
             
     except Exception as e:
         erro = f"❌ Erro crítico na execução principal: {e}"
         logging.error(erro)
+        return False
 
 def executar_com_intervalo(intervalo_minutos=10):
     """Executa a atualização em intervalos regulares"""
@@ -299,8 +394,16 @@ def executar_com_intervalo(intervalo_minutos=10):
             ciclo += 1
 
 if __name__ == "__main__":
-    # Para executar uma única vez:
-    # main()
-    
-    # Para executar continuamente a cada 10 minutos:
-    executar_com_intervalo(10)
+    parser = argparse.ArgumentParser(description="Atualiza o estoque a partir da planilha")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa um único ciclo e encerra")
+    parser.add_argument('--arquivo',
+                        help="Lê o estoque de uma exportação local (CSV, XLSX ou Parquet) em vez da planilha")
+    args = parser.parse_args()
+
+    if args.arquivo:
+        main(FonteArquivo(args.arquivo))
+    elif args.uma_vez:
+        main()
+    else:
+        # Para executar continuamente a cada 10 minutos:
+        executar_com_intervalo(10)
@@ -0,0 +1,148 @@
+import argparse
+import time
+import logging
+from datetime import timedelta
+from config import PLANILHA_NOME_MAGALU, ABA_NOME_MAGALU
+from parser_colunar import ESQUEMA_VENDAS_MAGALU
+from carga_lote import mesclar_em_lote, preparar_linhas
+import quarentena
+from fontes_dados import FonteArquivo, FontePlanilha, TAMANHO_LOTE_PADRAO
+import conexoes
+
+# Configurar logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler('atualizacao_vendas_magalu.log'),
+        logging.StreamHandler()
+    ]
+)
+
+# Colunas da tabela vendas_magalu na ordem das colunas A-I da planilha
+COLUNAS_VENDAS_MAGALU = tuple(nome for nome, _, _ in ESQUEMA_VENDAS_MAGALU)
+
+# Um pedido pode ter vários SKUs
+CHAVE_VENDAS_MAGALU = ('order_id', 'sku')
+
+# Valores em reais (sem a divisão por 100 da planilha do ML) e datas sem ajuste de fuso
+DIVISOR_MOEDA = 1
+AJUSTE_DATA = timedelta(0)
+
+def conectar_banco():
+    try:
+        conn = conexoes.conectar_banco()
+        print("Conexão com o banco de dados estabelecida com sucesso!")
+        return conn
+    except Exception as e:
+        print(f"Erro ao conectar ao banco de dados: {e}")
+        exit()
+
+def configurado():
+    """Planilha da Magalu definida (PLANILHA_NOME_MAGALU e ABA_NOME_MAGALU)"""
+    return bool(PLANILHA_NOME_MAGALU and ABA_NOME_MAGALU)
+
+def conectar_planilha():
+    try:
+        aba = conexoes.abrir_aba(PLANILHA_NOME_MAGALU, ABA_NOME_MAGALU)
+        print("Conexão com a planilha da Magalu estabelecida com sucesso!")
+        return aba
+    except Exception as e:
+        conexoes.tratar_erro_planilha(e)
+        print(f"Erro ao conectar à planilha da Magalu: {e}")
+        exit()
+
+def inserir_dados_no_banco(dados_planilha, primeira_linha=2, chaves_vistas=None):
+    """Mesma carga em lote do ML: conversão colunar, COPY e um único upsert
+    por (order_id, sku) que só reescreve as linhas cujo conteúdo mudou."""
+    try:
+        linhas, rejeicoes = preparar_linhas(
+            dados_planilha, ESQUEMA_VENDAS_MAGALU, CHAVE_VENDAS_MAGALU, primeira_linha,
+            DIVISOR_MOEDA, AJUSTE_DATA, exigir_completas=False, chaves_vistas=chaves_vistas)
+
+        conn = conectar_banco()
+        cursor = conn.cursor()
+
+        novos, atualizados = mesclar_em_lote(
+            cursor, 'vendas_magalu', COLUNAS_VENDAS_MAGALU, CHAVE_VENDAS_MAGALU, linhas)
+        existentes = len(linhas) - novos
+        if rejeicoes:
+            quarentena.registrar(cursor, 'vendas_magalu', rejeicoes, len(COLUNAS_VENDAS_MAGALU))
+            print(f"Aviso: {quarentena.resumo(rejeicoes)}")
+
+        conn.commit()
+        print(f"Importação Magalu concluída! {novos} novas vendas inseridas. "
+              f"{existentes} já existiam ({atualizados} atualizadas).")
+
+        cursor.close()
+        conn.close()
+        return {'novos': novos, 'existentes': existentes, 'atualizados': atualizados,
+                'rejeitadas': len(rejeicoes)}
+
+    except Exception as e:
+        print(f"Erro ao inserir dados da Magalu no banco: {e}")
+        return False
+
+def importar_fonte(fonte):
+    """Passa todos os lotes de uma fonte pelo pipeline de carga e soma os contadores"""
+    totais = {'novos': 0, 'existentes': 0, 'atualizados': 0, 'rejeitadas': 0}
+    chaves_vistas = set()
+    for lote in fonte.lotes():
+        resultado = inserir_dados_no_banco(lote.dados, lote.primeira_linha, chaves_vistas)
+        if not resultado:
+            return False
+        for chave in totais:
+            totais[chave] += resultado[chave]
+
+    fonte.confirmar()
+    print(f"Total importado de {fonte.descricao}: {totais['novos']} novas vendas, "
+          f"{totais['existentes']} já existiam ({totais['atualizados']} atualizadas), "
+          f"{totais['rejeitadas']} problemas na quarentena.")
+    return totais
+
+def main(fonte=None):
+    try:
+        print("Iniciando atualização das vendas da Magalu...")
+
+        if fonte is None:
+            fonte = FontePlanilha(conectar_planilha())
+
+        if importar_fonte(fonte):
+            print("Vendas da Magalu atualizadas com sucesso!")
+            return True
+        print("Erro ao atualizar as vendas da Magalu!")
+        return False
+
+    except Exception as e:
+        print(f"Erro na execução principal (Magalu): {e}")
+        return False
+
+def executar_com_intervalo(intervalo_minutos=10):
+    logging.info(f"Iniciando atualização automática das vendas da Magalu a cada {intervalo_minutos} minutos")
+
+    while True:
+        try:
+            main()
+            time.sleep(intervalo_minutos * 60)
+        except KeyboardInterrupt:
+            logging.info("Processo interrompido pelo usuário")
+            break
+        except Exception as e:
+            logging.error(f"Erro no processo de atualização: {e}")
+            time.sleep(300)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Importa as vendas da Magalu da planilha para o banco")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa um único ciclo e encerra")
+    parser.add_argument('--arquivo',
+                        help="Importa uma exportação local (CSV, XLSX ou Parquet) em vez da planilha")
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help="Linhas por lote ao ler arquivos")
+    args = parser.parse_args()
+
+    if args.arquivo:
+        main(FonteArquivo(args.arquivo, args.tamanho_lote))
+    elif args.uma_vez:
+        main()
+    else:
+        executar_com_intervalo(10)
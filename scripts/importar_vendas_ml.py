@@ -1,11 +1,19 @@
-import gspread
-import psycopg2
-from oauth2client.service_account import ServiceAccountCredentials
+import argparse
+import hashlib
+import json
+import os
 from datetime import datetime, timedelta
 import time
 import logging
-from config import DATABASE_CONFIG, GOOGLE_SHEETS_CREDENTIALS, PLANILHA_NOME, ABA_NOME
+from config import PLANILHA_NOME, ABA_NOME
 import requests
+from parser_colunar import ESQUEMA_VENDAS_ML
+from carga_lote import mesclar_em_lote, preparar_linhas
+import quarentena
+import metricas
+import rollup_vendas
+from fontes_dados import FonteArquivo, FontePlanilha, Lote, TAMANHO_LOTE_PADRAO
+import conexoes
 
 # Configurar logging
 logging.basicConfig(
@@ -14,9 +22,24 @@ logging.basicConfig(
     format='%(asctime)s - %(levelname)s - %(message)s'
 )
 
+# Modo de carga padrão: 'lote' (COPY + INSERT ... ON CONFLICT) ou 'legado' (linha a linha)
+MODO_CARGA = os.getenv('MODO_CARGA_VENDAS', 'lote')
+
+# Arquivo com a marca d'água da última linha importada (sincronização incremental)
+ARQUIVO_WATERMARK = os.getenv('WATERMARK_VENDAS_ML', 'watermark_vendas_ml.json')
+# Quantidade de linhas finais usadas para detectar edições/reordenação na planilha
+LINHAS_VERIFICACAO = 50
+# Mesmo com a marca d'água válida, relê tudo periodicamente para captar edições antigas
+HORAS_ENTRE_LEITURAS_COMPLETAS = 24
+# Número de colunas lidas da planilha (A-T)
+TOTAL_COLUNAS = 20
+
+# Colunas da tabela vendas_ml na ordem das colunas A-T da planilha
+COLUNAS_VENDAS_ML = tuple(nome for nome, _, _ in ESQUEMA_VENDAS_ML)
+
 def conectar_banco():
     try:
-        conn = psycopg2.connect(**DATABASE_CONFIG)
+        conn = conexoes.conectar_banco()
         print("Conexão com o banco de dados estabelecida com sucesso!")
         return conn
     except Exception as e:
@@ -25,19 +48,13 @@ def conectar_banco():
 
 def conectar_planilha():
     try:
-        scope = ['https://spreadsheets.google.com/feeds',
-                 'https://www.googleapis.com/auth/drive']
-        
-        creds = ServiceAccountCredentials.from_json_keyfile_name(
-            GOOGLE_SHEETS_CREDENTIALS, scope)
-        client = gspread.authorize(creds)
-        
-        planilha = client.open(PLANILHA_NOME)
-        aba = planilha.worksheet(ABA_NOME)
+        # Cliente autorizado uma vez e reaproveitado entre os ciclos
+        aba = conexoes.abrir_aba(PLANILHA_NOME, ABA_NOME)
         
         print("Conexão com a planilha estabelecida com sucesso!")
         return aba
     except Exception as e:
+        conexoes.tratar_erro_planilha(e)
         print(f"Erro ao conectar à planilha: {e}")
         exit()
 
@@ -78,19 +95,161 @@ def tratar_valor(valor, tipo=float, default=0):
         print(f"Erro ao tratar valor '{valor}' do tipo {tipo}: {e}")
         return default
 
+def normalizar_linhas(linhas):
+    """Recorta/completa as linhas para as colunas A-T (a API omite células vazias no fim da linha)"""
+    return [list(linha[:TOTAL_COLUNAS]) + [''] * (TOTAL_COLUNAS - len(linha)) for linha in linhas]
+
+def hash_linhas(linhas):
+    """Hash estável de um bloco de linhas normalizadas"""
+    conteudo = json.dumps(linhas, ensure_ascii=False, separators=(',', ':'))
+    return hashlib.sha256(conteudo.encode('utf-8')).hexdigest()
+
+def carregar_watermark():
+    """Lê a marca d'água salva; retorna None se não existir ou for de outra planilha/aba"""
+    try:
+        with open(ARQUIVO_WATERMARK, encoding='utf-8') as f:
+            watermark = json.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logging.warning(f"Watermark ilegível, fazendo leitura completa: {e}")
+        return None
+
+    if watermark.get('planilha') != PLANILHA_NOME or watermark.get('aba') != ABA_NOME:
+        logging.info("Watermark pertence a outra planilha/aba, fazendo leitura completa")
+        return None
+    return watermark
+
+def salvar_watermark(watermark):
+    """Grava a marca d'água de forma atômica (arquivo temporário + rename)"""
+    temporario = f"{ARQUIVO_WATERMARK}.tmp"
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(watermark, f)
+    os.replace(temporario, ARQUIVO_WATERMARK)
+
+def invalidar_watermark():
+    """Remove a marca d'água, forçando leitura completa no próximo ciclo"""
+    try:
+        os.remove(ARQUIVO_WATERMARK)
+    except FileNotFoundError:
+        pass
+
+def montar_watermark(ultima_linha, linhas_finais, leitura_completa_em):
+    return {
+        'planilha': PLANILHA_NOME,
+        'aba': ABA_NOME,
+        'ultima_linha': ultima_linha,
+        'hash': hash_linhas(normalizar_linhas(linhas_finais[-LINHAS_VERIFICACAO:])),
+        'leitura_completa_em': leitura_completa_em,
+        'atualizado_em': datetime.now().isoformat(timespec='seconds'),
+    }
+
+def ler_planilha_incremental(aba, completo=False):
+    """Lê apenas as linhas novas desde a última importação.
+
+    Retorna (dados, novo_watermark), com `dados` no mesmo formato de
+    get_all_values() (cabeçalho na primeira linha). Busca o cabeçalho e a
+    cauda da aba a partir das últimas LINHAS_VERIFICACAO linhas já
+    importadas; se o hash dessas linhas não bater com o salvo (edição,
+    remoção ou reordenação) cai para a leitura completa.
+    """
+    watermark = None if completo else carregar_watermark()
+
+    if watermark:
+        ultima_completa = datetime.fromisoformat(watermark['leitura_completa_em'])
+        if datetime.now() - ultima_completa > timedelta(hours=HORAS_ENTRE_LEITURAS_COMPLETAS):
+            print("Leitura completa periódica da planilha...")
+            watermark = None
+
+    if watermark and watermark['ultima_linha'] >= 1:
+        ultima_linha = watermark['ultima_linha']
+        inicio = max(2, ultima_linha - LINHAS_VERIFICACAO + 1)
+        total_verificacao = ultima_linha - inicio + 1
+
+        cabecalho, cauda = aba.batch_get(['A1:T1', f'A{inicio}:T'])
+        cauda = normalizar_linhas(cauda)
+        verificacao = cauda[:total_verificacao]
+
+        if len(verificacao) == total_verificacao and hash_linhas(verificacao) == watermark['hash']:
+            novas = cauda[total_verificacao:]
+            print(f"Leitura incremental: {len(novas)} linhas novas após a linha {ultima_linha}")
+            dados = normalizar_linhas(cabecalho or [[]]) + novas
+            watermark_novo = montar_watermark(
+                ultima_linha + len(novas), cauda, watermark['leitura_completa_em'])
+            return dados, watermark_novo
+
+        print("Planilha alterada antes da última linha importada, fazendo leitura completa...")
+
+    dados = aba.get_all_values()
+    print(f"Leitura completa: {len(dados)} linhas (incluindo cabeçalho)")
+    return dados, montar_watermark(
+        len(dados), dados[1:], datetime.now().isoformat(timespec='seconds'))
+
+class FontePlanilhaIncremental(FontePlanilha):
+    """Aba de vendas lida a partir da marca d'água; confirmar() avança a marca"""
+
+    def __init__(self, aba, completo=False):
+        super().__init__(aba)
+        self.completo = completo
+        self._watermark = None
+
+    def lotes(self):
+        dados, self._watermark = ler_planilha_incremental(self.aba, self.completo)
+        primeira_linha = self._watermark['ultima_linha'] - len(dados) + 2
+        yield Lote(dados, primeira_linha)
+
+    def confirmar(self):
+        # A marca d'água só avança depois que as linhas foram gravadas
+        if self._watermark:
+            salvar_watermark(self._watermark)
+
 def limpar_tabela():
     try:
         conn = conectar_banco()
         cursor = conn.cursor()
         cursor.execute("TRUNCATE TABLE vendas_ml RESTART IDENTITY;")
+        rollup_vendas.limpar(cursor)
         conn.commit()
         cursor.close()
         conn.close()
+        # Sem dados no banco a próxima leitura precisa ser completa
+        invalidar_watermark()
         print("Tabela limpa e IDs reiniciados com sucesso!")
     except Exception as e:
         print(f"Erro ao limpar a tabela: {e}")
 
-def inserir_dados_no_banco(dados_planilha):
+def converter_linha(linha):
+    """Converte uma linha da planilha (colunas A-T) na tupla de valores da tabela vendas_ml"""
+    marketplace = linha[0]  # A - MARKETPLACE
+    pedido = tratar_valor(linha[1], tipo=str)  # B - PEDIDOS
+    data = tratar_valor(linha[2], tipo=datetime)  # C - DATA
+    sku = tratar_valor(linha[3], tipo=str)  # D - SKU
+    unidades = tratar_valor(linha[4], tipo=int)  # E - UNIDADES
+    status = tratar_valor(linha[5], tipo=str)  # F - STATUS
+    valor_comprado = tratar_valor(linha[6])  # G - VALOR COMPRADO
+    valor_vendido = tratar_valor(linha[7])  # H - VALOR VENDIDO
+    taxas = tratar_valor(linha[8])  # I - TAXAS
+    frete = tratar_valor(linha[9])  # J - FRETE
+    descontos = tratar_valor(linha[10])  # K - DESCONTOS
+    ctl = tratar_valor(linha[11])  # L - CTL
+    receita_envio = tratar_valor(linha[12])  # M - RECEITA P/ ENVIO
+    valor_liquido = tratar_valor(linha[13])  # N - VALOR LÍQUIDO
+    lucro = tratar_valor(linha[14])  # O - LUCRO
+    markup = tratar_valor(linha[15])  # P - MARKUP
+    margem_lucro = tratar_valor(linha[16])  # Q - MARGEM DE LUCRO
+    envio = tratar_valor(linha[17], tipo=str)  # R - ENVIO
+    numero_envio = tratar_valor(linha[18], tipo=int)  # S - NÚMERO ENVIO
+    imposto = tratar_valor(linha[19])  # T - IMPOSTO
+
+    return (
+        marketplace, pedido, data, sku, unidades, status,
+        valor_comprado, valor_vendido, taxas, frete,
+        descontos, ctl, receita_envio, valor_liquido,
+        lucro, markup, margem_lucro, envio, numero_envio, imposto
+    )
+
+def inserir_dados_linha_a_linha(dados_planilha):
+    """Caminho legado: um SELECT e um INSERT por linha da planilha"""
     try:
         conn = conectar_banco()
         cursor = conn.cursor()
@@ -98,32 +257,15 @@ def inserir_dados_no_banco(dados_planilha):
         # Contadores para o relatório
         novos_pedidos = 0
         pedidos_existentes = 0
+        dias_alterados = set()
 
         for linha in dados_planilha[1:]:
             try:
                 if not linha[1]:
                     continue
-                    
-                marketplace = linha[0]  # A - MARKETPLACE
-                pedido = tratar_valor(linha[1], tipo=str)  # B - PEDIDOS
-                data = tratar_valor(linha[2], tipo=datetime)  # C - DATA
-                sku = tratar_valor(linha[3], tipo=str)  # D - SKU
-                unidades = tratar_valor(linha[4], tipo=int)  # E - UNIDADES
-                status = tratar_valor(linha[5], tipo=str)  # F - STATUS
-                valor_comprado = tratar_valor(linha[6])  # G - VALOR COMPRADO
-                valor_vendido = tratar_valor(linha[7])  # H - VALOR VENDIDO
-                taxas = tratar_valor(linha[8])  # I - TAXAS
-                frete = tratar_valor(linha[9])  # J - FRETE
-                descontos = tratar_valor(linha[10])  # K - DESCONTOS
-                ctl = tratar_valor(linha[11])  # L - CTL
-                receita_envio = tratar_valor(linha[12])  # M - RECEITA P/ ENVIO
-                valor_liquido = tratar_valor(linha[13])  # N - VALOR LÍQUIDO
-                lucro = tratar_valor(linha[14])  # O - LUCRO
-                markup = tratar_valor(linha[15])  # P - MARKUP
-                margem_lucro = tratar_valor(linha[16])  # Q - MARGEM DE LUCRO
-                envio = tratar_valor(linha[17], tipo=str)  # R - ENVIO
-                numero_envio = tratar_valor(linha[18], tipo=int)  # S - NÚMERO ENVIO
-                imposto = tratar_valor(linha[19])  # T - IMPOSTO
+
+                valores = converter_linha(linha)
+                pedido = valores[1]
 
                 # Verifica se o pedido já existe
                 cursor.execute("SELECT id FROM vendas_ml WHERE pedido = %s", (pedido,))
@@ -138,32 +280,106 @@ def inserir_dados_no_banco(dados_planilha):
                             descontos, ctl, receita_envio, valor_liquido,
                             lucro, markup, margem_lucro, envio, numero_envio, imposto
                         ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """, (
-                        marketplace, pedido, data, sku, unidades, status,
-                        valor_comprado, valor_vendido, taxas, frete,
-                        descontos, ctl, receita_envio, valor_liquido,
-                        lucro, markup, margem_lucro, envio, numero_envio, imposto
-                    ))
+                    """, valores)
                     novos_pedidos += 1
+                    dias_alterados.add(valores[2].date())
                 else:
                     pedidos_existentes += 1
 
             except Exception as e:
                 print(f"Erro ao processar linha: {e}")
-                print(f"Erro ao inserir pedido {pedido}: {e}")
+                print(f"Erro ao inserir pedido {linha[1]}: {e}")
                 continue
 
+        rollup_vendas.atualizar_dias(cursor, dias_alterados)
         conn.commit()
         print(f"Importação concluída! {novos_pedidos} novos pedidos inseridos. {pedidos_existentes} pedidos já existiam.")
         
         cursor.close()
         conn.close()
-        return True
+        return {'novos': novos_pedidos, 'existentes': pedidos_existentes}
 
     except Exception as e:
         print(f"Erro ao inserir dados no banco: {e}")
         return False
 
+def inserir_dados_em_lote(dados_planilha, primeira_linha=2, chaves_vistas=None):
+    """Carga em lote: conversão colunar da planilha, COPY das linhas para uma
+    tabela temporária e um único INSERT ... ON CONFLICT (pedido) para mesclar
+    em vendas_ml.
+
+    Cada linha leva o hash do seu conteúdo (hash_linha); pedidos já existentes
+    só são reescritos quando o hash mudou (cancelamentos, devoluções, tarifas
+    corrigidas na planilha). São três idas ao banco por ciclo, independente do
+    tamanho da planilha.
+    """
+    try:
+        # Converte a planilha coluna a coluna antes de abrir a conexão
+        with metricas.etapa('conversao'):
+            linhas, rejeicoes = preparar_linhas(dados_planilha, ESQUEMA_VENDAS_ML, 'pedido', primeira_linha,
+                                                chaves_vistas=chaves_vistas)
+
+        with metricas.etapa('conexao_banco'):
+            conn = conectar_banco()
+        cursor = conn.cursor()
+
+        dias_alterados = set()
+        with metricas.etapa('gravacao'):
+            novos_pedidos, pedidos_atualizados = mesclar_em_lote(
+                cursor, 'vendas_ml', COLUNAS_VENDAS_ML, 'pedido', linhas, dias_alterados)
+        pedidos_existentes = len(linhas) - novos_pedidos
+        # Resumo diário só dos dias que mudaram, na mesma transação
+        with metricas.etapa('resumo_diario'):
+            rollup_vendas.atualizar_dias(cursor, dias_alterados)
+        # Rejeições entram na mesma transação da carga
+        if rejeicoes:
+            with metricas.etapa('quarentena'):
+                quarentena.registrar(cursor, 'vendas_ml', rejeicoes, TOTAL_COLUNAS)
+            print(f"Aviso: {quarentena.resumo(rejeicoes)}")
+
+        with metricas.etapa('commit'):
+            conn.commit()
+        print(f"Importação concluída! {novos_pedidos} novos pedidos inseridos. "
+              f"{pedidos_existentes} pedidos já existiam ({pedidos_atualizados} atualizados).")
+
+        cursor.close()
+        conn.close()
+        return {'novos': novos_pedidos, 'existentes': pedidos_existentes,
+                'atualizados': pedidos_atualizados, 'rejeitadas': len(rejeicoes)}
+
+    except Exception as e:
+        print(f"Erro ao inserir dados no banco: {e}")
+        return False
+
+def inserir_dados_no_banco(dados_planilha, modo=MODO_CARGA, primeira_linha=2, chaves_vistas=None):
+    """Insere os pedidos novos da planilha usando o modo de carga escolhido ('lote' ou 'legado')"""
+    if modo == 'legado':
+        with metricas.etapa('gravacao'):
+            return inserir_dados_linha_a_linha(dados_planilha)
+    return inserir_dados_em_lote(dados_planilha, primeira_linha, chaves_vistas)
+
+def importar_fonte(fonte, modo=MODO_CARGA):
+    """Passa todos os lotes de uma fonte pelo pipeline de carga e soma os contadores"""
+    totais = {'novos': 0, 'existentes': 0, 'atualizados': 0, 'rejeitadas': 0}
+    chaves_vistas = set()
+    for lote in metricas.medir_iteracao(fonte.lotes(), 'leitura_fonte'):
+        resultado = inserir_dados_no_banco(lote.dados, modo, lote.primeira_linha, chaves_vistas)
+        if not resultado:
+            return False
+        for chave in totais:
+            # O caminho legado não atualiza pedidos existentes
+            totais[chave] += resultado.get(chave, 0)
+        metricas.contar('linhas_lidas', max(len(lote.dados) - 1, 0))
+
+    metricas.contar('linhas_gravadas', totais['novos'] + totais['atualizados'])
+    metricas.contar('linhas_rejeitadas', totais['rejeitadas'])
+
+    fonte.confirmar()
+    print(f"Total importado de {fonte.descricao}: {totais['novos']} novos pedidos, "
+          f"{totais['existentes']} já existiam ({totais['atualizados']} atualizados), "
+          f"{totais['rejeitadas']} problemas na quarentena.")
+    return totais
+
 def notificar_atualizacao():
     try:
         requests.post('http://localhost:3005/api/vendas/notificar-atualizacao')
@@ -171,30 +387,35 @@ def notificar_atualizacao():
     except Exception as e:
         logging.error(f"Erro ao notificar dashboard: {e}")
 
-def main():
+@metricas.medir_execucao('importar_vendas_ml')
+def main(modo=MODO_CARGA, completo=False, fonte=None):
     try:
         print("Iniciando atualização dos dados...")
         
-        # Conecta à planilha
-        aba = conectar_planilha()
-        dados = aba.get_all_values()
+        # Sem fonte explícita, lê da planilha só o que mudou desde o último ciclo
+        if fonte is None:
+            with metricas.etapa('conexao_planilha'):
+                fonte = FontePlanilhaIncremental(conectar_planilha(), completo)
         
         # Insere os dados no banco
-        if inserir_dados_no_banco(dados):
+        if importar_fonte(fonte, modo):
             print("Dados atualizados com sucesso!")
-            notificar_atualizacao()
-        else:
-            print("Erro ao atualizar os dados!")
+            with metricas.etapa('notificacao'):
+                notificar_atualizacao()
+            return True
+        print("Erro ao atualizar os dados!")
+        return False
             
     except Exception as e:
         print(f"Erro na execução principal: {e}")
+        return False
 
-def executar_com_intervalo(intervalo_minutos=5):
-    logging.info(f"Iniciando processo de atualização automática a cada {intervalo_minutos} minutos")
+def executar_com_intervalo(intervalo_minutos=5, modo=MODO_CARGA):
+    logging.info(f"Iniciando processo de atualização automática a cada {intervalo_minutos} minutos (carga: {modo})")
     
     while True:
         try:
-            main()
+            main(modo)
             # Aguarda o intervalo especificado (em segundos)
             time.sleep(intervalo_minutos * 60)
         except KeyboardInterrupt:
@@ -206,8 +427,26 @@ def executar_com_intervalo(intervalo_minutos=5):
             time.sleep(300)
 
 if __name__ == "__main__":
-    # Para executar uma única vez:
-    # main()
-    
-    # Para executar continuamente a cada hora:
-    executar_com_intervalo(10)  # 10 * 6 minutos
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Importa as vendas do Mercado Livre da planilha para o banco")
+    parser.add_argument('--modo', choices=['lote', 'legado'], default=MODO_CARGA,
+                        help="'lote' usa COPY + ON CONFLICT; 'legado' faz um SELECT/INSERT por linha")
+    parser.add_argument('--uma-vez', action='store_true', help="Executa um único ciclo e encerra")
+    parser.add_argument('--completo', action='store_true',
+                        help="Ignora a marca d'água e relê a planilha inteira")
+    parser.add_argument('--arquivo',
+                        help="Importa uma exportação local (CSV, XLSX ou Parquet) em vez da planilha")
+    parser.add_argument('--tamanho-lote', type=int, default=TAMANHO_LOTE_PADRAO,
+                        help="Linhas por lote ao ler arquivos")
+    args = parser.parse_args()
+
+    if args.completo:
+        invalidar_watermark()
+
+    if args.arquivo:
+        # Carga histórica: um único ciclo, sem tocar na marca d'água da planilha
+        main(args.modo, fonte=FonteArquivo(args.arquivo, args.tamanho_lote))
+    elif args.uma_vez:
+        main(args.modo)
+    else:
+        # Para executar continuamente a cada 10 minutos:
+        executar_com_intervalo(10, args.modo)
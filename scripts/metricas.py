@@ -0,0 +1,274 @@
+"""Métricas por execução dos scripts (importadores e relatórios).
+
+Cada execução registra a duração das etapas (leitura da planilha, conversão,
+gravação, geração do PDF...), contadores de linhas, idas ao banco e bytes
+lidos. Ao final grava uma linha JSON em METRICAS_DIR/execucoes.jsonl e o
+arquivo METRICAS_DIR/<script>.prom no formato textfile do Prometheus (para o
+textfile collector do node_exporter).
+
+Desativado por padrão: sem METRICAS_DIR, medir_execucao() devolve o main()
+original, etapa()/contar() não fazem nada além de uma consulta a um
+thread-local e as conexões continuam usando o cursor padrão do psycopg2.
+
+A execução corrente é guardada por thread, então importadores rodando em
+paralelo (daemon, sincronizar_vendas) medem cada um apenas o seu trabalho.
+"""
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+from datetime import datetime
+
+from psycopg2 import extensions
+
+DIRETORIO = os.getenv('METRICAS_DIR', '')
+ATIVO = bool(DIRETORIO)
+
+ARQUIVO_EXECUCOES = 'execucoes.jsonl'
+PREFIXO = 'dashboard_script'
+
+# Descrição dos contadores conhecidos no arquivo do Prometheus
+DESCRICOES = {
+    'linhas_lidas': 'Linhas lidas da fonte (sem cabeçalho)',
+    'linhas_gravadas': 'Linhas inseridas ou atualizadas no banco',
+    'linhas_rejeitadas': 'Linhas enviadas para a quarentena',
+    'idas_banco': 'Comandos enviados ao banco (execute, executemany, COPY)',
+    'linhas_banco': 'Linhas retornadas pelo banco',
+    'bytes_planilha': 'Bytes recebidos da API do Google Sheets',
+    'bytes_copy': 'Tamanho do CSV enviado ao banco via COPY',
+    'bytes_pdf': 'Tamanho do PDF gerado',
+}
+
+_local = threading.local()
+_FIM = object()
+_trava_arquivo = threading.Lock()
+
+
+class Execucao:
+    """Medições de uma execução de um script"""
+
+    def __init__(self, script):
+        self.script = script
+        self.inicio = time.time()
+        self._relogio = time.perf_counter()
+        self.etapas = defaultdict(float)
+        self.contadores = defaultdict(int)
+        self.segundos_banco = 0.0
+        self.duracao = None
+        self.sucesso = None
+
+    @contextmanager
+    def etapa(self, nome):
+        """Acumula o tempo do bloco na etapa (repetições somam, ex.: um por lote)"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.etapas[nome] += time.perf_counter() - inicio
+
+    def somar_etapa(self, nome, segundos):
+        """Soma à etapa um tempo medido fora de um bloco etapa() (ex.: em outras threads)"""
+        self.etapas[nome] += segundos
+
+    def contar(self, nome, quantidade=1):
+        self.contadores[nome] += quantidade
+
+    def encerrar(self, sucesso):
+        self.duracao = time.perf_counter() - self._relogio
+        self.sucesso = bool(sucesso)
+
+    def como_dict(self):
+        return {
+            'script': self.script,
+            'inicio': datetime.fromtimestamp(self.inicio).isoformat(timespec='seconds'),
+            'duracao_segundos': round(self.duracao, 4),
+            'sucesso': self.sucesso,
+            'etapas': {nome: round(segundos, 4) for nome, segundos in self.etapas.items()},
+            'segundos_banco': round(self.segundos_banco, 4),
+            'contadores': dict(self.contadores),
+        }
+
+
+class _ExecucaoNula:
+    """Usada quando as métricas estão desativadas ou fora de uma execução"""
+
+    def etapa(self, nome):
+        return nullcontext()
+
+    def somar_etapa(self, nome, segundos):
+        pass
+
+    def contar(self, nome, quantidade=1):
+        pass
+
+
+_NULA = _ExecucaoNula()
+
+
+def atual():
+    """Execução corrente desta thread (ou a execução nula)"""
+    return getattr(_local, 'execucao', None) or _NULA
+
+
+def etapa(nome):
+    return atual().etapa(nome)
+
+
+def somar_etapa(nome, segundos):
+    atual().somar_etapa(nome, segundos)
+
+
+def contar(nome, quantidade=1):
+    atual().contar(nome, quantidade)
+
+
+def medir_iteracao(iteravel, nome):
+    """Repassa os itens de `iteravel` somando na etapa o tempo de cada next()
+    (para fontes que leem os lotes sob demanda)"""
+    iterador = iter(iteravel)
+    while True:
+        with etapa(nome):
+            item = next(iterador, _FIM)
+        if item is _FIM:
+            return
+        yield item
+
+
+def medir_execucao(script):
+    """Decorador do main() dos scripts: mede a chamada e exporta ao final.
+
+    A execução é considerada com falha se a função levantar exceção ou
+    retornar False.
+    """
+    def decorador(funcao):
+        if not ATIVO:
+            return funcao
+
+        @functools.wraps(funcao)
+        def medida(*args, **kwargs):
+            anterior = getattr(_local, 'execucao', None)
+            execucao = _local.execucao = Execucao(script)
+            sucesso = False
+            try:
+                resultado = funcao(*args, **kwargs)
+                sucesso = resultado is not False
+                return resultado
+            finally:
+                _local.execucao = anterior
+                execucao.encerrar(sucesso)
+                exportar(execucao)
+        return medida
+    return decorador
+
+
+class CursorMedido(extensions.cursor):
+    """Cursor que conta as idas ao banco, o tempo de espera e as linhas lidas"""
+
+    def _medir(self, metodo, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return metodo(*args, **kwargs)
+        finally:
+            execucao = getattr(_local, 'execucao', None)
+            if execucao is not None:
+                execucao.segundos_banco += time.perf_counter() - inicio
+                execucao.contadores['idas_banco'] += 1
+
+    def execute(self, query, vars=None):
+        return self._medir(super().execute, query, vars)
+
+    def executemany(self, query, vars_list):
+        return self._medir(super().executemany, query, vars_list)
+
+    def copy_expert(self, sql, file, size=8192):
+        return self._medir(super().copy_expert, sql, file, size)
+
+    def callproc(self, procname, parameters=None):
+        return self._medir(super().callproc, procname, parameters)
+
+    def _contar_linhas(self, linhas):
+        contar('linhas_banco', linhas)
+
+    def fetchone(self):
+        linha = super().fetchone()
+        if linha is not None:
+            self._contar_linhas(1)
+        return linha
+
+    def fetchmany(self, size=None):
+        linhas = super().fetchmany(self.arraysize if size is None else size)
+        self._contar_linhas(len(linhas))
+        return linhas
+
+    def fetchall(self):
+        linhas = super().fetchall()
+        self._contar_linhas(len(linhas))
+        return linhas
+
+
+def fabrica_cursor():
+    """cursor_factory para psycopg2.connect(): None (cursor padrão) se desativado"""
+    return CursorMedido if ATIVO else None
+
+
+def contar_resposta_http(resposta, *args, **kwargs):
+    """Hook de resposta do requests (sessão do gspread): soma os bytes recebidos"""
+    execucao = getattr(_local, 'execucao', None)
+    if execucao is not None:
+        execucao.contadores['bytes_planilha'] += len(resposta.content)
+    return resposta
+
+
+def _rotulos(**rotulos):
+    def escapar(valor):
+        return str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{nome}="{escapar(valor)}"' for nome, valor in rotulos.items()) + '}'
+
+
+def formatar_prometheus(execucao):
+    """Texto no formato de exposição do Prometheus (valores da última execução)"""
+    script = execucao.script
+    linhas = []
+
+    def metrica(nome, tipo, descricao, amostras):
+        linhas.append(f"# HELP {PREFIXO}_{nome} {descricao}")
+        linhas.append(f"# TYPE {PREFIXO}_{nome} {tipo}")
+        for rotulos, valor in amostras:
+            linhas.append(f"{PREFIXO}_{nome}{_rotulos(script=script, **rotulos)} {valor}")
+
+    metrica('ultima_execucao_timestamp_segundos', 'gauge', 'Início da última execução (epoch)',
+            [({}, round(execucao.inicio, 3))])
+    metrica('duracao_segundos', 'gauge', 'Duração da última execução',
+            [({}, round(execucao.duracao, 6))])
+    metrica('sucesso', 'gauge', '1 se a última execução terminou sem erro',
+            [({}, int(execucao.sucesso))])
+    metrica('etapa_duracao_segundos', 'gauge', 'Duração de cada etapa na última execução',
+            [({'etapa': nome}, round(segundos, 6)) for nome, segundos in sorted(execucao.etapas.items())])
+    metrica('banco_segundos', 'gauge', 'Tempo esperando respostas do banco na última execução',
+            [({}, round(execucao.segundos_banco, 6))])
+    for nome, valor in sorted(execucao.contadores.items()):
+        metrica(nome, 'gauge', DESCRICOES.get(nome, nome.replace('_', ' ').capitalize()), [({}, valor)])
+    return '\n'.join(linhas) + '\n'
+
+
+def exportar(execucao, diretorio=None):
+    """Grava a linha JSON e o arquivo .prom; falhas de escrita não afetam o script"""
+    diretorio = diretorio or DIRETORIO
+    try:
+        os.makedirs(diretorio, exist_ok=True)
+        with _trava_arquivo:
+            with open(os.path.join(diretorio, ARQUIVO_EXECUCOES), 'a', encoding='utf-8') as f:
+                f.write(json.dumps(execucao.como_dict(), ensure_ascii=False) + '\n')
+
+        # Escrita atômica: o collector nunca lê um arquivo pela metade
+        destino = os.path.join(diretorio, f"{execucao.script}.prom")
+        temporario = f"{destino}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            f.write(formatar_prometheus(execucao))
+        os.replace(temporario, destino)
+    except OSError as e:
+        logging.warning(f"Não foi possível exportar as métricas de {execucao.script}: {e}")
@@ -0,0 +1,99 @@
+"""Modelo calculado do relatório diário de vendas.
+
+Monta, a partir do DadosRelatorio (dados_relatorio.py), um único DataFrame
+indexado por SKU com os totais de ontem, anteontem e do mês, meta, margem,
+variações, progresso e status, todos calculados em colunas (pandas/NumPy).
+O gerador do PDF apenas formata as linhas; o custo do cálculo cresce de
+forma linear com o número de SKUs.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from dados_relatorio import Totais
+
+STATUS_SEM_META = ('undefined', 'Meta não definida')
+# Progresso mínimo (% da meta) de cada status, do maior para o menor
+FAIXAS_STATUS = [
+    (100, 'success', 'Meta atingida!'),
+    (60, 'reachable', 'Meta alcançável'),
+    (40, 'warning', 'Atenção necessária'),
+]
+STATUS_ABAIXO = ('danger', 'Risco alto')
+
+# skus: DataFrame por SKU; resumo: Totais de ontem somados
+ModeloRelatorio = namedtuple('ModeloRelatorio', ['skus', 'resumo', 'margem_media_mes'])
+
+
+def _janela(totais, sufixo):
+    """{sku: Totais} -> DataFrame com colunas total_<sufixo>, quantidade_<sufixo>, lucro_<sufixo>"""
+    quadro = pd.DataFrame.from_dict(totais, orient='index', columns=list(Totais._fields))
+    return quadro.add_suffix(f'_{sufixo}')
+
+
+def variacao(atual, anterior):
+    """Variação percentual; 0 quando o valor anterior não é positivo"""
+    atual = np.asarray(atual, dtype=float)
+    anterior = np.asarray(anterior, dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(anterior > 0, (atual - anterior) / anterior * 100, 0.0)
+
+
+def calcular_status_mensal_em_lote(totais, metas):
+    """(progresso, códigos, textos) do progresso mensal de cada SKU em relação à meta"""
+    totais = np.asarray(totais, dtype=float)
+    metas = np.nan_to_num(np.asarray(metas, dtype=float))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        progresso = np.where(metas > 0, totais / metas * 100, 0.0)
+
+    condicoes = [metas == 0] + [progresso >= minimo for minimo, _, _ in FAIXAS_STATUS]
+    codigos = np.select(condicoes, [STATUS_SEM_META[0]] + [codigo for _, codigo, _ in FAIXAS_STATUS],
+                        default=STATUS_ABAIXO[0]).astype(object)
+    textos = np.select(condicoes, [STATUS_SEM_META[1]] + [texto for _, _, texto in FAIXAS_STATUS],
+                       default=STATUS_ABAIXO[1]).astype(object)
+    return progresso, codigos, textos
+
+
+def montar_modelo(dados):
+    """DadosRelatorio -> ModeloRelatorio"""
+    skus = pd.concat([
+        _janela(dados.ontem, 'ontem'),
+        _janela(dados.anteontem, 'anteontem'),
+        _janela(dados.mes, 'mes'),
+    ], axis=1)
+    skus.index.name = 'sku'
+    skus['vendeu_ontem'] = skus.index.isin(list(dados.ontem))
+    skus['vendeu_mes'] = skus.index.isin(list(dados.mes))
+
+    skus = skus.fillna({coluna: 0 for coluna in skus.columns if not coluna.startswith('vendeu_')})
+    for coluna in ('quantidade_ontem', 'quantidade_anteontem', 'quantidade_mes'):
+        skus[coluna] = skus[coluna].astype(int)
+
+    skus['meta'] = pd.Series(dados.metas, dtype=float).reindex(skus.index).fillna(0)
+    skus['margem'] = pd.Series(dados.margens, dtype=float).reindex(skus.index).fillna(0)
+    skus['var_vendas'] = variacao(skus['total_ontem'], skus['total_anteontem'])
+    skus['var_lucro'] = variacao(skus['lucro_ontem'], skus['lucro_anteontem'])
+
+    # Status só existe para quem vendeu no mês (os demais ficam sem meta)
+    progresso, codigos, textos = calcular_status_mensal_em_lote(
+        skus['total_mes'], skus['meta'].where(skus['vendeu_mes'], 0))
+    skus['progresso'] = progresso
+    skus['status_code'] = codigos
+    skus['status_text'] = textos
+
+    ontem = skus[skus['vendeu_ontem']]
+    resumo = Totais(float(ontem['total_ontem'].sum()), int(ontem['quantidade_ontem'].sum()),
+                    float(ontem['lucro_ontem'].sum()))
+    return ModeloRelatorio(skus.sort_index(), resumo, dados.margem_media_mes)
+
+
+def skus_de_ontem(modelo):
+    """SKUs vendidos ontem, em ordem de SKU (Parte 1 do relatório)"""
+    return modelo.skus[modelo.skus['vendeu_ontem']]
+
+
+def progresso_mensal(modelo):
+    """SKUs vendidos no mês, do maior para o menor progresso (Parte 2 do relatório)"""
+    mes = modelo.skus[modelo.skus['vendeu_mes']]
+    return mes.sort_values('progresso', ascending=False, kind='stable')
@@ -0,0 +1,430 @@
+"""Conversão colunar dos valores lidos das planilhas.
+
+Substitui as chamadas a tratar_valor() célula a célula: a matriz de
+get_all_values() é transposta uma única vez e cada coluna é convertida
+inteira. Cada coluna é codificada em dicionário (pd.factorize) e os valores
+distintos no formato usual da planilha (moeda, percentual, inteiro e data)
+são convertidos de forma vetorizada sobre a matriz de códigos Unicode.
+Qualquer valor fora desse formato passa pelas mesmas regras escalares de
+tratar_valor(), então o resultado é idêntico ao das funções originais
+(inclusive a divisão por 100 dos valores monetários de vendas e a correção
+de +1 dia nas datas).
+"""
+import hashlib
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+# Tipos de coluna suportados
+BRUTO = 'bruto'        # valor da célula sem tratamento
+TEXTO = 'texto'        # tratar_valor(valor, tipo=str)
+INTEIRO = 'inteiro'    # tratar_valor(valor, tipo=int)
+NUMERO = 'numero'      # tratar_valor(valor) -> moeda (R$) ou percentual
+DATA = 'data'          # tratar_valor(valor, tipo=datetime)
+
+# Esquemas: (nome da coluna, índice da coluna na planilha, tipo)
+ESQUEMA_VENDAS_ML = (
+    ('marketplace', 0, BRUTO),      # A - MARKETPLACE
+    ('pedido', 1, TEXTO),           # B - PEDIDOS
+    ('data', 2, DATA),              # C - DATA
+    ('sku', 3, TEXTO),              # D - SKU
+    ('unidades', 4, INTEIRO),       # E - UNIDADES
+    ('status', 5, TEXTO),           # F - STATUS
+    ('valor_comprado', 6, NUMERO),  # G - VALOR COMPRADO
+    ('valor_vendido', 7, NUMERO),   # H - VALOR VENDIDO
+    ('taxas', 8, NUMERO),           # I - TAXAS
+    ('frete', 9, NUMERO),           # J - FRETE
+    ('descontos', 10, NUMERO),      # K - DESCONTOS
+    ('ctl', 11, NUMERO),            # L - CTL
+    ('receita_envio', 12, NUMERO),  # M - RECEITA P/ ENVIO
+    ('valor_liquido', 13, NUMERO),  # N - VALOR LÍQUIDO
+    ('lucro', 14, NUMERO),          # O - LUCRO
+    ('markup', 15, NUMERO),         # P - MARKUP
+    ('margem_lucro', 16, NUMERO),   # Q - MARGEM DE LUCRO
+    ('envio', 17, TEXTO),           # R - ENVIO
+    ('numero_envio', 18, INTEIRO),  # S - NÚMERO ENVIO
+    ('imposto', 19, NUMERO),        # T - IMPOSTO
+)
+
+# Layout da aba de vendas da Magalu (colunas da tabela vendas_magalu)
+ESQUEMA_VENDAS_MAGALU = (
+    ('order_id', 0, TEXTO),         # A - PEDIDO
+    ('purchased_at', 1, DATA),      # B - DATA
+    ('sku', 2, TEXTO),              # C - SKU
+    ('produto', 3, TEXTO),          # D - PRODUTO
+    ('unidades', 4, INTEIRO),       # E - UNIDADES
+    ('valor_venda', 5, NUMERO),     # F - VALOR DA VENDA
+    ('comissao_magalu', 6, NUMERO), # G - COMISSÃO
+    ('frete_total', 7, NUMERO),     # H - FRETE
+    ('desconto_total', 8, NUMERO),  # I - DESCONTO
+)
+
+ESQUEMA_ESTOQUE = (
+    ('sku', 0, TEXTO),              # A - SKU
+    ('estoque', 4, INTEIRO),        # E - ESTOQUE TOTAL
+)
+
+FORMATO_DATA = '%d/%m/%y %H:%M:%S'
+# +1 dia para corrigir o problema de fuso horário da planilha de vendas do ML
+AJUSTE_DATA = timedelta(days=1)
+
+VALOR_PADRAO = 0
+
+# Valores maiores que isso (raros) sempre usam a conversão escalar
+LARGURA_MAXIMA = 40
+# Até 15 dígitos a mantissa e 10**casas são exatos em float64, então
+# mantissa / 10**casas é o arredondamento correto, igual ao de float()
+MAXIMO_DIGITOS_DECIMAL = 15
+MAXIMO_DIGITOS_INTEIRO = 18
+_POTENCIAS_DE_10 = np.array([float(10 ** k) for k in range(MAXIMO_DIGITOS_DECIMAL + 1)])
+
+# Códigos dos caracteres usados nas máscaras
+_ESPACO, _CIFRAO, _PERCENTUAL, _MAIS, _VIRGULA, _MENOS, _PONTO = 32, 36, 37, 43, 44, 45, 46
+_BARRA, _ZERO, _NOVE, _DOIS_PONTOS, _R = 47, 48, 57, 58, 82
+
+
+def _texto(valor):
+    return valor.strip()
+
+
+def _inteiro(valor):
+    return int(str(valor).strip()) if valor.strip() else VALOR_PADRAO
+
+
+def _numero(valor, divisor_moeda):
+    valor_limpo = str(valor).replace('R$', '').replace(' ', '')
+    if '%' in valor_limpo:  # Percentual: mantém o valor como está
+        return float(valor_limpo.replace('%', '').replace(',', '.'))
+    # Monetário: remove pontos de milhar e converte vírgula para ponto
+    return float(valor_limpo.replace('.', '').replace(',', '.')) / divisor_moeda
+
+
+def _data(valor, ajuste_data=AJUSTE_DATA):
+    if not valor.strip():
+        return VALOR_PADRAO
+    return datetime.strptime(valor.strip(), FORMATO_DATA) + ajuste_data
+
+
+def _converter_unicos(unicos, conversor):
+    """Aplica a regra escalar a cada valor; retorna (valores, erros)"""
+    valores = np.empty(len(unicos), dtype=object)
+    erros = np.zeros(len(unicos), dtype=bool)
+    for i, valor in enumerate(unicos):
+        if not valor:
+            valores[i] = VALOR_PADRAO
+            continue
+        try:
+            valores[i] = conversor(valor)
+        except Exception:
+            valores[i] = VALOR_PADRAO
+            erros[i] = True
+    return valores, erros
+
+
+def _pontos_de_codigo(unicos):
+    """Matriz (n, largura) com os códigos Unicode de cada valor, preenchida com 0.
+
+    Retorna também a máscara do preenchimento (posições além do fim de cada
+    valor) e a dos valores representados fielmente: valores longos demais ou
+    com NUL em qualquer posição (indistinguível do preenchimento) ficam de
+    fora e seguem para a conversão escalar.
+    """
+    comprimentos = np.fromiter(map(len, unicos), dtype=np.int64, count=len(unicos))
+    seguros = comprimentos <= LARGURA_MAXIMA
+    largura = int(comprimentos[seguros].max(initial=0))
+    if largura == 0:
+        return np.zeros((len(unicos), 0), dtype=np.uint32), np.zeros((len(unicos), 0), dtype=bool), seguros
+
+    codigos = np.where(seguros, unicos, '').astype(f'U{largura}').view(np.uint32).reshape(len(unicos), largura)
+    preenchimento = np.arange(largura)[None, :] >= comprimentos[:, None]
+    seguros &= ~((codigos == 0) & ~preenchimento).any(axis=1)
+    return codigos, preenchimento, seguros
+
+
+def _acumular_digitos(codigos, digito, separador=None):
+    """Monta a mantissa inteira (Horner) e conta os dígitos após o separador"""
+    mantissa = np.zeros(len(codigos), dtype=np.int64)
+    casas = np.zeros(len(codigos), dtype=np.int64)
+    depois_separador = np.zeros(len(codigos), dtype=bool)
+    for j in range(codigos.shape[1]):
+        d = digito[:, j]
+        mantissa = np.where(d, mantissa * 10 + (codigos[:, j].astype(np.int64) - _ZERO), mantissa)
+        if separador is not None:
+            casas += d & depois_separador
+            depois_separador |= separador[:, j]
+    return mantissa, casas
+
+
+def _numeros_vetorizados(unicos, divisor_moeda):
+    """Converte moeda ('R$ 1.234,56') e percentual ('12,5%') sem sair do numpy.
+
+    Reproduz tratar_valor(): remove 'R$' e espaços; com '%' remove o símbolo e
+    a vírgula vira ponto; sem '%' os pontos de milhar somem, a vírgula vira
+    ponto e o resultado é dividido por divisor_moeda. Retorna (valores,
+    rapidos), onde rapidos marca os valores convertidos aqui.
+    """
+    codigos, preenchimento, seguros = _pontos_de_codigo(unicos)
+    valores = np.zeros(len(unicos), dtype=np.float64)
+    if codigos.shape[1] == 0:
+        return valores, np.zeros(len(unicos), dtype=bool)
+
+    digito = (codigos >= _ZERO) & (codigos <= _NOVE)
+    # 'R$' só é removido quando os dois caracteres estão colados
+    inicio_cifrao = np.zeros_like(digito)
+    inicio_cifrao[:, :-1] = (codigos[:, :-1] == _R) & (codigos[:, 1:] == _CIFRAO)
+    cifrao = inicio_cifrao.copy()
+    cifrao[:, 1:] |= inicio_cifrao[:, :-1]
+
+    percentual = (codigos == _PERCENTUAL).any(axis=1)[:, None]
+    ignorados = cifrao | (codigos == _ESPACO) | preenchimento
+    ignorados |= np.where(percentual, codigos == _PERCENTUAL, codigos == _PONTO)
+    separador = np.where(percentual, (codigos == _VIRGULA) | (codigos == _PONTO), codigos == _VIRGULA)
+    sinal = codigos == _MENOS
+
+    significativos = ~ignorados
+    primeiro = significativos & (np.cumsum(significativos, axis=1) == 1)
+    total_digitos = digito.sum(axis=1)
+    rapidos = (
+        seguros
+        & (ignorados | digito | separador | sinal).all(axis=1)
+        & ~(sinal & ~primeiro).any(axis=1)
+        & (separador.sum(axis=1) <= 1)
+        & (total_digitos >= 1)
+        & (total_digitos <= MAXIMO_DIGITOS_DECIMAL)
+    )
+
+    mantissa, casas = _acumular_digitos(codigos, digito, separador)
+    casas = np.minimum(casas, MAXIMO_DIGITOS_DECIMAL)
+    quociente = mantissa.astype(np.float64) / _POTENCIAS_DE_10[casas]
+    # Negar depois da divisão preserva o -0.0 de float('-0')
+    quociente = np.where(sinal.any(axis=1), -quociente, quociente)
+    quociente = np.where(percentual[:, 0], quociente, quociente / divisor_moeda)
+
+    valores[rapidos] = quociente[rapidos]
+    return valores, rapidos
+
+
+def _inteiros_vetorizados(unicos):
+    """Converte inteiros simples ('12', ' -3 ') sem sair do numpy; retorna (valores, rapidos)"""
+    codigos, preenchimento, seguros = _pontos_de_codigo(unicos)
+    valores = np.zeros(len(unicos), dtype=np.int64)
+    if codigos.shape[1] == 0:
+        return valores, np.zeros(len(unicos), dtype=bool)
+
+    digito = (codigos >= _ZERO) & (codigos <= _NOVE)
+    sinal = (codigos == _MENOS) | (codigos == _MAIS)
+    preenchimento = (codigos == _ESPACO) | preenchimento
+    significativos = ~preenchimento
+
+    # Os caracteres significativos precisam ser contíguos (sem espaço no meio)
+    largura = codigos.shape[1]
+    primeiro = np.argmax(significativos, axis=1)
+    ultimo = largura - 1 - np.argmax(significativos[:, ::-1], axis=1)
+    contiguos = significativos.sum(axis=1) == ultimo - primeiro + 1
+    no_inicio = np.arange(largura)[None, :] == primeiro[:, None]
+
+    total_digitos = digito.sum(axis=1)
+    rapidos = (
+        seguros
+        & (preenchimento | digito | sinal).all(axis=1)
+        & contiguos
+        & ~(sinal & ~no_inicio).any(axis=1)
+        & (total_digitos >= 1)
+        & (total_digitos <= MAXIMO_DIGITOS_INTEIRO)
+    )
+
+    mantissa, _ = _acumular_digitos(codigos, digito)
+    mantissa = np.where((codigos == _MENOS).any(axis=1), -mantissa, mantissa)
+    valores[rapidos] = mantissa[rapidos]
+    return valores, rapidos
+
+
+def _datas_vetorizadas(unicos, ajuste_data=AJUSTE_DATA):
+    """Converte datas 'dd/mm/aa HH:MM:SS' (dois dígitos ASCII por campo) sem strptime.
+
+    Retorna (datas, rapidos) com datas em datetime64[us] já com o ajuste somado.
+    Datas impossíveis (31/02, segundo 60...) não são marcadas como rápidas.
+    """
+    codigos, preenchimento, seguros = _pontos_de_codigo(unicos)
+    datas = np.full(len(unicos), np.datetime64('NaT'), dtype='datetime64[us]')
+    if codigos.shape[1] < 17:
+        return datas, np.zeros(len(unicos), dtype=bool)
+
+    codigos = codigos[:, :18] if codigos.shape[1] > 17 else codigos
+    posicoes_digitos = [0, 1, 3, 4, 6, 7, 9, 10, 12, 13, 15, 16]
+    digitos = codigos[:, posicoes_digitos]
+    canonicas = (
+        seguros
+        & ((digitos >= _ZERO) & (digitos <= _NOVE)).all(axis=1)
+        & (codigos[:, 2] == _BARRA) & (codigos[:, 5] == _BARRA)
+        & (codigos[:, 8] == _ESPACO)
+        & (codigos[:, 11] == _DOIS_PONTOS) & (codigos[:, 14] == _DOIS_PONTOS)
+    )
+    if codigos.shape[1] > 17:
+        canonicas &= preenchimento[:, 17]
+    if not canonicas.any():
+        return datas, canonicas
+
+    campos = (digitos.astype(np.int64) - _ZERO).reshape(-1, 6, 2)
+    dia, mes, ano, hora, minuto, segundo = (campos[:, :, 0] * 10 + campos[:, :, 1]).T
+    # to_datetime "rola" valores fora da faixa (segundo 60 -> próximo minuto);
+    # o strptime recusa, então esses valores ficam para o caminho escalar
+    canonicas &= (hora <= 23) & (minuto <= 59) & (segundo <= 59) & (mes >= 1) & (mes <= 12) & (dia >= 1)
+    if not canonicas.any():
+        return datas, canonicas
+    dia, mes, ano, hora, minuto, segundo = (
+        campo[canonicas] for campo in (dia, mes, ano, hora, minuto, segundo))
+    # Mesma regra de %y do strptime: 69-99 -> 19xx, 00-68 -> 20xx
+    ano = ano + np.where(ano >= 69, 1900, 2000)
+    convertidas = pd.to_datetime(pd.DataFrame({
+        'year': ano, 'month': mes, 'day': dia,
+        'hour': hora, 'minute': minuto, 'second': segundo,
+    }), errors='coerce') + pd.Timedelta(ajuste_data)
+    convertidas = convertidas.to_numpy(dtype='datetime64[us]')
+
+    indices = np.flatnonzero(canonicas)
+    validas = ~np.isnat(convertidas)
+    datas[indices[validas]] = convertidas[validas]
+    rapidos = np.zeros(len(unicos), dtype=bool)
+    rapidos[indices[validas]] = True
+    return datas, rapidos
+
+
+def _completar_escalar(valores, rapidos, unicos, conversor):
+    """Converte pela regra escalar os valores que o caminho vetorizado recusou"""
+    erros = np.zeros(len(unicos), dtype=bool)
+    lentos = np.flatnonzero(~rapidos)
+    if len(lentos) == 0:
+        return valores, erros
+
+    convertidos, erros[lentos] = _converter_unicos(unicos[lentos], conversor)
+    if valores.dtype == object:
+        valores[lentos] = convertidos
+    elif valores.dtype.kind == 'M':
+        for indice, valor in zip(lentos, convertidos):
+            if isinstance(valor, datetime):
+                valores[indice] = np.datetime64(valor, 'us')
+    else:
+        try:
+            valores[lentos] = convertidos.astype(valores.dtype)
+        except OverflowError:  # Inteiros além de int64 ficam como objeto
+            valores = valores.astype(object)
+            valores[lentos] = convertidos
+    return valores, erros
+
+
+def _fatorar(coluna):
+    """(códigos, valores distintos) da coluna, como pd.factorize.
+
+    O hash de strings do pandas para no primeiro NUL e junta, por exemplo,
+    '12' e '12\\x00' num só valor; a fatoração é conferida e, nesse caso
+    (raro), refeita com um dict.
+    """
+    codigos, unicos = pd.factorize(coluna)
+    unicos = np.asarray(unicos, dtype=object)
+    if len(coluna) == 0 or not (unicos[codigos] != coluna).any():
+        return codigos, unicos
+
+    indices = {}
+    codigos = np.fromiter((indices.setdefault(valor, len(indices)) for valor in coluna),
+                          dtype=np.intp, count=len(coluna))
+    unicos = np.empty(len(indices), dtype=object)
+    unicos[:] = list(indices)
+    return codigos, unicos
+
+
+def converter_coluna(coluna, tipo, divisor_moeda=100, ajuste_data=AJUSTE_DATA):
+    """Converte uma coluna de strings; retorna (valores, erros) como arrays numpy.
+
+    Números saem como float64, inteiros como int64 (objeto se não couberem),
+    datas como datetime64[us] com NaT nas células vazias/inválidas e textos
+    como objeto. O valor padrão das células vazias/inválidas é 0.
+    """
+    coluna = np.asarray(coluna, dtype=object)
+    if tipo == BRUTO:
+        return coluna, np.zeros(len(coluna), dtype=bool)
+
+    codigos, unicos = _fatorar(coluna)
+
+    if tipo == TEXTO:
+        valores = np.empty(len(unicos), dtype=object)
+        valores[:] = [valor.strip() if valor else VALOR_PADRAO for valor in unicos]
+        erros = np.zeros(len(unicos), dtype=bool)
+    elif tipo == NUMERO:
+        valores, rapidos = _numeros_vetorizados(unicos, divisor_moeda)
+        valores, erros = _completar_escalar(
+            valores, rapidos, unicos, lambda valor: _numero(valor, divisor_moeda))
+    elif tipo == INTEIRO:
+        valores, rapidos = _inteiros_vetorizados(unicos)
+        valores, erros = _completar_escalar(valores, rapidos, unicos, _inteiro)
+    elif tipo == DATA:
+        valores, rapidos = _datas_vetorizadas(unicos, ajuste_data)
+        valores, erros = _completar_escalar(
+            valores, rapidos, unicos, lambda valor: _data(valor, ajuste_data))
+    else:
+        raise ValueError(f"Tipo de coluna desconhecido: {tipo}")
+
+    return valores[codigos], erros[codigos]
+
+
+def parsear_linhas(linhas, esquema, divisor_moeda=100, ajuste_data=AJUSTE_DATA):
+    """Converte as linhas da planilha (sem cabeçalho) coluna a coluna.
+
+    Retorna (quadro, erros): um DataFrame tipado com uma coluna por item do
+    esquema e um DataFrame booleano do mesmo formato marcando as células que
+    não puderam ser convertidas (e que recebem o valor padrão 0, como em
+    tratar_valor). Células ausentes em linhas curtas também são marcadas.
+    """
+    largura = max((indice for _, indice, _ in esquema), default=-1) + 1
+    comprimentos = np.fromiter(map(len, linhas), dtype=np.int64, count=len(linhas))
+    ausentes = np.arange(largura)[None, :] >= comprimentos[:, None]
+
+    if len(linhas) and comprimentos.min() >= largura and comprimentos.max() == comprimentos.min():
+        # get_all_values() devolve uma matriz retangular: conversão direta
+        matriz = np.array(linhas, dtype=object)[:, :largura]
+    else:
+        matriz = np.empty((len(linhas), largura), dtype=object)
+        matriz[:] = ''
+        for i, linha in enumerate(linhas):
+            n = min(len(linha), largura)
+            matriz[i, :n] = linha[:n]
+
+    colunas = matriz.T
+    quadro = {}
+    erros = {}
+    for nome, indice, tipo in esquema:
+        valores, erros_coluna = converter_coluna(colunas[indice], tipo, divisor_moeda, ajuste_data)
+        # Textos ficam como objeto (o padrão 0 convive com strings)
+        quadro[nome] = pd.Series(valores, dtype=object if valores.dtype == object else None)
+        erros[nome] = erros_coluna | ausentes[:, indice]
+
+    return pd.DataFrame(quadro), pd.DataFrame(erros)
+
+
+def para_registros(quadro, esquema):
+    """Converte o quadro tipado em tuplas com os mesmos valores de tratar_valor()"""
+    colunas = []
+    for nome, _, tipo in esquema:
+        valores = quadro[nome].to_numpy()
+        if tipo == DATA:
+            # datetime64[us] -> datetime; NaT volta a ser o padrão 0
+            valores = valores.astype('datetime64[us]').astype(object)
+            valores[pd.isna(valores)] = VALOR_PADRAO
+        else:
+            valores = valores.astype(object)
+        colunas.append(valores)
+    return list(zip(*colunas))
+
+
+def hash_conteudo(linhas, largura):
+    """MD5 do conteúdo bruto de cada linha (colunas 0..largura-1).
+
+    Linhas curtas são completadas com células vazias, então a omissão de
+    células vazias no fim da linha pela API não altera o hash.
+    """
+    hashes = []
+    for linha in linhas:
+        celulas = list(linha[:largura]) + [''] * (largura - len(linha))
+        hashes.append(hashlib.md5('\x1f'.join(map(str, celulas)).encode('utf-8')).hexdigest())
+    return hashes
@@ -0,0 +1,192 @@
+"""Renderização de PDF direto no canvas do ReportLab, para catálogos grandes.
+
+O caminho com Platypus (SimpleDocTemplate + Table) cria um Table e um
+TableStyle por SKU e guarda todos os flowables até o doc.build: memória e
+tempo crescem mal com o número de SKUs. Aqui cada linha é desenhada assim
+que chega, com estilos pré-calculados (Grade, EstiloLinha) compartilhados
+por todas as linhas, e cada página é comprimida ao ser fechada: além da
+página em montagem, fica em memória só o PDF já comprimido (o save() do
+ReportLab monta o arquivo inteiro em memória). Tabelas longas continuam na página seguinte com o cabeçalho
+repetido; blocos (ex.: o quadro de um SKU) não são partidos entre páginas.
+
+    doc = DocumentoLeve('relatorio.pdf')
+    doc.titulo('Relatório', 'Helvetica-Bold', 16, colors.black)
+    doc.tabela(['SKU', 'Vendas'], cabecalho, grade, ((linha, None) for linha in linhas), corpo)
+    doc.salvar()
+"""
+import zlib
+from collections import namedtuple
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfdoc import PDFArray, PDFName, PDFStream
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+# Colunas e bordas de uma tabela
+Grade = namedtuple('Grade', ['larguras', 'cor', 'borda', 'espessura_borda'])
+
+# Aparência de uma linha; fundo e cor são uma cor ou uma tupla com uma por coluna
+EstiloLinha = namedtuple('EstiloLinha', ['fonte', 'tamanho', 'fundo', 'cor', 'altura'])
+
+
+def _por_coluna(valor, colunas):
+    return valor if isinstance(valor, tuple) else (valor,) * colunas
+
+
+def _texto_pdf(texto):
+    """String PDF literal (fontes padrão, WinAnsi) com escapes octais"""
+    bruto = texto.encode('cp1252', 'replace').decode('latin-1')
+    return ''.join(c if ' ' <= c < '\x7f' and c not in '\\()' else f'\\{ord(c):03o}' for c in bruto)
+
+
+class DocumentoLeve:
+    """Canvas com cursor vertical, quebra de página e tabelas centralizadas.
+
+    As linhas são escritas como operadores PDF literais (addLiteral) em uma
+    string por linha: a API de desenho do canvas formata cada número em
+    Python puro quando o rl_accel não está instalado, e isso dominava o tempo.
+    """
+
+    def __init__(self, nome_arquivo, pagesize=letter, margem=40):
+        self.canvas = canvas.Canvas(nome_arquivo, pagesize=pagesize, pageCompression=1)
+        self.largura, self.altura = pagesize
+        self.margem = margem
+        self.y = self.altura - margem
+        self._estado = {}
+        self._fontes = {}
+
+    def _fechar_pagina(self):
+        """Fecha a página e já guarda o conteúdo dela comprimido.
+
+        O ReportLab mantém o texto de cada página até o save() e só então
+        comprime; trocando-o aqui por um stream já comprimido, a memória
+        deixa de crescer com o texto de todas as páginas anteriores.
+        """
+        self.canvas.showPage()
+        paginas = getattr(getattr(self.canvas._doc, 'Pages', None), 'pages', None)
+        pagina = paginas[-1] if paginas else None
+        if pagina is not None and isinstance(getattr(pagina, 'stream', None), str) and not pagina.Contents:
+            conteudo = PDFStream(content=zlib.compress(pagina.stream.encode('utf8')))
+            conteudo.dictionary['Filter'] = PDFArray([PDFName('FlateDecode')])
+            pagina.Contents = conteudo
+            pagina.stream = None
+
+    def nova_pagina(self):
+        self._fechar_pagina()
+        self.y = self.altura - self.margem
+        self._estado = {}
+
+    def cabe(self, altura):
+        return self.y - altura >= self.margem
+
+    def garantir(self, altura):
+        """Quebra a página se não houver `altura` livre (e a página não estiver vazia)"""
+        if not self.cabe(altura) and self.y < self.altura - self.margem:
+            self.nova_pagina()
+
+    def espaco(self, altura):
+        self.y -= altura
+
+    # Cor de preenchimento e traço só são emitidos quando mudam
+    def _preencher(self, ops, cor):
+        if self._estado.get('preenchimento') is not cor:
+            ops.append('%.3f %.3f %.3f rg' % cor.rgb())
+            self._estado['preenchimento'] = cor
+
+    def _tracar(self, ops, cor, espessura):
+        if self._estado.get('traco') != (cor, espessura):
+            ops.append('%.3f %.3f %.3f RG %.2f w' % (cor.rgb() + (espessura,)))
+            self._estado['traco'] = (cor, espessura)
+
+    def _texto(self, ops, x_centro, y, texto, fonte, tamanho):
+        if fonte not in self._fontes:
+            # Registra a fonte nos recursos do documento
+            self._fontes[fonte] = self.canvas._doc.getInternalFontName(fonte)
+        x = x_centro - stringWidth(texto, fonte, tamanho) / 2
+        ops.append('BT %s %.1f Tf 1 0 0 1 %.2f %.2f Tm (%s) Tj ET'
+                   % (self._fontes[fonte], tamanho, x, y, _texto_pdf(texto)))
+
+    def titulo(self, texto, fonte, tamanho, cor, espaco_depois=0):
+        """Texto centralizado; cada '\\n' vira uma linha"""
+        linhas = texto.split('\n')
+        self.garantir(len(linhas) * tamanho * 1.2)
+        ops = []
+        self._preencher(ops, cor)
+        for linha in linhas:
+            self.y -= tamanho * 1.2
+            self._texto(ops, self.largura / 2, self.y + tamanho * 0.25, linha, fonte, tamanho)
+        self.canvas.addLiteral('\n'.join(ops))
+        self.y -= espaco_depois
+
+    def _x(self, grade):
+        return (self.largura - sum(grade.larguras)) / 2
+
+    def linha(self, celulas, grade, estilo, fundo=None, cores=None):
+        """Desenha uma linha na posição atual (sem checar a quebra de página)"""
+        colunas = len(grade.larguras)
+        fundos = _por_coluna(fundo or estilo.fundo, colunas)
+        cores = _por_coluna(cores or estilo.cor, colunas)
+        topo, base = self.y, self.y - estilo.altura
+        bordas = [self._x(grade)]
+        for largura in grade.larguras:
+            bordas.append(bordas[-1] + largura)
+        ops = []
+
+        # Fundo: um retângulo por trecho de células com a mesma cor
+        inicio = 0
+        for fim in range(1, colunas + 1):
+            if fim == colunas or fundos[fim] is not fundos[inicio]:
+                self._preencher(ops, fundos[inicio])
+                ops.append('%.2f %.2f %.2f %.2f re f' % (bordas[inicio], base, bordas[fim] - bordas[inicio],
+                                                         estilo.altura))
+                inicio = fim
+
+        # Grade: contorno da linha e divisões entre as colunas em um só caminho
+        self._tracar(ops, grade.cor, 1)
+        ops.append('%.2f %.2f %.2f %.2f re' % (bordas[0], base, bordas[-1] - bordas[0], estilo.altura))
+        ops.extend('%.2f %.2f m %.2f %.2f l' % (x, base, x, topo) for x in bordas[1:-1])
+        ops.append('S')
+
+        y_texto = base + (estilo.altura - estilo.tamanho * 0.7) / 2
+        for i, celula in enumerate(celulas):
+            if celula != '':
+                self._preencher(ops, cores[i])
+                self._texto(ops, (bordas[i] + bordas[i + 1]) / 2, y_texto, str(celula), estilo.fonte, estilo.tamanho)
+        self.canvas.addLiteral('\n'.join(ops))
+        self.y = base
+        return topo
+
+    def borda(self, grade, topo):
+        """Contorno da tabela de `topo` até a posição atual"""
+        ops = []
+        self._tracar(ops, grade.borda, grade.espessura_borda)
+        ops.append('%.2f %.2f %.2f %.2f re S' % (self._x(grade), self.y, sum(grade.larguras), topo - self.y))
+        self.canvas.addLiteral('\n'.join(ops))
+
+    def bloco(self, linhas, grade):
+        """Linhas [(celulas, estilo, fundo, cores)] mantidas juntas na mesma página"""
+        self.garantir(sum(estilo.altura for _, estilo, _, _ in linhas))
+        topo = self.y
+        for celulas, estilo, fundo, cores in linhas:
+            self.linha(celulas, grade, estilo, fundo, cores)
+        self.borda(grade, topo)
+
+    def tabela(self, cabecalho, estilo_cabecalho, grade, linhas, estilo):
+        """Tabela com linhas [(celulas, fundo)] lidas sob demanda; retorna quantas foram desenhadas"""
+        self.garantir(estilo_cabecalho.altura + estilo.altura)
+        topo = self.linha(cabecalho, grade, estilo_cabecalho)
+        quantidade = 0
+        for celulas, fundo in linhas:
+            if not self.cabe(estilo.altura):
+                self.borda(grade, topo)
+                self.nova_pagina()
+                topo = self.linha(cabecalho, grade, estilo_cabecalho)
+            self.linha(celulas, grade, estilo, fundo)
+            quantidade += 1
+        self.borda(grade, topo)
+        return quantidade
+
+    def salvar(self):
+        self._fechar_pagina()
+        self.canvas.save()
+
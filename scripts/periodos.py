@@ -0,0 +1,47 @@
+"""Períodos de consulta como intervalos semiabertos [inicio, fim).
+
+Um filtro `coluna >= inicio AND coluna < fim` usa o índice da coluna, seja
+ela DATE ou TIMESTAMP; DATE(data) = ..., DATE_TRUNC('month', data) = ... e
+EXTRACT(MONTH FROM data) = ... aplicam uma função à coluna e obrigam o
+banco a ler a tabela inteira. As consultas dos relatórios montam os filtros
+de período por aqui:
+
+    sql = f"... WHERE {filtro('v.dia', 'mes')}"
+    cursor.execute(sql, parametros(mes=mes(date(2026, 10, 5))))
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+Periodo = namedtuple('Periodo', ['inicio', 'fim'])
+
+
+def dia(referencia):
+    """O dia `referencia` inteiro"""
+    return Periodo(referencia, referencia + timedelta(days=1))
+
+
+def dias(de, ate):
+    """De `de` até `ate`, os dois inclusive"""
+    return Periodo(de, ate + timedelta(days=1))
+
+
+def mes(referencia):
+    """O mês que contém `referencia` (date ou 'AAAA-MM-DD')"""
+    if isinstance(referencia, str):
+        referencia = date.fromisoformat(referencia[:10])
+    inicio = referencia.replace(day=1)
+    return Periodo(inicio, (inicio + timedelta(days=32)).replace(day=1))
+
+
+def filtro(coluna, nome):
+    """Condição SQL do período `nome` (parâmetros nomeados, ver parametros())"""
+    return f"{coluna} >= %({nome}_inicio)s AND {coluna} < %({nome}_fim)s"
+
+
+def parametros(**periodos):
+    """{nome_inicio: ..., nome_fim: ...} para os filtros montados com filtro()"""
+    valores = {}
+    for nome, periodo in periodos.items():
+        valores[f'{nome}_inicio'] = periodo.inicio
+        valores[f'{nome}_fim'] = periodo.fim
+    return valores
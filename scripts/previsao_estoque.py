@@ -0,0 +1,179 @@
+"""Previsão de demanda e de ruptura do estoque (colunas media_vendas e previsao_dias).
+
+As vendas diárias em unidades de todos os SKUs são lidas do resumo diário
+(vendas_diarias_sku) em uma consulta e montadas em uma matriz SKUs × dias.
+Sobre ela, com operações do NumPy para todos os SKUs de uma vez:
+
+- sazonalidade semanal: índice de cada dia da semana por SKU, puxado para 1
+  quando o SKU vendeu pouco (poucos dados não viram padrão);
+- suavização exponencial simples da série dessazonalizada, que dá o nível
+  de demanda diária (media_vendas, em unidades/dia);
+- demanda dos próximos HORIZONTE_DIAS dias (nível × índice do dia da
+  semana) acumulada e comparada com o estoque: o primeiro dia em que a
+  demanda acumulada passa do estoque é a previsão de ruptura (previsao_dias).
+
+SKUs sem vendas na janela ficam com media_vendas 0 e previsao_dias NULL.
+O resultado é gravado em um único UPDATE ... FROM (VALUES ...), que só
+reescreve as linhas cujos valores mudaram. As colunas vêm da migration
+add_previsao_dias_estoque.sql.
+"""
+import argparse
+import logging
+import time
+from datetime import date, timedelta
+from itertools import chain
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+import conexoes
+
+# Dias de histórico usados (terminando ontem: o dia corrente ainda está incompleto)
+JANELA_DIAS = 90
+# Peso da observação mais recente na suavização exponencial
+ALFA = 0.2
+# Unidades vendidas na janela para que o índice semanal valha pela metade
+UNIDADES_SAZONALIDADE = 30
+# Previsões além disso são gravadas como HORIZONTE_DIAS
+HORIZONTE_DIAS = 365
+
+SQL_SERIES = """
+    SELECT e.sku, COALESCE(e.estoque, 0), v.dias, v.unidades
+    FROM estoque e
+    LEFT JOIN (
+        SELECT sku, array_agg(dia - %(inicio)s::date) AS dias, array_agg(unidades) AS unidades
+        FROM vendas_diarias_sku
+        WHERE dia >= %(inicio)s AND dia < %(fim)s
+        GROUP BY sku
+    ) v ON v.sku = e.sku
+    ORDER BY e.sku
+"""
+
+SQL_GRAVAR = """
+    UPDATE estoque e
+    SET media_vendas = v.media_vendas,
+        previsao_dias = v.previsao_dias
+    FROM (VALUES %s) AS v(sku, media_vendas, previsao_dias)
+    WHERE e.sku = v.sku
+    AND (e.media_vendas IS DISTINCT FROM v.media_vendas
+         OR e.previsao_dias IS DISTINCT FROM v.previsao_dias)
+"""
+TEMPLATE_GRAVAR = "(%s, %s::numeric, %s::integer)"
+
+
+def carregar_series(cursor, hoje=None, janela=JANELA_DIAS):
+    """Retorna (skus, estoques, unidades, inicio): unidades é a matriz SKUs × dias
+    da janela que termina ontem; inicio é a data da primeira coluna."""
+    hoje = hoje or date.today()
+    inicio = hoje - timedelta(days=janela)
+    cursor.execute(SQL_SERIES, {'inicio': inicio, 'fim': hoje})
+    linhas = cursor.fetchall()
+
+    skus = [linha[0] for linha in linhas]
+    estoques = np.array([linha[1] for linha in linhas], dtype=float)
+    unidades = np.zeros((len(linhas), janela))
+    tamanhos = [len(linha[2]) if linha[2] else 0 for linha in linhas]
+    if sum(tamanhos):
+        indices_skus = np.repeat(np.arange(len(linhas)), tamanhos)
+        dias = np.fromiter(chain.from_iterable(linha[2] or () for linha in linhas), dtype=np.int64)
+        valores = np.fromiter(chain.from_iterable(linha[3] or () for linha in linhas), dtype=float)
+        # Um SKU pode ter mais de uma linha por dia (uma por marketplace)
+        np.add.at(unidades, (indices_skus, dias), valores)
+    return skus, estoques, unidades, inicio
+
+
+def indices_semanais(unidades, inicio):
+    """Índice de cada dia da semana (0 = segunda) por SKU, com média 1"""
+    dias_semana = (inicio.weekday() + np.arange(unidades.shape[1])) % 7
+    ocorrencias = np.bincount(dias_semana, minlength=7)
+    totais_semana = np.stack([unidades[:, dias_semana == d].sum(axis=1) for d in range(7)], axis=1)
+    total = unidades.sum(axis=1)
+    media = total / unidades.shape[1]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        indices = np.where(media[:, None] > 0, (totais_semana / ocorrencias) / media[:, None], 1.0)
+    # Encolhe o índice em direção a 1 conforme o volume de vendas
+    peso = total / (total + UNIDADES_SAZONALIDADE)
+    indices = 1 + (indices - 1) * peso[:, None]
+    return indices / indices.mean(axis=1, keepdims=True)
+
+
+def calcular_previsao(unidades, estoques, inicio, alfa=ALFA, horizonte=HORIZONTE_DIAS):
+    """Retorna (media_vendas, previsao_dias) para todos os SKUs.
+
+    previsao_dias é NaN para SKUs sem demanda prevista.
+    """
+    janela = unidades.shape[1]
+    indices = indices_semanais(unidades, inicio)
+    dias_semana = (inicio.weekday() + np.arange(janela)) % 7
+    dessazonalizada = unidades / indices[:, dias_semana]
+
+    # O nível parte da média da janela e é suavizado dia a dia (vetorizado nos SKUs)
+    nivel = dessazonalizada.mean(axis=1)
+    for dia in range(janela):
+        nivel = alfa * dessazonalizada[:, dia] + (1 - alfa) * nivel
+
+    # Demanda prevista a partir de hoje (o dia seguinte ao fim da janela)
+    semana_futura = (inicio.weekday() + janela + np.arange(horizonte)) % 7
+    acumulada = np.cumsum(nivel[:, None] * indices[:, semana_futura], axis=1)
+    estoques = np.maximum(estoques, 0)
+    alcancou = acumulada > estoques[:, None]
+    previsao = np.where(alcancou.any(axis=1), alcancou.argmax(axis=1), horizonte).astype(float)
+    previsao[estoques == 0] = 0
+    previsao[nivel <= 0] = np.nan
+    return nivel, previsao
+
+
+def gravar_previsoes(cursor, skus, medias, previsoes):
+    """Um UPDATE para todos os SKUs; retorna quantas linhas mudaram"""
+    if not skus:
+        return 0
+    valores = [(sku, round(float(media), 2), None if np.isnan(dias) else int(dias))
+               for sku, media, dias in zip(skus, medias, previsoes)]
+    execute_values(cursor, SQL_GRAVAR, valores, template=TEMPLATE_GRAVAR, page_size=len(valores))
+    return cursor.rowcount
+
+
+def atualizar_previsoes(cursor, hoje=None):
+    """Carrega as séries, calcula e grava as previsões; retorna (SKUs, linhas alteradas)"""
+    inicio_calculo = time.perf_counter()
+    skus, estoques, unidades, inicio = carregar_series(cursor, hoje)
+    carregado = time.perf_counter()
+    medias, previsoes = calcular_previsao(unidades, estoques, inicio)
+    calculado = time.perf_counter()
+    alteradas = gravar_previsoes(cursor, skus, medias, previsoes)
+    logging.info(f"🔮 Previsão de ruptura para {len(skus)} SKUs: carga {carregado - inicio_calculo:.3f}s, "
+                 f"cálculo {calculado - carregado:.3f}s, gravação {time.perf_counter() - calculado:.3f}s "
+                 f"({alteradas} alterados)")
+    return len(skus), alteradas
+
+
+def atualizar_previsoes_opcional(cursor, hoje=None):
+    """Como atualizar_previsoes, mas sem derrubar a sincronização de estoque
+    se a coluna previsao_dias não existir (migration não aplicada)."""
+    cursor.execute("SAVEPOINT previsao_estoque")
+    try:
+        resultado = atualizar_previsoes(cursor, hoje)
+        cursor.execute("RELEASE SAVEPOINT previsao_estoque")
+        return resultado
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT previsao_estoque")
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"⚠️  Previsão de ruptura não atualizada ({erro})")
+        return 0, 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Recalcula media_vendas e previsao_dias do estoque")
+    parser.add_argument('--hoje', type=date.fromisoformat, help="Data de referência (AAAA-MM-DD, padrão: hoje)")
+    args = parser.parse_args()
+
+    conn = conexoes.conectar_banco()
+    try:
+        cursor = conn.cursor()
+        atualizar_previsoes(cursor, args.hoje)
+        conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,92 @@
+"""Quarentena das linhas rejeitadas pelos importadores.
+
+A validação acontece em bloco (parser_colunar); cada problema encontrado
+vira uma Rejeicao com o número da linha, a coluna e o motivo. As rejeições
+são gravadas em quarentena_importacao na mesma transação da carga, uma
+única vez por (origem, conteúdo da linha, coluna): a mesma linha relida em
+outro ciclo só incrementa `ocorrencias` e atualiza `visto_em`. Se a tabela
+não existir (migration não aplicada), vão para um arquivo JSON lines.
+"""
+import json
+import logging
+import os
+from collections import namedtuple
+from datetime import datetime
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import Json, execute_values
+
+from parser_colunar import hash_conteudo
+
+ARQUIVO_QUARENTENA = os.getenv('ARQUIVO_QUARENTENA', 'quarentena_importacao.jsonl')
+
+# coluna = '' quando o problema é da linha inteira; carregada = True quando a
+# linha foi gravada com o valor padrão (0) no lugar da célula inválida
+Rejeicao = namedtuple('Rejeicao', ['linha', 'coluna', 'valor', 'motivo', 'conteudo', 'carregada'])
+
+MOTIVO_VALOR_INVALIDO = 'valor inválido, gravado como 0'
+
+
+def rejeicoes_de_celulas(erros, corpo, numeros, esquema, linhas_validas):
+    """Uma Rejeicao 'carregada' por célula inválida das linhas que serão gravadas"""
+    mascara = erros.to_numpy() & np.asarray(linhas_validas)[:, None]
+    indices_colunas = [indice for _, indice, _ in esquema]
+    nomes = list(erros.columns)
+    rejeicoes = []
+    for i, j in zip(*np.nonzero(mascara)):
+        linha = corpo[i]
+        indice = indices_colunas[j]
+        valor = linha[indice] if indice < len(linha) else ''
+        rejeicoes.append(Rejeicao(numeros[i], nomes[j], valor, MOTIVO_VALOR_INVALIDO, linha, True))
+    return rejeicoes
+
+
+def resumo(rejeicoes):
+    rejeitadas = len({r.linha for r in rejeicoes if not r.carregada})
+    celulas = sum(1 for r in rejeicoes if r.carregada)
+    return f"{rejeitadas} linhas rejeitadas e {celulas} células inválidas enviadas para a quarentena"
+
+
+def registrar(cursor, origem, rejeicoes, largura):
+    """Grava as rejeições na tabela (dentro da transação do cursor) ou no arquivo"""
+    if not rejeicoes:
+        return 0
+
+    hashes = hash_conteudo([r.conteudo for r in rejeicoes], largura)
+    registros = {}
+    for rejeicao, hash_linha in zip(rejeicoes, hashes):
+        # A mesma linha duplicada na planilha geraria dois conflitos no mesmo comando
+        registros.setdefault((hash_linha, rejeicao.coluna), (
+            origem, rejeicao.linha, rejeicao.coluna, rejeicao.valor, rejeicao.motivo,
+            rejeicao.carregada, Json(list(rejeicao.conteudo)), hash_linha))
+
+    cursor.execute("SAVEPOINT quarentena")
+    try:
+        execute_values(cursor, """
+            INSERT INTO quarentena_importacao AS q
+                (origem, linha, coluna, valor, motivo, carregada, conteudo, hash_linha)
+            VALUES %s
+            ON CONFLICT (origem, hash_linha, coluna) DO UPDATE SET
+                linha = EXCLUDED.linha,
+                ocorrencias = q.ocorrencias + 1,
+                visto_em = CURRENT_TIMESTAMP
+        """, list(registros.values()), page_size=1000)
+        cursor.execute("RELEASE SAVEPOINT quarentena")
+    except psycopg2.Error as e:
+        # Não derruba a carga: as rejeições vão para o arquivo
+        cursor.execute("ROLLBACK TO SAVEPOINT quarentena")
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"Quarentena indisponível no banco ({erro}); gravando em {ARQUIVO_QUARENTENA}")
+        salvar_arquivo(origem, rejeicoes)
+    return len(registros)
+
+
+def salvar_arquivo(origem, rejeicoes, caminho=ARQUIVO_QUARENTENA):
+    """Acrescenta as rejeições ao arquivo JSON lines"""
+    registrado_em = datetime.now().isoformat(timespec='seconds')
+    with open(caminho, 'a', encoding='utf-8') as f:
+        for rejeicao in rejeicoes:
+            registro = dict(rejeicao._asdict(), conteudo=list(rejeicao.conteudo),
+                            origem=origem, registrado_em=registrado_em)
+            f.write(json.dumps(registro, ensure_ascii=False, default=str) + '\n')
@@ -0,0 +1,160 @@
+"""Recomendação de compra por SKU (tabela recomendacao_compra).
+
+Uma consulta agrega os itens dos pedidos de compra por SKU (quantidade em
+aberto, próxima chegada e lead time observado) junto com o estoque e a
+média de vendas prevista (previsao_estoque.py). O cálculo é feito com o
+NumPy para todos os SKUs de uma vez:
+
+    posicao        = estoque + em_transito
+    ponto_pedido   = media_vendas × (lead_time + SEGURANCA_DIAS)
+    sugerida       = media_vendas × (lead_time + SEGURANCA_DIAS + COBERTURA_DIAS) - posicao,
+                     só quando posicao <= ponto_pedido
+
+O lead time de um SKU é a média, nos pedidos em que ele aparece, do tempo
+entre o pedido e o recebimento (ou a previsão de entrega, se ainda não
+chegou); sem pedidos, vale LEAD_TIME_PADRAO. A tabela é regravada por
+inteiro na transação do cursor.
+
+Executado diretamente, recalcula e lista as sugestões:
+
+    python recomendacao_compra.py
+"""
+import logging
+from datetime import date
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+import conexoes
+
+STATUS_EM_ABERTO = ('pedido', 'fabricacao', 'transito', 'alfandega')
+# Dias entre o pedido e a chegada quando o SKU nunca foi comprado
+LEAD_TIME_PADRAO = 30
+# Folga de demanda para atrasos e picos de venda
+SEGURANCA_DIAS = 7
+# Dias de venda que cada compra deve cobrir depois de chegar
+COBERTURA_DIAS = 30
+
+SQL_POSICAO = """
+    SELECT e.sku, COALESCE(e.estoque, 0), COALESCE(e.media_vendas, 0),
+           COALESCE(p.em_transito, 0), p.proxima_chegada, p.lead_time
+    FROM estoque e
+    LEFT JOIN (
+        SELECT i.sku,
+               SUM(i.quantidade) FILTER (WHERE pc.status = ANY(%(abertos)s)) AS em_transito,
+               MIN(pc.previsao_entrega) FILTER (WHERE pc.status = ANY(%(abertos)s)) AS proxima_chegada,
+               AVG(COALESCE(r.recebido_em::date, pc.previsao_entrega) - pc.data_pedido) AS lead_time
+        FROM itens_pedido_compra i
+        JOIN pedidos_compra pc ON pc.id = i.pedido_id
+        LEFT JOIN (
+            SELECT pedido_id, MAX(data_movimentacao) AS recebido_em
+            FROM historico_pedidos_compra
+            WHERE status_novo = 'recebido'
+            GROUP BY pedido_id
+        ) r ON r.pedido_id = pc.id
+        GROUP BY i.sku
+    ) p ON p.sku = e.sku
+    ORDER BY e.sku
+"""
+
+SQL_GRAVAR = """
+    INSERT INTO recomendacao_compra (
+        sku, estoque, em_transito, proxima_chegada, media_vendas, lead_time_dias,
+        cobertura_dias, ponto_pedido, quantidade_sugerida, ruptura_antes_chegada
+    ) VALUES %s
+"""
+
+
+def calcular_recomendacoes(estoques, medias, em_transito, dias_ate_chegada, lead_times):
+    """Retorna (lead_time, cobertura, ponto_pedido, sugerida, ruptura) para todos os SKUs.
+
+    dias_ate_chegada e lead_times usam NaN onde não há informação;
+    cobertura é NaN para SKUs sem demanda.
+    """
+    lead_time = np.where(np.isnan(lead_times), LEAD_TIME_PADRAO, np.maximum(lead_times, 0))
+    estoques = np.maximum(estoques, 0)
+    posicao = estoques + em_transito
+    com_demanda = medias > 0
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cobertura = np.where(com_demanda, posicao / medias, np.nan)
+        cobertura_estoque = np.where(com_demanda, estoques / medias, np.inf)
+
+    ponto_pedido = medias * (lead_time + SEGURANCA_DIAS)
+    alvo = ponto_pedido + medias * COBERTURA_DIAS
+    sugerida = np.where(com_demanda & (posicao <= ponto_pedido), np.ceil(alvo - posicao), 0)
+
+    # Sem pedido em aberto, a reposição só chega depois de um lead time inteiro
+    espera = np.where(em_transito > 0, np.nan_to_num(dias_ate_chegada, nan=lead_time), lead_time)
+    ruptura = cobertura_estoque < espera
+    return lead_time, cobertura, np.ceil(ponto_pedido), np.maximum(sugerida, 0), ruptura
+
+
+def atualizar_recomendacoes(cursor, hoje=None):
+    """Recalcula a tabela recomendacao_compra; retorna quantos SKUs têm sugestão"""
+    hoje = hoje or date.today()
+    cursor.execute(SQL_POSICAO, {'abertos': list(STATUS_EM_ABERTO)})
+    linhas = cursor.fetchall()
+    if not linhas:
+        return 0
+
+    skus = [linha[0] for linha in linhas]
+    estoques = np.array([linha[1] for linha in linhas], dtype=float)
+    medias = np.array([linha[2] for linha in linhas], dtype=float)
+    em_transito = np.array([linha[3] for linha in linhas], dtype=float)
+    chegadas = [linha[4] for linha in linhas]
+    dias_ate_chegada = np.array([(chegada - hoje).days if chegada else np.nan for chegada in chegadas], dtype=float)
+    lead_times = np.array([np.nan if linha[5] is None else linha[5] for linha in linhas], dtype=float)
+
+    lead_time, cobertura, ponto_pedido, sugerida, ruptura = calcular_recomendacoes(
+        estoques, medias, em_transito, dias_ate_chegada, lead_times)
+
+    valores = [
+        (sku, int(estoque), int(transito), chegada, round(float(media), 2), int(round(lt)),
+         None if np.isnan(cob) else int(cob), int(ponto), int(qtd), bool(rup))
+        for sku, estoque, transito, chegada, media, lt, cob, ponto, qtd, rup in zip(
+            skus, estoques, em_transito, chegadas, medias, lead_time, cobertura, ponto_pedido, sugerida, ruptura)
+    ]
+    cursor.execute("DELETE FROM recomendacao_compra")
+    execute_values(cursor, SQL_GRAVAR, valores, page_size=len(valores))
+
+    com_sugestao = int(np.count_nonzero(sugerida))
+    logging.info(f"🛒 Recomendação de compra: {com_sugestao} de {len(skus)} SKUs com sugestão "
+                 f"({int(np.count_nonzero(ruptura))} com risco de ruptura antes da reposição)")
+    return com_sugestao
+
+
+def atualizar_recomendacoes_opcional(cursor, hoje=None):
+    """Como atualizar_recomendacoes, mas sem derrubar a sincronização de estoque
+    se as tabelas de compras não existirem (migration não aplicada)."""
+    cursor.execute("SAVEPOINT recomendacao_compra")
+    try:
+        resultado = atualizar_recomendacoes(cursor, hoje)
+        cursor.execute("RELEASE SAVEPOINT recomendacao_compra")
+        return resultado
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT recomendacao_compra")
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"⚠️  Recomendação de compra não atualizada ({erro})")
+        return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    conn = conexoes.conectar_banco()
+    try:
+        cursor = conn.cursor()
+        atualizar_recomendacoes(cursor)
+        conn.commit()
+        cursor.execute("""
+            SELECT sku, estoque, em_transito, media_vendas, lead_time_dias, quantidade_sugerida, ruptura_antes_chegada
+            FROM recomendacao_compra
+            WHERE quantidade_sugerida > 0
+            ORDER BY ruptura_antes_chegada DESC, quantidade_sugerida DESC
+        """)
+        print(f"{'SKU':<20} {'Estoque':>8} {'Trânsito':>9} {'Média/dia':>10} {'Lead':>5} {'Comprar':>8}  Ruptura")
+        for sku, estoque, transito, media, lead, qtd, ruptura in cursor.fetchall():
+            print(f"{sku:<20} {estoque:>8} {transito:>9} {media:>10} {lead:>5} {qtd:>8}  {'sim' if ruptura else ''}")
+    finally:
+        conn.close()
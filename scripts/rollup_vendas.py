@@ -0,0 +1,132 @@
+"""Resumo diário das vendas do ML por SKU (tabela vendas_diarias_sku).
+
+O importador de vendas recalcula, na mesma transação da carga, apenas os
+dias que tiveram pedidos inseridos ou reescritos; as métricas de estoque e
+os relatórios leem o resumo, com custo proporcional a SKUs × dias em vez do
+número de pedidos.
+
+Executado diretamente, reconstrói o resumo inteiro ou um intervalo:
+
+    python rollup_vendas.py --reconstruir [--de 2026-01-01] [--ate 2026-01-31]
+"""
+import argparse
+import logging
+from contextlib import contextmanager
+from datetime import date
+
+import psycopg2
+
+import conexoes
+
+# Agregação de vendas_ml por (dia, sku, marketplace); {origem} e {filtro} delimitam as vendas lidas
+SQL_AGREGAR = """
+    INSERT INTO vendas_diarias_sku (
+        dia, sku, marketplace, pedidos, pedidos_com_valor, unidades,
+        valor_vendido, lucro, soma_margem_lucro, soma_margem_venda, ultima_venda
+    )
+    SELECT
+        v.data::date,
+        v.sku,
+        COALESCE(v.marketplace, ''),
+        COUNT(*),
+        COUNT(*) FILTER (WHERE v.valor_vendido > 0),
+        COALESCE(SUM(v.unidades), 0),
+        COALESCE(SUM(v.valor_vendido), 0),
+        COALESCE(SUM(v.lucro), 0),
+        COALESCE(SUM(v.margem_lucro), 0),
+        COALESCE(SUM(v.lucro / v.valor_vendido * 100) FILTER (WHERE v.valor_vendido > 0), 0),
+        MAX(v.data)
+    FROM {origem}
+    WHERE v.data IS NOT NULL AND v.sku IS NOT NULL{filtro}
+    GROUP BY 1, 2, 3
+"""
+
+# Um intervalo por dia, para usar o índice em vendas_ml(data)
+ORIGEM_DIAS = "unnest(%s::date[]) AS d(dia) JOIN vendas_ml v ON v.data >= d.dia AND v.data < d.dia + 1"
+
+
+@contextmanager
+def _opcional(cursor):
+    """Falhas no resumo (ex.: migration não aplicada) não derrubam a carga"""
+    cursor.execute("SAVEPOINT rollup_vendas")
+    try:
+        yield
+        cursor.execute("RELEASE SAVEPOINT rollup_vendas")
+    except psycopg2.Error as e:
+        cursor.execute("ROLLBACK TO SAVEPOINT rollup_vendas")
+        erro = str(e).strip().splitlines()[0]
+        logging.warning(f"Resumo diário de vendas não atualizado ({erro}); "
+                        f"rode rollup_vendas.py --reconstruir depois de corrigir")
+
+
+def atualizar_dias(cursor, dias):
+    """Recalcula os `dias` (datas) do resumo dentro da transação do cursor"""
+    dias = sorted({dia for dia in dias if dia is not None})
+    if not dias:
+        return 0
+    with _opcional(cursor):
+        cursor.execute("DELETE FROM vendas_diarias_sku WHERE dia = ANY(%s::date[])", (dias,))
+        cursor.execute(SQL_AGREGAR.format(origem=ORIGEM_DIAS, filtro=''), (dias,))
+    return len(dias)
+
+
+def limpar(cursor):
+    """Esvazia o resumo (após TRUNCATE de vendas_ml)"""
+    with _opcional(cursor):
+        cursor.execute("DELETE FROM vendas_diarias_sku")
+
+
+def reconstruir(cursor, de=None, ate=None):
+    """Refaz o resumo inteiro ou apenas os dias entre `de` e `ate` (inclusive).
+
+    Retorna o número de linhas gravadas. Erros são propagados.
+    """
+    filtros = []
+    condicoes = []
+    parametros = []
+    if de:
+        filtros.append("dia >= %s")
+        condicoes.append("v.data >= %s")
+        parametros.append(de)
+    if ate:
+        filtros.append("dia <= %s")
+        condicoes.append("v.data < %s::date + 1")
+        parametros.append(ate)
+
+    where = f" WHERE {' AND '.join(filtros)}" if filtros else ''
+    cursor.execute(f"DELETE FROM vendas_diarias_sku{where}", parametros)
+    filtro = ''.join(f" AND {condicao}" for condicao in condicoes)
+    cursor.execute(SQL_AGREGAR.format(origem="vendas_ml v", filtro=filtro), parametros)
+    return cursor.rowcount
+
+
+def main(de=None, ate=None):
+    intervalo = f" de {de or 'início'} até {ate or 'hoje'}" if de or ate else ''
+    print(f"Reconstruindo o resumo diário de vendas{intervalo}...")
+    conn = conexoes.conectar_banco()
+    try:
+        cursor = conn.cursor()
+        linhas = reconstruir(cursor, de, ate)
+        conn.commit()
+        print(f"Resumo diário reconstruído: {linhas} linhas (dia × SKU × marketplace).")
+        return True
+    except Exception as e:
+        conn.rollback()
+        print(f"Erro ao reconstruir o resumo diário de vendas: {e}")
+        return False
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mantém o resumo diário de vendas por SKU (vendas_diarias_sku)")
+    parser.add_argument('--reconstruir', action='store_true',
+                        help="Recalcula o resumo a partir de vendas_ml")
+    parser.add_argument('--de', type=date.fromisoformat, help="Primeiro dia (AAAA-MM-DD)")
+    parser.add_argument('--ate', type=date.fromisoformat, help="Último dia (AAAA-MM-DD)")
+    args = parser.parse_args()
+
+    # O importador de vendas mantém o resumo; aqui só há a reconstrução
+    if not args.reconstruir:
+        parser.error("nada a fazer: use --reconstruir [--de AAAA-MM-DD] [--ate AAAA-MM-DD]")
+    main(args.de, args.ate)
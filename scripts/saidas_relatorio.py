@@ -0,0 +1,98 @@
+"""Saídas dos relatórios em formatos leves: HTML, CSV e Parquet.
+
+O PDF (ReportLab) é o formato caro. Quem só precisa dos números pode pedir
+estes formatos, gerados em milissegundos a partir do mesmo conteúdo:
+
+- html: título e tabelas, com as cores de status do PDF (usado como corpo
+  do e-mail);
+- csv: o quadro de dados com uma linha por SKU e os valores sem formatação;
+- parquet: o mesmo quadro, com tipos, para ferramentas que hoje consultam
+  vendas_ml de novo (requer pyarrow).
+
+Cada relatório monta um Conteudo (gerar_enviar_relatorio.conteudo_relatorio,
+gerar_relatorio_mensal.conteudo_relatorio_mensal); cada escritor recebe o
+Conteudo e o caminho do arquivo. Um formato novo entra registrando a
+extensão e a função em ESCRITORES.
+"""
+import html
+from collections import namedtuple
+
+# secoes: função que devolve as [Secao] exibidas no HTML (só ele paga a formatação das células);
+# dados: DataFrame com os valores crus (CSV/Parquet)
+Conteudo = namedtuple('Conteudo', ['titulo', 'secoes', 'dados'])
+
+# linhas: [(células já formatadas, cor de fundo do ReportLab ou None)]
+Secao = namedtuple('Secao', ['titulo', 'cabecalho', 'linhas'])
+
+COR_CABECALHO_HTML = '#303F9F'
+
+
+def _css(cor):
+    """Cor do ReportLab -> #rrggbb"""
+    return '#' + cor.hexval()[2:]
+
+
+def html_relatorio(conteudo):
+    """Documento HTML do conteúdo (CSS no cabeçalho e cores de status por linha)"""
+    partes = [
+        '<!DOCTYPE html><html><head><meta charset="utf-8">',
+        f'<title>{html.escape(conteudo.titulo)}</title>',
+        '<style>body{font-family:Helvetica,Arial,sans-serif;font-size:13px}'
+        'h1{color:#1A237E;text-align:center}'
+        f'h2{{color:{COR_CABECALHO_HTML}}}'
+        'table{border-collapse:collapse}'
+        'th,td{border:1px solid #E0E0E0;padding:4px 8px;text-align:center}'
+        f'th{{background:{COR_CABECALHO_HTML};color:#FFFFFF}}</style>',
+        f'</head><body><h1>{html.escape(conteudo.titulo)}</h1>',
+    ]
+    for secao in conteudo.secoes():
+        partes.append(f'<h2>{html.escape(secao.titulo)}</h2><table><thead><tr>')
+        partes.extend(f'<th>{html.escape(str(titulo))}</th>' for titulo in secao.cabecalho)
+        partes.append('</tr></thead><tbody>')
+        for celulas, cor in secao.linhas:
+            partes.append(f'<tr style="background:{_css(cor)}">' if cor is not None else '<tr>')
+            partes.extend(f'<td>{html.escape(str(valor))}</td>' for valor in celulas)
+            partes.append('</tr>')
+        partes.append('</tbody></table>')
+    partes.append('</body></html>\n')
+    return ''.join(partes)
+
+
+def escrever_html(conteudo, caminho):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        f.write(html_relatorio(conteudo))
+
+
+def escrever_csv(conteudo, caminho):
+    conteudo.dados.to_csv(caminho, index=False)
+
+
+def escrever_parquet(conteudo, caminho):
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Saída em Parquet requer o pacote pyarrow (pip install pyarrow)")
+    conteudo.dados.to_parquet(caminho, index=False)
+
+
+# formato: (extensão, função(conteudo, caminho))
+ESCRITORES = {
+    'html': ('.html', escrever_html),
+    'csv': ('.csv', escrever_csv),
+    'parquet': ('.parquet', escrever_parquet),
+}
+
+# O PDF continua com os renderizadores de cada relatório
+FORMATOS = ('pdf',) + tuple(ESCRITORES)
+
+
+def escrever(conteudo, base, formatos):
+    """Grava `base`.<extensão> de cada formato (exceto pdf); retorna {formato: arquivo}"""
+    arquivos = {}
+    for formato in formatos:
+        if formato == 'pdf':
+            continue
+        extensao, funcao = ESCRITORES[formato]
+        funcao(conteudo, base + extensao)
+        arquivos[formato] = base + extensao
+    return arquivos
@@ -0,0 +1,85 @@
+"""Sincroniza as vendas de todos os marketplaces em paralelo.
+
+Cada marketplace roda o seu importador (fonte -> conversão colunar -> carga
+em lote) numa thread própria. Leitura da planilha e gravação no banco são
+espera de rede, então o ciclo leva o tempo do marketplace mais lento, não a
+soma de todos.
+
+Uso:
+    python sincronizar_vendas.py
+    python sincronizar_vendas.py --marketplaces magalu
+"""
+import argparse
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configurado antes de importar os importadores (o basicConfig deles vira no-op)
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(threadName)s - %(message)s',
+    handlers=[
+        logging.FileHandler('sincronizacao_vendas.log', encoding='utf-8'),
+        logging.StreamHandler()
+    ]
+)
+
+import importar_vendas_magalu
+import importar_vendas_ml
+
+
+_avisou_magalu = False
+
+
+def marketplaces_disponiveis(modo=importar_vendas_ml.MODO_CARGA):
+    """Marketplaces sincronizados: nome -> função sem argumentos que retorna sucesso.
+    A Magalu só entra com a planilha configurada."""
+    global _avisou_magalu
+    funcoes = {'mercado_livre': lambda: importar_vendas_ml.main(modo)}
+    if importar_vendas_magalu.configurado():
+        funcoes['magalu'] = importar_vendas_magalu.main
+    elif not _avisou_magalu:
+        logging.info("Magalu fora da sincronização: defina PLANILHA_NOME_MAGALU e ABA_NOME_MAGALU")
+        _avisou_magalu = True
+    return funcoes
+
+
+def _executar(nome, funcao):
+    inicio = time.perf_counter()
+    try:
+        sucesso = bool(funcao())
+    except (Exception, SystemExit) as e:
+        # Os importadores chamam exit() quando não conseguem conectar
+        logging.error(f"Erro ao sincronizar {nome}: {e!r}")
+        sucesso = False
+    return sucesso, time.perf_counter() - inicio
+
+
+def sincronizar(marketplaces=None, modo=importar_vendas_ml.MODO_CARGA):
+    """Executa os importadores em paralelo; retorna True se todos tiveram sucesso"""
+    funcoes = marketplaces_disponiveis(modo)
+    nomes = list(marketplaces or funcoes)
+
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(nomes), thread_name_prefix='marketplace') as executor:
+        futuros = {nome: executor.submit(_executar, nome, funcoes[nome]) for nome in nomes}
+    resultados = {nome: futuro.result() for nome, futuro in futuros.items()}
+    total = time.perf_counter() - inicio
+
+    for nome, (sucesso, duracao) in resultados.items():
+        logging.info(f"Vendas {nome}: {'ok' if sucesso else 'falha'} em {duracao:.2f}s")
+    soma = sum(duracao for _, duracao in resultados.values())
+    logging.info(f"Sincronização de vendas concluída em {total:.2f}s "
+                 f"(sequencial levaria ~{soma:.2f}s)")
+    return all(sucesso for sucesso, _ in resultados.values())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sincroniza as vendas de todos os marketplaces em paralelo")
+    parser.add_argument('--marketplaces', nargs='+', choices=sorted(marketplaces_disponiveis()),
+                        help="Marketplaces a sincronizar (padrão: todos)")
+    parser.add_argument('--modo', choices=['lote', 'legado'], default=importar_vendas_ml.MODO_CARGA,
+                        help="Modo de carga das vendas do Mercado Livre")
+    args = parser.parse_args()
+
+    sincronizar(args.marketplaces, args.modo)
@@ -0,0 +1,55 @@
+"""Status do estoque a partir da quantidade e do mínimo do SKU.
+
+Regra única usada pelo importador de estoque e pelos relatórios, em três
+formas equivalentes: calcular_status() para um SKU, calcular_status_em_lote()
+para arrays/colunas do pandas e sql_status() para a expressão CASE usada nas
+consultas. A mesma regra está replicada no trigger calcular_status_estoque
+(backend/src/db/schema.sql) e no calcularStatus do frontend.
+"""
+import numpy as np
+
+SEM_ESTOQUE = 'Sem Estoque'
+EM_REPOSICAO = 'Em reposição'
+EM_NEGOCIACAO = 'Em negociação'
+EM_ESTOQUE = 'Em estoque'
+ESTOQUE_ALTO = 'Estoque alto'
+
+# Limites em múltiplos do mínimo: abaixo de 1× repõe, abaixo de 1.2× negocia,
+# até 1.5× (inclusive) está em estoque e acima disso o estoque é alto
+FATOR_NEGOCIACAO = 1.2
+FATOR_ESTOQUE_ALTO = 1.5
+
+
+def calcular_status(estoque, minimo):
+    if estoque == 0:
+        return SEM_ESTOQUE
+    if estoque < minimo:
+        return EM_REPOSICAO
+    if estoque < minimo * FATOR_NEGOCIACAO:
+        return EM_NEGOCIACAO
+    if estoque <= minimo * FATOR_ESTOQUE_ALTO:
+        return EM_ESTOQUE
+    return ESTOQUE_ALTO
+
+
+def calcular_status_em_lote(estoques, minimos):
+    """calcular_status() aplicado elemento a elemento (arrays ou Series)"""
+    estoques = np.asarray(estoques, dtype=float)
+    minimos = np.asarray(minimos, dtype=float)
+    return np.select(
+        [estoques == 0,
+         estoques < minimos,
+         estoques < minimos * FATOR_NEGOCIACAO,
+         estoques <= minimos * FATOR_ESTOQUE_ALTO],
+        [SEM_ESTOQUE, EM_REPOSICAO, EM_NEGOCIACAO, EM_ESTOQUE],
+        default=ESTOQUE_ALTO
+    ).astype(object)
+
+
+def sql_status(estoque='estoque', minimo='minimo'):
+    """Expressão SQL (CASE) equivalente a calcular_status() para as colunas dadas"""
+    return (f"CASE WHEN {estoque} = 0 THEN '{SEM_ESTOQUE}' "
+            f"WHEN {estoque} < {minimo} THEN '{EM_REPOSICAO}' "
+            f"WHEN {estoque} < {minimo} * {FATOR_NEGOCIACAO} THEN '{EM_NEGOCIACAO}' "
+            f"WHEN {estoque} <= {minimo} * {FATOR_ESTOQUE_ALTO} THEN '{EM_ESTOQUE}' "
+            f"ELSE '{ESTOQUE_ALTO}' END")
@@ -0,0 +1,95 @@
+"""Dados do relatório diário: totais do mês até o dia do relatório, no
+relatório do dia e no reprocessamento de um intervalo.
+
+Roda num schema descartável do Postgres de TESTE_DSN; sem ele, é pulado.
+
+    TESTE_DSN=postgresql://postgres@localhost/postgres python -m pytest test_dados_relatorio.py
+"""
+import os
+import random
+from datetime import date, timedelta
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from dados_relatorio import Totais, carregar_dados_intervalo, carregar_dados_relatorio
+
+SCHEMA_TESTE = 'teste_dados_relatorio'
+PASTA_MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend', 'src', 'db', 'migrations')
+
+
+@pytest.fixture
+def conn():
+    dsn = os.getenv('TESTE_DSN')
+    if not dsn:
+        pytest.skip("defina TESTE_DSN com um Postgres descartável")
+    try:
+        conn = psycopg2.connect(dsn, options=f"-c search_path={SCHEMA_TESTE}", connect_timeout=5)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres de teste indisponível: {str(e).strip()}")
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTE} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA_TESTE}")
+    # O resumo diário sem a carga inicial a partir de vendas_ml
+    for migration in ('create_metas_ml_table.sql', 'create_vendas_diarias_sku.sql'):
+        with open(os.path.join(PASTA_MIGRATIONS, migration), encoding='utf-8') as f:
+            cursor.execute(f.read().split('-- Carga inicial')[0])
+    conn.commit()
+    try:
+        yield conn
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTE} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+def _vender(conn, dia, sku, unidades, valor, lucro, marketplace='Mercado Livre'):
+    conn.cursor().execute("""
+        INSERT INTO vendas_diarias_sku (dia, sku, marketplace, pedidos, pedidos_com_valor, unidades,
+                                        valor_vendido, lucro, soma_margem_lucro, soma_margem_venda)
+        VALUES (%s, %s, %s, 1, 1, %s, %s, %s, %s, %s)
+    """, (dia, sku, marketplace, unidades, valor, lucro, lucro / valor * 100, lucro / valor * 100))
+
+
+def test_mes_do_dia_reprocessado_nao_inclui_vendas_posteriores(conn):
+    _vender(conn, date(2026, 10, 1), 'SKU-A', 2, 100, 20)
+    _vender(conn, date(2026, 10, 5), 'SKU-A', 1, 50, 5)
+    # Depois do dia do relatório (5/10): ficam fora do mês
+    _vender(conn, date(2026, 10, 6), 'SKU-A', 10, 1000, 500)
+    _vender(conn, date(2026, 10, 20), 'SKU-B', 3, 300, 30)
+    conn.cursor().execute("INSERT INTO metas_ml (sku, meta_vendas, mes_ano) VALUES ('SKU-A', 10, '2026-10-01'),"
+                          " ('SKU-B', 5, '2026-10-01')")
+
+    dados = carregar_dados_intervalo(conn, date(2026, 10, 5), date(2026, 10, 31))[date(2026, 10, 5)]
+
+    assert dados.mes == {'SKU-A': Totais(150.0, 3, 25.0)}
+    assert dados.metas == {'SKU-A': 10.0}
+    assert dados.margem_media_mes == pytest.approx((20.0 + 10.0) / 2)
+    assert dados == carregar_dados_relatorio(conn, hoje=date(2026, 10, 6))
+
+
+def test_intervalo_igual_ao_relatorio_de_cada_dia(conn):
+    rng = random.Random(24)
+    skus = [f'SKU-{i:03d}' for i in range(40)]
+    dia = date(2026, 8, 20)
+    while dia < date(2026, 11, 10):
+        for sku in rng.sample(skus, rng.randint(0, 8)):
+            for marketplace in rng.sample(['Mercado Livre', 'Magalu'], rng.randint(1, 2)):
+                _vender(conn, dia, sku, rng.randint(1, 5), rng.randint(10, 500), rng.randint(-50, 100), marketplace)
+        dia += timedelta(days=1)
+    conn.cursor().execute("""
+        INSERT INTO metas_ml (sku, meta_vendas, mes_ano)
+        SELECT sku, (random() * 100)::int, mes
+        FROM unnest(%s::text[]) sku, (VALUES (date '2026-09-01'), (date '2026-10-01')) m(mes)
+    """, (skus[::3],))
+
+    de, ate = date(2026, 9, 1), date(2026, 11, 5)
+    for marketplace in (None, 'Magalu'):
+        por_dia = carregar_dados_intervalo(conn, de, ate, marketplace)
+        assert sorted(por_dia) == [de + timedelta(days=n) for n in range((ate - de).days + 1)]
+        for dia, dados in por_dia.items():
+            esperado = carregar_dados_relatorio(conn, dia + timedelta(days=1), marketplace)
+            assert dados == esperado, dia
@@ -0,0 +1,258 @@
+"""Testes da entrega dos relatórios contra um servidor SMTP local (aiosmtpd)
+e um cliente de mensagens falso.
+
+    cd scripts && python -m pytest test_entrega_relatorio.py
+"""
+import smtplib
+import socket
+import threading
+import time
+from email.message import EmailMessage
+
+import pytest
+
+pytest.importorskip('aiosmtpd')
+from aiosmtpd.controller import Controller
+
+from entrega_relatorio import Envio, SessaoSmtp, entregar, falha_definitiva
+
+ESPERA = 0.01
+
+
+class Servidor:
+    """Handler do aiosmtpd com respostas programadas para RCPT e DATA"""
+
+    def __init__(self):
+        self.respostas_rcpt = []
+        self.respostas_data = []
+        self.recebidas = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.respostas_rcpt:
+            return self.respostas_rcpt.pop(0)
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.respostas_data:
+            return self.respostas_data.pop(0)
+        self.recebidas.extend(envelope.rcpt_tos)
+        return '250 OK'
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.fixture
+def servidor():
+    handler = Servidor()
+    controller = Controller(handler, hostname='127.0.0.1', port=_porta_livre())
+    controller.start()
+    handler.porta = controller.port
+    yield handler
+    controller.stop()
+
+
+class FabricaSmtp:
+    """Abre conexões smtplib de verdade e guarda a última (para derrubá-la)"""
+
+    def __init__(self):
+        self.ultima = None
+
+    def __call__(self, host, porta, timeout=None):
+        self.ultima = smtplib.SMTP(host, porta, timeout=timeout)
+        return self.ultima
+
+
+@pytest.fixture
+def sessao(servidor):
+    fabrica = FabricaSmtp()
+    with SessaoSmtp('127.0.0.1', servidor.porta, starttls=False, fabrica=fabrica) as sessao:
+        sessao.fabrica_teste = fabrica
+        yield sessao
+
+
+def _mensagem(destinatario):
+    msg = EmailMessage()
+    msg['From'] = 'relatorios@teste.com'
+    msg['To'] = destinatario
+    msg['Subject'] = 'Relatório de Vendas'
+    msg.set_content('Segue o relatório.')
+    return msg
+
+
+def _canal_email(sessao):
+    return lambda destinatario: sessao.enviar(_mensagem(destinatario))
+
+
+class ClienteFalso:
+    """Imita client.messages.create do Twilio: falhas programadas por número e atraso"""
+
+    def __init__(self, falhas=None, atraso=0):
+        self.falhas = dict(falhas or {})
+        self.atraso = atraso
+        self.enviadas = []
+        self._trava = threading.Lock()
+        self.messages = self
+
+    def create(self, to, **parametros):
+        with self._trava:
+            pendentes = self.falhas.get(to, [])
+            erro = pendentes.pop(0) if pendentes else None
+        if erro:
+            raise erro
+        time.sleep(self.atraso)
+        with self._trava:
+            self.enviadas.append(to)
+        return type('Mensagem', (), {'sid': f'SM{len(self.enviadas)}'})()
+
+
+class ErroHttp(Exception):
+    def __init__(self, status):
+        super().__init__(f'HTTP {status}')
+        self.status = status
+
+
+def test_varios_destinatarios_usam_uma_sessao(servidor, sessao):
+    resultados = entregar({'email': _canal_email(sessao)},
+                          [Envio('email', 'a@teste.com'), Envio('email', 'b@teste.com')], espera=ESPERA)
+    assert [r.sucesso for r in resultados] == [True, True]
+    assert sorted(servidor.recebidas) == ['a@teste.com', 'b@teste.com']
+    assert sessao.conexoes == 1
+
+
+def test_451_no_data_repetido_na_mesma_sessao(servidor, sessao):
+    servidor.respostas_data.append('451 Tente mais tarde')
+    [resultado] = entregar({'email': _canal_email(sessao)}, [Envio('email', 'a@teste.com')], espera=ESPERA)
+    assert resultado.sucesso and resultado.tentativas == 2
+    assert servidor.recebidas == ['a@teste.com']
+    assert sessao.conexoes == 1
+
+
+def test_greylisting_no_rcpt_repetido(servidor, sessao):
+    servidor.respostas_rcpt.append('451 Greylisted')
+    [resultado] = entregar({'email': _canal_email(sessao)}, [Envio('email', 'a@teste.com')], espera=ESPERA)
+    assert resultado.sucesso and resultado.tentativas == 2
+    assert sessao.conexoes == 1
+
+
+def test_550_nao_repetido(servidor, sessao):
+    servidor.respostas_rcpt.append('550 Caixa inexistente')
+    [resultado] = entregar({'email': _canal_email(sessao)}, [Envio('email', 'x@teste.com')], espera=ESPERA)
+    assert not resultado.sucesso and resultado.tentativas == 1
+    assert 'SMTPRecipientsRefused' in resultado.erro
+    assert servidor.recebidas == []
+
+
+def test_421_reabre_a_sessao(servidor, sessao):
+    servidor.respostas_rcpt.append('421 Servidor ocupado')
+    [resultado] = entregar({'email': _canal_email(sessao)}, [Envio('email', 'a@teste.com')], espera=ESPERA)
+    assert resultado.sucesso and resultado.tentativas == 2
+    assert sessao.conexoes == 2
+
+
+def test_sessao_derrubada_reconecta(servidor, sessao):
+    canais = {'email': _canal_email(sessao)}
+    entregar(canais, [Envio('email', 'a@teste.com')], espera=ESPERA)
+    sessao.fabrica_teste.ultima.sock.shutdown(socket.SHUT_RDWR)
+
+    [resultado] = entregar(canais, [Envio('email', 'b@teste.com')], espera=ESPERA)
+    assert resultado.sucesso and resultado.tentativas == 2
+    assert sessao.conexoes == 2
+    assert servidor.recebidas == ['a@teste.com', 'b@teste.com']
+
+
+def test_canal_lento_nao_atrasa_os_outros(servidor, sessao):
+    cliente = ClienteFalso(atraso=0.5)
+    canais = {
+        'email': _canal_email(sessao),
+        'whatsapp': lambda numero: cliente.messages.create(to=numero, body='Relatório'),
+    }
+    resultados = entregar(canais, [Envio('whatsapp', '+5531900000001'), Envio('email', 'a@teste.com')],
+                          espera=ESPERA)
+    whatsapp, email = resultados
+    assert whatsapp.sucesso and email.sucesso
+    assert whatsapp.segundos >= 0.5
+    assert email.segundos < 0.5
+
+
+def test_cliente_falso_repete_erro_temporario_e_nao_4xx():
+    cliente = ClienteFalso(falhas={
+        '+5531900000001': [ConnectionError('timeout')],
+        '+5531900000002': [ErroHttp(400)],
+    })
+    resultados = entregar({'whatsapp': lambda numero: cliente.messages.create(to=numero)},
+                          [Envio('whatsapp', '+5531900000001'), Envio('whatsapp', '+5531900000002')],
+                          espera=ESPERA)
+    assert [(r.sucesso, r.tentativas) for r in resultados] == [(True, 2), (False, 1)]
+    assert cliente.enviadas == ['+5531900000001']
+
+
+def test_desiste_apos_as_tentativas():
+    cliente = ClienteFalso(falhas={'+5531900000001': [ErroHttp(503)] * 5})
+    [resultado] = entregar({'whatsapp': lambda numero: cliente.messages.create(to=numero)},
+                           [Envio('whatsapp', '+5531900000001')], tentativas=3, espera=ESPERA)
+    assert not resultado.sucesso and resultado.tentativas == 3
+
+
+@pytest.mark.parametrize('erro, definitiva', [
+    (smtplib.SMTPRecipientsRefused({'a@x': (451, b'greylisted')}), False),
+    (smtplib.SMTPRecipientsRefused({'a@x': (452, b'cheio')}), False),
+    (smtplib.SMTPRecipientsRefused({'a@x': (421, b'ocupado')}), False),
+    (smtplib.SMTPRecipientsRefused({'a@x': (550, b'inexistente')}), True),
+    (smtplib.SMTPRecipientsRefused({'a@x': (550, b'inexistente'), 'b@x': (451, b'')}), False),
+    (smtplib.SMTPDataError(451, b'tente depois'), False),
+    (smtplib.SMTPDataError(554, b'rejeitada'), True),
+    (smtplib.SMTPAuthenticationError(535, b'credenciais'), True),
+    (smtplib.SMTPServerDisconnected('caiu'), False),
+    (ErroHttp(400), True),
+    (ErroHttp(429), False),
+    (ErroHttp(503), False),
+    (ConnectionError('timeout'), False),
+])
+def test_falha_definitiva(erro, definitiva):
+    assert falha_definitiva(erro) is definitiva
+
+
+@pytest.fixture
+def arquivo_pdf(tmp_path):
+    caminho = tmp_path / 'relatorio.pdf'
+    caminho.write_bytes(b'%PDF-1.4\n')
+    return str(caminho)
+
+
+@pytest.fixture
+def relatorio(monkeypatch):
+    """gerar_enviar_relatorio com destinatários de teste e sem Twilio configurado"""
+    import gerar_enviar_relatorio
+    for variavel in ('TWILIO_ACCOUNT_SID', 'TWILIO_AUTH_TOKEN', 'WHATSAPP_NUMBER'):
+        monkeypatch.delenv(variavel, raising=False)
+    monkeypatch.setenv('EMAIL_REMETENTE', 'relatorios@teste.com')
+    monkeypatch.setenv('EMAIL_DESTINATARIO', 'a@teste.com, b@teste.com')
+    monkeypatch.setattr('entrega_relatorio.ESPERA_SEGUNDOS', ESPERA)
+    return gerar_enviar_relatorio
+
+
+def test_enviar_relatorio_por_email_e_whatsapp(servidor, relatorio, arquivo_pdf, monkeypatch):
+    monkeypatch.setenv('WHATSAPP_NUMBER', '+5531900000001,+5531900000002')
+    cliente = ClienteFalso(falhas={'whatsapp:+5531900000002': [ConnectionError('timeout')]})
+    sessao = SessaoSmtp('127.0.0.1', servidor.porta, starttls=False)
+
+    resultados = relatorio.enviar_relatorio(arquivo_pdf, '<p>Relatório</p>', sessao, cliente)
+
+    assert all(r.sucesso for r in resultados)
+    assert sorted(servidor.recebidas) == ['a@teste.com', 'b@teste.com']
+    assert sessao.conexoes == 1
+    assert sorted(cliente.enviadas) == ['whatsapp:+5531900000001', 'whatsapp:+5531900000002']
+
+
+def test_enviar_relatorio_sem_twilio_configurado_so_envia_email(servidor, relatorio, arquivo_pdf, monkeypatch):
+    monkeypatch.setenv('WHATSAPP_NUMBER', '+5531900000001')
+    sessao = SessaoSmtp('127.0.0.1', servidor.porta, starttls=False)
+
+    resultados = relatorio.enviar_relatorio(arquivo_pdf, None, sessao)
+
+    assert [(r.canal, r.sucesso) for r in resultados] == [('email', True), ('email', True)]
@@ -0,0 +1,201 @@
+"""Teste diferencial: a conversão colunar (parser_colunar) contra as funções
+célula a célula tratar_valor() de importar_vendas_ml e importar_estoque.
+
+Os valores precisam ser idênticos (datas, textos e números, com o sinal do
+zero e nan); células vazias ou inválidas caem no padrão 0 nos dois lados.
+
+    cd scripts && python -m pytest test_parser_colunar.py
+"""
+import importlib
+import math
+import os
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from parser_colunar import (DATA, ESQUEMA_VENDAS_ML, INTEIRO, NUMERO, TEXTO,
+                            converter_coluna, para_registros, parsear_linhas)
+
+SEMENTE = 20261018
+CASOS_ALEATORIOS = 3000
+
+MOEDAS = [
+    '', ' ', 'R$ 0,00', 'R$ 1.234,56', '-R$ 12,34', 'R$ -12,34', 'R$12,5', 'R$ 1.234.567,89', ' R$ 12,50 ',
+    '1.234', '1,234', '12', '-0', '-0,00', '0', '000123,40', ',5', '5,', '1.2.3', 'R$ -', '-', '--1', '1-',
+    '+5', '12 ,5', '1.234.567,891,2', 'R $ 10', 'RR$ 10', 'R$$ 10', '1e3', 'nan', 'inf', '-inf', 'x', '#N/A',
+    '#DIV/0!', '１２', ' 12', '12\x00', '1' * 15 + ',5', '1' * 16, '9' * 15, '0,' + '1' * 15,
+    '1_000', ' - 5', 'R$\t5', '١٢', '1\x002', '\x001', '\x00', 'R$ 1\x00,50', '\x00R$ 12,34', '1,5\x00 ',
+]
+PERCENTUAIS = [
+    '0%', '12%', '12,5%', '-3,25%', '12.5%', '1.234,5%', '%', '%%', '12%%', '1,2,3%', 'R$ 10%', '10 %',
+    '-0%', '+3%', '12,%', ',5%', '1e2%', 'nan%', '１%', '12%\x00', '9' * 15 + '%', '9' * 16 + '%',
+    '1\x00,5%', '\x0012%', '12\x00%',
+]
+INTEIROS = [
+    '', ' ', '0', '12', ' 3 ', '-3', '+3', '007', '1,5', '2.0', '1 2', '- 3', '--3', '+-3', '3-', 'x', '#N/A',
+    '1_000', '１２', '١٢', '\t7\n', '12\x00', '9' * 18, '9' * 19, '-' + '9' * 18, '9' * 30, '0x10', '1e3',
+    ' 1\x00 ', '\x001', '1\x002', '-\x001', '\x00',
+]
+DATAS = [
+    '', ' ', '01/03/24 10:00:00', '31/12/23 23:59:59', '28/02/24 23:00:00', '29/02/24 12:00:00',
+    '29/02/23 12:00:00', '31/04/24 10:00:00', '31/02/24 10:00:00', '01/13/24 10:00:00', '00/01/24 10:00:00',
+    '01/01/68 00:00:00', '01/01/69 00:00:00', '31/12/99 23:59:59', '01/01/00 00:00:00',
+    '01/03/24 24:00:00', '01/03/24 10:60:00', '01/03/24 10:00:60', '01/03/24 10:00:61',
+    '1/3/24 1:02:03', ' 01/03/24 10:00:00 ', '01/03/24  10:00:00', '01/03/24 10:00', '01/03/2024 10:00:00',
+    '2024-03-01 10:00:00', '01/03/24 10:00:00\x00', '01/03/24\x0010:00:00', '\x001/03/24 10:00:00', '０1/03/24 10:00:00', '01-03-24 10:00:00', '#N/A', 'x',
+]
+TEXTOS = ['', ' ', 'SKU-0001', '  SKU 2  ', '\tpedido\n', 'Mercado Envios', 'ação', '0', '\x00', '  ']
+
+
+@pytest.fixture(scope='module')
+def legado(tmp_path_factory):
+    """(importar_vendas_ml, importar_estoque), importados num diretório temporário
+    (os módulos criam arquivos de log no diretório corrente)"""
+    anterior = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp('logs'))
+    try:
+        return importlib.import_module('importar_vendas_ml'), importlib.import_module('importar_estoque')
+    finally:
+        os.chdir(anterior)
+
+
+def _chave(valor):
+    """Valor como chega ao banco. Números comparam pelo valor (o padrão 0 de
+    tratar_valor e o 0.0 de uma coluna float são o mesmo número), mas o sinal
+    do zero e nan contam; os demais valores comparam pelo tipo e repr."""
+    if isinstance(valor, (int, float)):
+        if valor != valor:
+            return ('nan',)
+        return ('numero', valor, math.copysign(1, valor))
+    return type(valor), repr(valor)
+
+
+def _colunar(celulas, tipo, divisor_moeda, ajuste_data=timedelta(days=1)):
+    """Valores da conversão colunar como os objetos Python que vão para o banco"""
+    quadro, _ = parsear_linhas([[celula] for celula in celulas], (('c', 0, tipo),), divisor_moeda, ajuste_data)
+    return [registro[0] for registro in para_registros(quadro, (('c', 0, tipo),))]
+
+
+def _divergencias(celulas, esperados, obtidos):
+    return [(celula, esperado, obtido) for celula, esperado, obtido in zip(celulas, esperados, obtidos)
+            if _chave(esperado) != _chave(obtido)]
+
+
+def _aleatorio(rng, alfabeto, maximo=20):
+    return ''.join(rng.choice(alfabeto) for _ in range(rng.randint(0, maximo)))
+
+
+def _moedas_aleatorias(rng):
+    celulas = []
+    for _ in range(CASOS_ALEATORIOS):
+        centavos = rng.randint(-10 ** rng.randint(1, 14), 10 ** rng.randint(1, 14))
+        reais, resto = divmod(abs(centavos), 100)
+        sinal = '-' if centavos < 0 else ''
+        celulas.append(f"{sinal}R$ {reais:,}".replace(',', '.') + f",{resto:02d}")
+        celulas.append(_aleatorio(rng, '0123456789,.-+R$% \x00'))
+    return celulas
+
+
+def _percentuais_aleatorios(rng):
+    celulas = []
+    for _ in range(CASOS_ALEATORIOS):
+        centesimos = rng.randint(-100000, 1000000)
+        celulas.append(f"{'-' if centesimos < 0 else ''}{abs(centesimos) // 100},{abs(centesimos) % 100:02d}%")
+        celulas.append(_aleatorio(rng, '0123456789,.-%\x00', 10) + '%')
+    return celulas
+
+
+def _inteiros_aleatorios(rng):
+    celulas = []
+    for _ in range(CASOS_ALEATORIOS):
+        celulas.append(str(rng.randint(-10 ** rng.randint(1, 19), 10 ** rng.randint(1, 19))))
+        celulas.append(_aleatorio(rng, '0123456789 -+.,\x00', 8))
+    return celulas
+
+
+def _datas_aleatorias(rng):
+    celulas = []
+    for _ in range(CASOS_ALEATORIOS):
+        campos = [rng.randint(0, 32), rng.randint(0, 13), rng.randint(0, 99),
+                  rng.randint(0, 25), rng.randint(0, 61), rng.randint(0, 61)]
+        celulas.append('{:02d}/{:02d}/{:02d} {:02d}:{:02d}:{:02d}'.format(*campos))
+        celulas.append(_aleatorio(rng, '0123456789/: ', 19))
+    return celulas
+
+
+@pytest.mark.parametrize('celulas', [MOEDAS + PERCENTUAIS, _moedas_aleatorias(random.Random(SEMENTE)),
+                                     _percentuais_aleatorios(random.Random(SEMENTE + 1))],
+                         ids=['casos_limite', 'moedas_aleatorias', 'percentuais_aleatorios'])
+def test_numeros_iguais_a_tratar_valor(legado, celulas):
+    vendas_ml, estoque = legado
+    # Vendas do ML: valores monetários divididos por 100
+    esperados = [vendas_ml.tratar_valor(celula) for celula in celulas]
+    assert _divergencias(celulas, esperados, _colunar(celulas, NUMERO, 100)) == []
+    # Estoque: sem a divisão
+    esperados = [estoque.tratar_valor(celula) for celula in celulas]
+    assert _divergencias(celulas, esperados, _colunar(celulas, NUMERO, 1)) == []
+
+
+@pytest.mark.parametrize('celulas', [INTEIROS, _inteiros_aleatorios(random.Random(SEMENTE + 2))],
+                         ids=['casos_limite', 'aleatorios'])
+def test_inteiros_iguais_a_tratar_valor(legado, celulas):
+    for modulo in legado:
+        esperados = [modulo.tratar_valor(celula, tipo=int) for celula in celulas]
+        assert _divergencias(celulas, esperados, _colunar(celulas, INTEIRO, 100)) == []
+
+
+@pytest.mark.parametrize('celulas', [DATAS, _datas_aleatorias(random.Random(SEMENTE + 3))],
+                         ids=['casos_limite', 'aleatorias'])
+def test_datas_iguais_a_tratar_valor_com_mais_um_dia(legado, celulas):
+    vendas_ml, _ = legado
+    esperados = [vendas_ml.tratar_valor(celula, tipo=datetime) for celula in celulas]
+    assert _divergencias(celulas, esperados, _colunar(celulas, DATA, 100)) == []
+    assert _colunar(['29/02/24 23:30:00'], DATA, 100) == [datetime(2024, 3, 1, 23, 30)]
+
+
+def test_textos_iguais_a_tratar_valor(legado):
+    for modulo in legado:
+        esperados = [modulo.tratar_valor(celula, tipo=str) for celula in TEXTOS]
+        assert _divergencias(TEXTOS, esperados, _colunar(TEXTOS, TEXTO, 100)) == []
+
+
+def test_celulas_invalidas_marcadas_como_erro():
+    valores, erros = converter_coluna(['R$ 1,00', 'x', '', '#N/A'], NUMERO)
+    assert valores.tolist() == [0.01, 0, 0, 0]
+    assert erros.tolist() == [False, True, False, True]
+
+
+def test_nul_no_meio_da_celula_e_erro():
+    valores, erros = converter_coluna(['1\x002', '\x001', '1\x00,5%', '12'], NUMERO)
+    assert valores.tolist() == [0, 0, 0, 0.12]
+    assert erros.tolist() == [True, True, True, False]
+    valores, erros = converter_coluna([' 1\x00 ', '\x001', '7'], INTEIRO)
+    assert valores.tolist() == [0, 0, 7]
+    assert erros.tolist() == [True, True, False]
+
+
+def test_linhas_completas_iguais_a_converter_linha(legado):
+    """Planilha de vendas com linhas sujas, curtas e em branco: linha a linha
+    igual a importar_vendas_ml.converter_linha"""
+    vendas_ml, _ = legado
+    rng = random.Random(SEMENTE + 4)
+    colunas_sujas = {
+        DATA: DATAS, INTEIRO: INTEIROS, NUMERO: MOEDAS + PERCENTUAIS, TEXTO: TEXTOS,
+    }
+    linhas = []
+    for _ in range(2000):
+        linha = []
+        for _, _, tipo in ESQUEMA_VENDAS_ML:
+            linha.append(rng.choice(colunas_sujas.get(tipo, ['Mercado Livre', 'Magalu', ''])))
+        linhas.append(linha)
+
+    esperados = [vendas_ml.converter_linha(linha) for linha in vendas_ml.normalizar_linhas(linhas)]
+    quadro, _ = parsear_linhas(linhas, ESQUEMA_VENDAS_ML)
+    obtidos = para_registros(quadro, ESQUEMA_VENDAS_ML)
+    divergencias = [(i, nome, a, b)
+                    for i, (esperado, obtido) in enumerate(zip(esperados, obtidos))
+                    for (nome, _, _), a, b in zip(ESQUEMA_VENDAS_ML, esperado, obtido)
+                    if _chave(a) != _chave(b)]
+    assert len(obtidos) == len(esperados)
+    assert divergencias == []
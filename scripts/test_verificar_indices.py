@@ -0,0 +1,92 @@
+"""As consultas dos relatórios usam índice (verificar_indices.py como teste).
+
+As tabelas são criadas num schema descartável de um Postgres de teste, com
+add_indices_periodo.sql aplicada; sem TESTE_DSN o teste é pulado.
+
+    TESTE_DSN=postgresql://postgres@localhost/postgres python -m pytest test_verificar_indices.py
+"""
+import os
+
+import pytest
+
+psycopg2 = pytest.importorskip('psycopg2')
+
+from verificar_indices import NOS_COM_INDICE, consultas, leituras
+
+SCHEMA_TESTE = 'teste_verificar_indices'
+PASTA_BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'backend')
+PASTA_MIGRATIONS = os.path.join(PASTA_BACKEND, 'src', 'db', 'migrations')
+SCRIPTS_SQL = (
+    os.path.join(PASTA_BACKEND, 'criar-tabela-estoque.sql'),
+    os.path.join(PASTA_MIGRATIONS, 'create_metas_ml_table.sql'),
+    os.path.join(PASTA_MIGRATIONS, 'create_vendas_diarias_sku.sql'),
+    os.path.join(PASTA_MIGRATIONS, 'add_indice_atualizado_em_vendas_diarias.sql'),
+    os.path.join(PASTA_MIGRATIONS, 'add_indices_periodo.sql'),
+)
+
+# vendas_ml como em backend/src/db/init.js
+DDL_VENDAS_ML = """
+CREATE TABLE vendas_ml (
+    id SERIAL PRIMARY KEY,
+    marketplace VARCHAR(50) NOT NULL,
+    pedido VARCHAR(50) NOT NULL UNIQUE,
+    data DATE NOT NULL,
+    sku VARCHAR(50) NOT NULL,
+    unidades INTEGER NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    valor_comprado DECIMAL(10,2) NOT NULL,
+    valor_vendido DECIMAL(10,2) NOT NULL,
+    taxas DECIMAL(10,2) NOT NULL,
+    frete DECIMAL(10,2) NOT NULL,
+    descontos DECIMAL(10,2) NOT NULL,
+    ctl DECIMAL(10,2) NOT NULL,
+    receita_envio DECIMAL(10,2) NOT NULL,
+    valor_liquido DECIMAL(10,2) NOT NULL,
+    lucro DECIMAL(10,2) NOT NULL,
+    markup DECIMAL(10,2) NOT NULL,
+    margem_lucro DECIMAL(10,2) NOT NULL,
+    envio VARCHAR(100),
+    numero_envio VARCHAR(100),
+    imposto DECIMAL(10,2) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+"""
+
+
+@pytest.fixture(scope='module')
+def cursor():
+    dsn = os.getenv('TESTE_DSN')
+    if not dsn:
+        pytest.skip("defina TESTE_DSN com um Postgres descartável")
+    try:
+        conn = psycopg2.connect(dsn, options=f"-c search_path={SCHEMA_TESTE}", connect_timeout=5)
+    except psycopg2.OperationalError as e:
+        pytest.skip(f"Postgres de teste indisponível: {str(e).strip()}")
+
+    cursor = conn.cursor()
+    cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTE} CASCADE")
+    cursor.execute(f"CREATE SCHEMA {SCHEMA_TESTE}")
+    cursor.execute(DDL_VENDAS_ML)
+    for caminho in SCRIPTS_SQL:
+        with open(caminho, encoding='utf-8') as f:
+            cursor.execute(f.read())
+    conn.commit()
+    try:
+        yield cursor
+    finally:
+        conn.rollback()
+        cursor.execute(f"DROP SCHEMA IF EXISTS {SCHEMA_TESTE} CASCADE")
+        conn.commit()
+        conn.close()
+
+
+@pytest.mark.parametrize('nome, sql, parametros, tabelas', consultas(),
+                         ids=[consulta[0] for consulta in consultas()])
+def test_consulta_usa_indice(cursor, nome, sql, parametros, tabelas):
+    try:
+        lidas = [l for l in leituras(cursor, sql, parametros) if l[0] in tabelas]
+    finally:
+        cursor.connection.rollback()
+
+    assert {tabela for tabela, _, _ in lidas} == tabelas
+    assert [l for l in lidas if l[1] not in NOS_COM_INDICE or not l[2]] == []
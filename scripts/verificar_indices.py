@@ -0,0 +1,108 @@
+"""Confere, com EXPLAIN, que as consultas dos relatórios usam índice.
+
+Cada consulta é planejada com enable_seqscan desligado: se ainda assim
+aparecer uma leitura sequencial (ou um índice percorrido inteiro, sem
+condição) em uma das tabelas verificadas, é porque o filtro não pode usar
+índice — por exemplo DATE(data) = ... no lugar de um intervalo de
+periodos.py — ou porque falta a migration add_indices_periodo.sql.
+Nada é executado: só os planos são gerados.
+
+    python verificar_indices.py                      # banco de config.py
+    python verificar_indices.py --dsn postgresql://postgres@localhost/postgres
+
+Sai com código 1 se alguma consulta não usar índice. A mesma conferência
+roda como teste em test_verificar_indices.py (Postgres descartável em TESTE_DSN).
+"""
+import argparse
+import sys
+from datetime import date, timedelta
+
+import psycopg2
+
+import conexoes
+import dados_relatorio
+import gerar_relatorio_mensal
+import periodos
+import previsao_estoque
+import rollup_vendas
+
+NOS_COM_INDICE = {'Index Scan', 'Index Only Scan', 'Bitmap Heap Scan'}
+
+
+def consultas(hoje=None):
+    """[(nome, sql, parametros, tabelas que devem ser lidas por índice)]"""
+    hoje = hoje or date.today()
+    mes = periodos.parametros(mes=periodos.mes(hoje))
+    ontem = hoje - timedelta(days=1)
+    return [
+        ('relatorio_diario', dados_relatorio.SQL_DADOS_RELATORIO,
+         dados_relatorio.parametros_relatorio(hoje), {'vendas_diarias_sku', 'metas_ml'}),
+        ('relatorio_mensal_vendas', gerar_relatorio_mensal.SQL_VENDAS_MES, dict(mes, marketplace=None),
+         {'vendas_diarias_sku'}),
+        ('relatorio_mensal_metas', gerar_relatorio_mensal.SQL_METAS_MES, mes, {'metas_ml'}),
+        ('resumo_diario_dias', rollup_vendas.SQL_AGREGAR.format(origem=rollup_vendas.ORIGEM_DIAS, filtro=''),
+         ([ontem],), {'vendas_ml'}),
+        ('resumo_diario_intervalo', rollup_vendas.SQL_AGREGAR.format(
+            origem="vendas_ml v", filtro=f" AND {periodos.filtro('v.data', 'intervalo')}"),
+         periodos.parametros(intervalo=periodos.dias(hoje - timedelta(days=7), ontem)), {'vendas_ml'}),
+        ('previsao_estoque', previsao_estoque.SQL_SERIES,
+         {'inicio': hoje - timedelta(days=previsao_estoque.JANELA_DIAS), 'fim': hoje}, {'vendas_diarias_sku'}),
+    ]
+
+
+def _nos(plano):
+    yield plano
+    for filho in plano.get('Plans', []):
+        yield from _nos(filho)
+
+
+def leituras(cursor, sql, parametros):
+    """[(tabela, tipo de nó, usa condição de índice)] do plano da consulta"""
+    cursor.execute("SET LOCAL enable_seqscan = off")
+    cursor.execute("EXPLAIN (FORMAT JSON) " + sql, parametros)
+    plano = cursor.fetchone()[0][0]['Plan']
+    resultado = []
+    for no in _nos(plano):
+        if 'Relation Name' not in no:
+            continue
+        if no['Node Type'] == 'Bitmap Heap Scan':
+            com_condicao = 'Recheck Cond' in no
+        else:
+            com_condicao = 'Index Cond' in no
+        resultado.append((no['Relation Name'], no['Node Type'], com_condicao))
+    return resultado
+
+
+def verificar(conn, hoje=None):
+    """Imprime o resultado de cada consulta; retorna True se todas usam índice"""
+    tudo_certo = True
+    cursor = conn.cursor()
+    for nome, sql, parametros, tabelas in consultas(hoje):
+        try:
+            lidas = [l for l in leituras(cursor, sql, parametros) if l[0] in tabelas]
+        except psycopg2.Error as e:
+            print(f"❌ {nome}: {str(e).strip().splitlines()[0]}")
+            tudo_certo = False
+            continue
+        finally:
+            conn.rollback()
+
+        problemas = [l for l in lidas if l[1] not in NOS_COM_INDICE or not l[2]]
+        descricao = ', '.join(f"{tabela}: {tipo}{'' if condicao else ' (sem condição)'}"
+                              for tabela, tipo, condicao in lidas)
+        print(f"{'❌' if problemas else '✅'} {nome}: {descricao}")
+        tudo_certo = tudo_certo and not problemas
+    return tudo_certo
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Confere com EXPLAIN se as consultas dos relatórios usam índice")
+    parser.add_argument('--dsn', help="Conexão do Postgres (padrão: DATABASE_CONFIG de config.py)")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.dsn) if args.dsn else conexoes.conectar_banco()
+    try:
+        ok = verificar(conn)
+    finally:
+        conn.close()
+    sys.exit(0 if ok else 1)